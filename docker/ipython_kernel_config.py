@@ -0,0 +1,6 @@
+# System-wide IPython kernel configuration of the notebook image. It lives in
+# /etc/ipython because /root, where the profile would normally be, is the
+# notebook volume at run time.
+c = get_config()  # noqa: F821
+
+c.InteractiveShellApp.exec_files = ['/etc/ipython/warm_kernel.py']
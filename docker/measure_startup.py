@@ -0,0 +1,143 @@
+import argparse
+import json
+import os
+import secrets
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+import uuid
+from datetime import datetime, timezone
+
+try:
+    import websocket  # websocket-client, installed along with jupyter_server
+except ImportError:
+    websocket = None
+
+# What the first cell of the course notebooks does
+FIRST_CELL = '''
+import json
+import boto3
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+ec2 = boto3.client('ec2')
+iam = boto3.client('iam')
+'''
+TIMEOUT = 120
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_server(base_url, token, deadline):
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base_url}/api/status?token={token}", timeout=2) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.05)
+    raise TimeoutError('Jupyter did not answer')
+
+
+def message(msg_type, session, content):
+    return {
+        'header': {'msg_id': uuid.uuid4().hex, 'msg_type': msg_type, 'session': session, 'username': 'measure',
+                   'version': '5.3', 'date': datetime.now(timezone.utc).isoformat()},
+        'parent_header': {}, 'metadata': {}, 'content': content, 'channel': 'shell', 'buffers': [],
+    }
+
+
+def request(connection, msg_type, session, content, deadline):
+    # Sends a shell request and waits for its reply
+    sent = message(msg_type, session, content)
+    connection.send(json.dumps(sent))
+    reply_type = msg_type.replace('_request', '_reply')
+    while time.monotonic() < deadline:
+        received = json.loads(connection.recv())
+        if received['msg_type'] == reply_type and received['parent_header'].get('msg_id') == sent['header']['msg_id']:
+            return received['content']
+    raise TimeoutError(f"No {reply_type}")
+
+
+def measure(image, fast_start, docker_socket, think_time):
+    # Container start -> Jupyter answering -> kernel ready -> first cell executed, as a
+    # user opening a notebook and running its first cell right away would see it
+    port, token = free_port(), secrets.token_hex(16)
+    command = ['docker', 'run', '-d', '--rm', '--privileged', '-p', f"127.0.0.1:{port}:8888",
+               '-e', f"JUPYTER_TOKEN={token}", '-e', f"FAST_START={'1' if fast_start else '0'}",
+               # Placeholders, so no credential lookup (instance metadata) slows the cell down
+               '-e', 'AWS_ACCESS_KEY_ID=measure', '-e', 'AWS_SECRET_ACCESS_KEY=measure', '-e', 'AWS_DEFAULT_REGION=us-east-1']
+    if docker_socket:
+        command += ['-v', '/var/run/docker.sock:/var/run/docker.sock']
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.monotonic()
+    deadline = started + TIMEOUT
+    container = subprocess.run(command + [image], check=True, capture_output=True, text=True).stdout.strip()
+    try:
+        wait_for_server(base_url, token, deadline)
+        server_ready = time.monotonic()
+        create = urllib.request.Request(f"{base_url}/api/kernels?token={token}", data=b'{}', method='POST',
+                                        headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(create, timeout=TIMEOUT) as response:
+            kernel_id = json.load(response)['id']
+        connection = websocket.create_connection(
+            f"ws://127.0.0.1:{port}/api/kernels/{kernel_id}/channels?token={token}", timeout=TIMEOUT
+        )
+        session = uuid.uuid4().hex
+        request(connection, 'kernel_info_request', session, {}, deadline)
+        kernel_ready = time.monotonic()
+        time.sleep(think_time)
+        cell_started = time.monotonic()
+        reply = request(connection, 'execute_request', session, {
+            'code': FIRST_CELL, 'silent': False, 'store_history': True,
+            'user_expressions': {}, 'allow_stdin': False, 'stop_on_error': True,
+        }, deadline + think_time)
+        cell_done = time.monotonic()
+        connection.close()
+        if reply['status'] != 'ok':
+            raise RuntimeError(f"First cell failed: {reply.get('ename')}: {reply.get('evalue')}")
+    finally:
+        subprocess.run(['docker', 'rm', '-f', container], capture_output=True)
+    return {
+        'server_ready_s': server_ready - started,
+        'kernel_ready_s': kernel_ready - started,
+        'first_cell_s': cell_done - cell_started,
+        'total_s': cell_done - started - think_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure container start to first notebook cell executed')
+    parser.add_argument('image', nargs='?', default='demo-notebook')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--mode', choices=['fast', 'plain', 'both'], default='both',
+                        help='with warm kernels (fast), without them (plain) or both')
+    parser.add_argument('--think-time', type=float, default=0,
+                        help='seconds between the kernel being ready and running the first cell')
+    parser.add_argument('--no-docker-socket', action='store_true',
+                        help="start the container's own Docker daemon instead of mounting the host socket")
+    args = parser.parse_args()
+    if websocket is None:
+        print('❌ websocket-client is required: pip install websocket-client', file=sys.stderr)
+        sys.exit(1)
+    docker_socket = not args.no_docker_socket and os.path.exists('/var/run/docker.sock')
+
+    modes = {'fast': [True], 'plain': [False], 'both': [False, True]}[args.mode]
+    print(f"{'Mode':<6} {'Server ready':>12} {'Kernel ready':>12} {'First cell':>10} {'Total':>8}")
+    for fast_start in modes:
+        runs = [measure(args.image, fast_start, docker_socket, args.think_time) for _ in range(args.runs)]
+        median = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+        print(f"{'fast' if fast_start else 'plain':<6} {median['server_ready_s']:>11.2f}s {median['kernel_ready_s']:>11.2f}s "
+              f"{median['first_cell_s']:>9.2f}s {median['total_s']:>7.2f}s")
+
+
+if __name__ == '__main__':
+    main()
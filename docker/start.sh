@@ -0,0 +1,26 @@
+#!/bin/bash
+# Entrypoint of the notebook image: Docker daemon (unless the host's socket is
+# mounted) and then Jupyter.
+
+DOCKER_READY_TIMEOUT=${DOCKER_READY_TIMEOUT:-30}
+
+docker_ready() {
+    timeout 2 docker info >/dev/null 2>&1
+}
+
+if docker_ready; then
+    echo "Using the Docker daemon of the mounted socket"
+else
+    service docker start || echo "Could not start the Docker daemon (is the container --privileged?)" >&2
+    # Readiness probe instead of a fixed sleep: Jupyter starts as soon as the daemon answers
+    deadline=$((SECONDS + DOCKER_READY_TIMEOUT))
+    until docker_ready; do
+        if [ "$SECONDS" -ge "$deadline" ]; then
+            echo "Docker daemon not ready after ${DOCKER_READY_TIMEOUT}s, starting Jupyter without it" >&2
+            break
+        fi
+        sleep 0.2
+    done
+fi
+
+exec jupyter notebook --ip=0.0.0.0 --no-browser --allow-root
@@ -0,0 +1,45 @@
+# Runs at the start of every kernel of the image (ipython_kernel_config.py). The modules
+# of the course and the boto3 service models of the notebooks are loaded in a background
+# thread: the kernel is ready at once, and the first cell only waits for what is still
+# loading instead of starting cold. FAST_START=0 turns it off.
+import os as _os
+import threading as _threading
+
+
+def _warm_kernel():
+    import importlib
+    import os
+    for name in ('boto3', 'numpy', 'pandas', 'matplotlib.pyplot', 'paramiko'):
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass
+    # Clients of the default session share its loader, so the models and endpoint rules
+    # parsed here are reused by every boto3.client() and boto3.resource() of the notebooks
+    try:
+        import boto3
+        region = os.environ.get('AWS_DEFAULT_REGION') or 'us-east-1'
+        for service in ('ec2', 'ecr', 'ecs', 'iam', 'kms', 'lambda', 's3', 'ssm', 'sts'):
+            boto3.client(service, region_name=region)
+        boto3.resource('ec2', region_name=region)
+    except Exception:
+        pass
+
+
+def _wait_before_first_cell(thread):
+    # Creating clients of the default session is not thread-safe, so no cell runs while
+    # the warm-up still uses it
+    shell = get_ipython()  # noqa: F821
+
+    def wait(*args):
+        thread.join()
+        shell.events.unregister('pre_run_cell', wait)
+    shell.events.register('pre_run_cell', wait)
+
+
+if _os.environ.get('FAST_START', '1') != '0':
+    _thread = _threading.Thread(target=_warm_kernel, name='warm-kernel', daemon=True)
+    _thread.start()
+    _wait_before_first_cell(_thread)
+    del _thread
+del _os, _threading, _warm_kernel, _wait_before_first_cell
@@ -1,87 +1,106 @@
-import boto3
 from botocore.exceptions import ClientError
+from instrumentation import tracer
 
-# Initialize EC2 client
-ec2 = boto3.client('ec2')
+# Time every AWS call and step; output goes to the configured sinks
+tracer.instrument()
 
 # Specify your VPC and subnet IDs
 VPC_ID = '<your_vpc_id>'
 SUBNET_ID = '<your_subnet_id>'
-
-# Read the contents of docker_install.sh
-with open('scripts/docker_install.sh', 'r') as file:
-    docker_install_script = file.read()
-
-# Create or get existing security group
+AMI_ID = '<your_ami_id>'  # Sugested Ubuntu on us-east-1 ami-04a81a99f5ec58529
 SECURITY_GROUP_NAME = 'EC2-InstanceConnect-SG'
 
-try:
-    print("Creating security group... 🛡️")
-    security_group = ec2.create_security_group(
-        GroupName=SECURITY_GROUP_NAME,
-        Description='Security group for EC2 Instance Connect',
-        VpcId=VPC_ID
-    )
-    print("Security group created! Adding inbound rule for SSH... 🔒")
-    ec2.authorize_security_group_ingress(
-        GroupId=security_group['GroupId'],
-        IpPermissions=[
-            {
-                'IpProtocol': 'tcp',
-                'FromPort': 22,
-                'ToPort': 22,
-                'IpRanges': [{'CidrIp': '18.206.107.24/29'}]  # EC2 Instance Connect IP range
-            }
-        ]
-    )
-    print("Inbound rule added! 🎉")
-except ClientError as e:
-    if e.response['Error']['Code'] == 'InvalidGroup.Duplicate':
-        print("Security group already exists. Using existing group. ✅")
-        security_groups = ec2.describe_security_groups(
-            Filters=[
-                {'Name': 'group-name', 'Values': [SECURITY_GROUP_NAME]},
-                {'Name': 'vpc-id', 'Values': [VPC_ID]}
+# Create or get existing security group
+@tracer.step()
+def create_security_group(ec2):
+    try:
+        tracer.event("Creating security group... 🛡️")
+        security_group = ec2.create_security_group(
+            GroupName=SECURITY_GROUP_NAME,
+            Description='Security group for EC2 Instance Connect',
+            VpcId=VPC_ID
+        )
+        tracer.event("Security group created! Adding inbound rule for SSH... 🔒")
+        ec2.authorize_security_group_ingress(
+            GroupId=security_group['GroupId'],
+            IpPermissions=[
+                {
+                    'IpProtocol': 'tcp',
+                    'FromPort': 22,
+                    'ToPort': 22,
+                    'IpRanges': [{'CidrIp': '18.206.107.24/29'}]  # EC2 Instance Connect IP range
+                }
             ]
-        )['SecurityGroups']
-        if security_groups:
-            security_group = security_groups[0]
+        )
+        tracer.event("Inbound rule added! 🎉")
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'InvalidGroup.Duplicate':
+            tracer.event("Security group already exists. Using existing group. ✅")
+            security_groups = ec2.describe_security_groups(
+                Filters=[
+                    {'Name': 'group-name', 'Values': [SECURITY_GROUP_NAME]},
+                    {'Name': 'vpc-id', 'Values': [VPC_ID]}
+                ]
+            )['SecurityGroups']
+            if security_groups:
+                security_group = security_groups[0]
+            else:
+                raise Exception(f"Security group {SECURITY_GROUP_NAME} not found in VPC {VPC_ID}")
         else:
-            raise Exception(f"Security group {SECURITY_GROUP_NAME} not found in VPC {VPC_ID}")
-    else:
-        raise e
+            raise e
+    return security_group
+
 
 # Launch EC2 instance
-try:
-    print("Launching EC2 instance... 🚀")
-    user_data_script = f'''#!/bin/bash
-        yum update -y
-        yum install -y ec2-instance-connect
-        echo "Instance launched with EC2 Instance Connect installed" > /var/log/user-data.log
+@tracer.step()
+def launch_instance(ec2, security_group):
+    # Read the contents of docker_install.sh
+    with open('scripts/docker_install.sh', 'r') as file:
+        docker_install_script = file.read()
+
+    try:
+        tracer.event("Launching EC2 instance... 🚀")
+        user_data_script = f'''#!/bin/bash
+            yum update -y
+            yum install -y ec2-instance-connect
+            echo "Instance launched with EC2 Instance Connect installed" > /var/log/user-data.log
+
+            # Docker installation script
+            {docker_install_script}
+        '''
+
+        response = ec2.run_instances(
+            ImageId=AMI_ID,
+            InstanceType='t2.micro',
+            MinCount=1,
+            MaxCount=1,
+            UserData=user_data_script,
+            NetworkInterfaces=[{
+                'SubnetId': SUBNET_ID,
+                'DeviceIndex': 0,
+                'AssociatePublicIpAddress': True,
+                'Groups': [security_group['GroupId']]
+            }]
+        )
+
+        instance_id = response['Instances'][0]['InstanceId']
+        tracer.event(f"EC2 instance created with ID: {instance_id} 🎊")
 
-        # Docker installation script
-        {docker_install_script}
-    '''
+        tracer.event("Setup complete. The instance is launching. ⏳")
+        tracer.event("Docker will be installed during the instance launch. 🐳")
+        tracer.event("You should be able to connect using EC2 Instance Connect once it's ready. 🔌")
+        return True
+    except ClientError as e:
+        tracer.event(f"Error launching EC2 instance: {e} ❌", level='error')
+        return False
 
-    response = ec2.run_instances(
-        ImageId='<your_ami_id>', #Sugested Ubuntu on us-east-1 ami-04a81a99f5ec58529
-        InstanceType='t2.micro',
-        MinCount=1,
-        MaxCount=1,
-        UserData=user_data_script,
-        NetworkInterfaces=[{
-            'SubnetId': SUBNET_ID,
-            'DeviceIndex': 0,
-            'AssociatePublicIpAddress': True,
-            'Groups': [security_group['GroupId']]
-        }]
-    )
 
-    instance_id = response['Instances'][0]['InstanceId']
-    print(f"EC2 instance created with ID: {instance_id} 🎊")
+def main(session=None):
+    # Without a target session, run on the instrumented boto3 default session
+    session = session or tracer.instrument()
+    ec2 = session.client('ec2')
+    security_group = create_security_group(ec2)
+    return launch_instance(ec2, security_group)
 
-    print("Setup complete. The instance is launching. ⏳")
-    print("Docker will be installed during the instance launch. 🐳")
-    print("You should be able to connect using EC2 Instance Connect once it's ready. 🔌")
-except ClientError as e:
-    print(f"Error launching EC2 instance: {e} ❌")
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
-import boto3
 import json
 import time
 from botocore.exceptions import ClientError
+from instrumentation import tracer
+
+# Time every AWS call and step; output goes to the configured sinks
+tracer.instrument()
 
 # Placeholder variables for the hardcoded values
 VPC_ID = '<your_vpc_id>'
@@ -9,13 +12,15 @@ SUBNET_ID = '<your_subnet_id>'
 SECURITY_GROUP_NAME = 'UbuntuSessionManagerSG'
 IAM_ROLE_NAME = 'SSMInstanceRole'
 IAM_INSTANCE_PROFILE_NAME = 'SSMInstanceProfile'
+AMI_ID = 'ami-04a81a99f5ec58529'  # Ubuntu on us-east-1
 
-def create_iam_role_and_instance_profile():
-    iam = boto3.client('iam')
+@tracer.step()
+def create_iam_role_and_instance_profile(session):
+    iam = session.client('iam')
     
     # Create IAM role
     try:
-        print("Creating IAM role... 👤")
+        tracer.event("Creating IAM role... 👤")
         trust_relationship = {
             "Version": "2012-10-17",
             "Statement": [
@@ -31,46 +36,47 @@ def create_iam_role_and_instance_profile():
             RoleName=IAM_ROLE_NAME,
             AssumeRolePolicyDocument=json.dumps(trust_relationship)
         )
-        print(f"IAM role '{IAM_ROLE_NAME}' created. ✅")
+        tracer.event(f"IAM role '{IAM_ROLE_NAME}' created. ✅")
 
         # Attach the AmazonSSMManagedInstanceCore policy
-        print("Attaching AmazonSSMManagedInstanceCore policy... 📄")
+        tracer.event("Attaching AmazonSSMManagedInstanceCore policy... 📄")
         iam.attach_role_policy(
             RoleName=IAM_ROLE_NAME,
             PolicyArn='arn:aws:iam::aws:policy/AmazonSSMManagedInstanceCore'
         )
-        print("Policy attached. 🔒")
+        tracer.event("Policy attached. 🔒")
 
         # Create the instance profile
-        print("Creating instance profile... 📂")
+        tracer.event("Creating instance profile... 📂")
         iam.create_instance_profile(InstanceProfileName=IAM_INSTANCE_PROFILE_NAME)
-        print(f"Instance profile '{IAM_INSTANCE_PROFILE_NAME}' created. ✅")
+        tracer.event(f"Instance profile '{IAM_INSTANCE_PROFILE_NAME}' created. ✅")
 
         # Add the role to the instance profile
-        print("Adding role to instance profile... 🔗")
+        tracer.event("Adding role to instance profile... 🔗")
         iam.add_role_to_instance_profile(
             InstanceProfileName=IAM_INSTANCE_PROFILE_NAME,
             RoleName=IAM_ROLE_NAME
         )
-        print(f"Role '{IAM_ROLE_NAME}' added to instance profile. 🔗")
+        tracer.event(f"Role '{IAM_ROLE_NAME}' added to instance profile. 🔗")
 
         # Wait for the instance profile to become available
-        print("Waiting for the instance profile to become available... ⏳")
+        tracer.event("Waiting for the instance profile to become available... ⏳")
         time.sleep(10)
 
     except ClientError as e:
         if e.response['Error']['Code'] == 'EntityAlreadyExists':
-            print("IAM role or instance profile already exists. Continuing... ✅")
+            tracer.event("IAM role or instance profile already exists. Continuing... ✅")
         else:
-            print(f"Error creating IAM role or instance profile: {e} ❌")
+            tracer.event(f"Error creating IAM role or instance profile: {e} ❌", level='error')
             return False
 
     return True
 
-def get_or_create_security_group():
-    ec2 = boto3.client('ec2')
+@tracer.step()
+def get_or_create_security_group(session):
+    ec2 = session.client('ec2')
     try:
-        print("Checking for existing security group... 🔍")
+        tracer.event("Checking for existing security group... 🔍")
         response = ec2.describe_security_groups(
             Filters=[
                 {'Name': 'group-name', 'Values': [SECURITY_GROUP_NAME]},
@@ -80,10 +86,10 @@ def get_or_create_security_group():
         
         if response['SecurityGroups']:
             security_group_id = response['SecurityGroups'][0]['GroupId']
-            print(f"Existing security group found with ID: {security_group_id} 🔒")
+            tracer.event(f"Existing security group found with ID: {security_group_id} 🔒")
             return security_group_id
         
-        print("Creating new security group... 🛡️")
+        tracer.event("Creating new security group... 🛡️")
         security_group = ec2.create_security_group(
             GroupName=SECURITY_GROUP_NAME,
             Description='Security group for Ubuntu with Session Manager access',
@@ -93,7 +99,7 @@ def get_or_create_security_group():
         security_group_id = security_group['GroupId']
 
         try:
-            print("Authorizing egress rules for the security group... 🔓")
+            tracer.event("Authorizing egress rules for the security group... 🔓")
             ec2.authorize_security_group_egress(
                 GroupId=security_group_id,
                 IpPermissions=[
@@ -108,21 +114,22 @@ def get_or_create_security_group():
         except ClientError as e:
             if e.response['Error']['Code'] != 'InvalidPermission.Duplicate':
                 raise
-            print("Egress rule already exists, continuing... ✅")
+            tracer.event("Egress rule already exists, continuing... ✅")
 
-        print(f"New security group created with ID: {security_group_id} 🆕")
+        tracer.event(f"New security group created with ID: {security_group_id} 🆕")
         return security_group_id
     except ClientError as e:
-        print(f"Error handling security group: {e} ❌")
+        tracer.event(f"Error handling security group: {e} ❌", level='error')
         return None
 
-def create_ubuntu_instance(security_group_id):
-    ec2 = boto3.resource('ec2')
+@tracer.step()
+def create_ubuntu_instance(session, security_group_id):
+    ec2 = session.resource('ec2')
     
     try:
-        print("Creating Ubuntu instance... 🖥️")
+        tracer.event("Creating Ubuntu instance... 🖥️")
         instances = ec2.create_instances(
-            ImageId='ami-04a81a99f5ec58529',  # Ubuntu on us-east-1
+            ImageId=AMI_ID,
             InstanceType='t2.micro',
             MinCount=1,
             MaxCount=1,
@@ -154,33 +161,38 @@ def create_ubuntu_instance(security_group_id):
         )
         
         instance = instances[0]
-        print("Waiting for instance to start... ⏳")
+        tracer.event("Waiting for instance to start... ⏳")
         instance.wait_until_running()
         instance.reload()
         
-        print(f"Ubuntu instance created with ID: {instance.id} 🎉")
-        print(f"Private IP: {instance.private_ip_address} 📍")
-        print(f"Public IP: {instance.public_ip_address} 🌐")
+        tracer.event(f"Ubuntu instance created with ID: {instance.id} 🎉")
+        tracer.event(f"Private IP: {instance.private_ip_address} 📍")
+        tracer.event(f"Public IP: {instance.public_ip_address} 🌐")
 
         return instance
     except ClientError as e:
-        print(f"Error creating the instance: {e} ❌")
+        tracer.event(f"Error creating the instance: {e} ❌", level='error')
         return None
 
-def main():
-    print("Starting IAM role, security group, and instance setup... 🚀")
-    if create_iam_role_and_instance_profile():
-        security_group_id = get_or_create_security_group()
+def main(session=None):
+    # Without a target session, run on the instrumented boto3 default session
+    session = session or tracer.instrument()
+    tracer.event("Starting IAM role, security group, and instance setup... 🚀")
+    if create_iam_role_and_instance_profile(session):
+        security_group_id = get_or_create_security_group(session)
         if security_group_id:
-            instance = create_ubuntu_instance(security_group_id)
+            instance = create_ubuntu_instance(session, security_group_id)
             if instance:
-                print("Ubuntu instance created successfully for use with Session Manager. 🎊")
+                tracer.event("Ubuntu instance created successfully for use with Session Manager. 🎊")
+                return True
             else:
-                print("Failed to create the Ubuntu instance. 😢")
+                tracer.event("Failed to create the Ubuntu instance. 😢", level='error')
         else:
-            print("Failed to get or create the security group. 😢")
+            tracer.event("Failed to get or create the security group. 😢", level='error')
     else:
-        print("Failed to create IAM role or instance profile. 😢")
+        tracer.event("Failed to create IAM role or instance profile. 😢", level='error')
+
+    return False
 
 if __name__ == "__main__":
     main()
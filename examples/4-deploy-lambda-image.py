@@ -1,38 +1,66 @@
-import boto3
-import base64
 import os
+import hashlib
 import subprocess
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from ecr_auth import ensure_docker_login
+from instrumentation import tracer
 
-# Initialize boto3 clients
-ecr_client = boto3.client('ecr')
-lambda_client = boto3.client('lambda')
-iam_client = boto3.client('iam')
+# Time every AWS call and step; output goes to the configured sinks
+tracer.instrument()
+
+# boto3 clients for the target account and region, bound by use_session()
+ecr_client = None
+lambda_client = None
+iam_client = None
+
+# Files that never affect the image and must not change its content hash
+CONTEXT_IGNORE = {'__pycache__', '.git', '.DS_Store'}
+# Tag in each repository holding the BuildKit layer cache
+BUILD_CACHE_TAG = 'buildcache'
+# BuildKit builder created for the deploys when the active one cannot export a cache
+BUILDER_NAME = 'lambda-deploy'
+MAX_PARALLEL_DEPLOYS = 4
+
+_login_lock = threading.Lock()
+_logged_in_registries = set()
+_builder_lock = threading.Lock()
+_builder = {}
+
+def use_session(session):
+    # Every step uses these clients, so a deploy goes wherever the session points
+    global ecr_client, lambda_client, iam_client
+    ecr_client = session.client('ecr')
+    lambda_client = session.client('lambda')
+    iam_client = session.client('iam')
 
 def print_docker_info():
-    print("\n🐳 About Docker and Containers:")
-    print("  • Docker is a platform for developing, shipping, and running applications in containers")
-    print("  • Containers are lightweight, standalone, executable packages that include everything needed to run an application")
-    print("  • Key components of Docker:")
-    print("    - Dockerfile: A text file with instructions to build a Docker image")
-    print("    - Docker Image: A read-only template with instructions for creating a Docker container")
-    print("    - Docker Container: A runnable instance of a Docker image")
-    print("  • Benefits of using Docker with Lambda:")
-    print("    - Consistent environment across development and production")
-    print("    - Easy management of dependencies and libraries")
-    print("    - Ability to use any programming language or framework")
-    print("    - Simplified deployment process")
-    print("    - Improved isolation and security")
+    tracer.event("\n🐳 About Docker and Containers:")
+    tracer.event("  • Docker is a platform for developing, shipping, and running applications in containers")
+    tracer.event("  • Containers are lightweight, standalone, executable packages that include everything needed to run an application")
+    tracer.event("  • Key components of Docker:")
+    tracer.event("    - Dockerfile: A text file with instructions to build a Docker image")
+    tracer.event("    - Docker Image: A read-only template with instructions for creating a Docker container")
+    tracer.event("    - Docker Container: A runnable instance of a Docker image")
+    tracer.event("  • Benefits of using Docker with Lambda:")
+    tracer.event("    - Consistent environment across development and production")
+    tracer.event("    - Easy management of dependencies and libraries")
+    tracer.event("    - Ability to use any programming language or framework")
+    tracer.event("    - Simplified deployment process")
+    tracer.event("    - Improved isolation and security")
 
 # Step 0: Create or get IAM role
+@tracer.step()
 def create_or_get_lambda_role(role_name):
-    print(f"\n👤 Checking for IAM role: {role_name}")
+    tracer.event(f"\n👤 Checking for IAM role: {role_name}")
     try:
         response = iam_client.get_role(RoleName=role_name)
-        print(f"✅ Role {role_name} already exists")
+        tracer.event(f"✅ Role {role_name} already exists")
         return response['Role']['Arn']
     except iam_client.exceptions.NoSuchEntityException:
-        print(f"🆕 Creating new role: {role_name}")
+        tracer.event(f"🆕 Creating new role: {role_name}")
         assume_role_policy = {
             "Version": "2012-10-17",
             "Statement": [
@@ -56,146 +84,362 @@ def create_or_get_lambda_role(role_name):
             PolicyArn='arn:aws:iam::aws:policy/service-role/AWSLambdaBasicExecutionRole'
         )
         
-        print(f"✅ Role {role_name} created successfully")
+        tracer.event(f"✅ Role {role_name} created successfully")
         return response['Role']['Arn']
 
 # Step 1: Create ECR repository
+@tracer.step()
 def create_ecr_repository(repo_name):
-    print(f"\n🚀 Creating ECR repository: {repo_name}")
+    tracer.event(f"\n🚀 Creating ECR repository: {repo_name}")
     try:
         response = ecr_client.create_repository(repositoryName=repo_name)
-        print(f"✅ Repository created successfully!")
+        tracer.event(f"✅ Repository created successfully!")
         return response['repository']['repositoryUri']
     except ecr_client.exceptions.RepositoryAlreadyExistsException:
-        print(f"ℹ️ Repository already exists. Fetching URI...")
+        tracer.event(f"ℹ️ Repository already exists. Fetching URI...")
         return ecr_client.describe_repositories(repositoryNames=[repo_name])['repositories'][0]['repositoryUri']
 
 # Step 2: Build and push Docker image to ECR
-def build_and_push_image(repo_uri, dockerfile_path, image_tag):
-    print("\n🏗️ Building and Pushing Docker Image:")
-    print("  1. Authenticate with Amazon ECR")
-    print("  2. Build the Docker image")
-    print("  3. Tag the image")
-    print("  4. Push the image to ECR")
-
-    print(f"\n🔑 Getting ECR login token...")
-    token = ecr_client.get_authorization_token()
-    username, password = base64.b64decode(token['authorizationData'][0]['authorizationToken']).decode().split(':')
-    registry = token['authorizationData'][0]['proxyEndpoint']
-
-    print(f"\n🏗️ Building Docker image...")
-    print("  • Reading instructions from Dockerfile:")
-    with open(os.path.join('lambda', dockerfile_path), 'r') as dockerfile:
-        print(dockerfile.read())
-    print("  • Installing dependencies specified in requirements.txt")
-    print("  • Copying Lambda function code into the image")
-    print("  • Setting up the Lambda runtime environment")
-    subprocess.run(['docker', 'build', '-t', f'{repo_uri}:{image_tag}', '-f', dockerfile_path, '.'], cwd='lambda', check=True)
-    print(f"✅ Docker image built successfully!")
-
-    print(f"\n🔐 Logging in to ECR...")
-    print("  • Authenticating with Amazon ECR")
-    subprocess.run(['docker', 'login', '--username', username, '--password', password, registry], check=True)
-    print(f"✅ Logged in to ECR successfully!")
-
-    print(f"\n⬆️ Pushing image to ECR...")
-    print("  • Uploading Docker image layers to ECR repository")
-    print("  • This may take a few minutes depending on image size and internet speed")
-    subprocess.run(['docker', 'push', f'{repo_uri}:{image_tag}'], check=True)
-    print(f"✅ Image pushed to ECR successfully!")
-
-# Step 3: Create and deploy Lambda function
-def create_lambda_function(function_name, repo_uri, image_tag, role_arn):
-    print(f"\n⚙️ Creating Lambda function: {function_name}")
-    print("\n📊 Lambda Function Properties:")
-    print("  • Timeout: 30 seconds (maximum execution time for each invocation)")
-    print("  • Memory: 256 MB (affects CPU power and pricing)")
-    print("  • Package Type: Image (using container image from ECR)")
-    print("  • Runtime: Defined by the container image")
-    print("  • Handler: Defined in the Dockerfile CMD")
-    print("  • Environment Variables: Set for configuration")
-    print("  • Tracing: X-Ray tracing enabled for debugging")
-    print("  • Tags: Added for resource management")
-    
-    response = lambda_client.create_function(
-        FunctionName=function_name,
-        PackageType='Image',
-        Code={'ImageUri': f'{repo_uri}:{image_tag}'},
-        Role=role_arn,
-        Timeout=30,
-        MemorySize=256,
-        Environment={
+def compute_context_hash(context_dir, dockerfile_path):
+    # Content hash of everything that ends up in the image: Dockerfile, requirements and sources.
+    # Identical contexts produce identical tags, so unchanged images are never rebuilt or pushed.
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(context_dir):
+        dirs[:] = sorted(d for d in dirs if d not in CONTEXT_IGNORE)
+        for name in sorted(files):
+            if name in CONTEXT_IGNORE or name.endswith('.pyc'):
+                continue
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, context_dir).encode())
+            with open(path, 'rb') as file:
+                digest.update(hashlib.sha256(file.read()).digest())
+    digest.update(dockerfile_path.encode())
+    # docker reads -f relative to the context (its cwd); a Dockerfile kept outside it
+    # was not walked above, so its contents count here
+    dockerfile = os.path.abspath(os.path.join(context_dir, dockerfile_path))
+    if os.path.relpath(dockerfile, os.path.abspath(context_dir)).startswith(os.pardir):
+        with open(dockerfile, 'rb') as file:
+            digest.update(hashlib.sha256(file.read()).digest())
+    return digest.hexdigest()[:16]
+
+def image_exists(repo_name, image_tag):
+    try:
+        ecr_client.describe_images(repositoryName=repo_name, imageIds=[{'imageTag': image_tag}])
+        return True
+    except ecr_client.exceptions.ImageNotFoundException:
+        return False
+
+def docker_login(registry):
+    # Several builds may target the same registry; check once per process. Tokens are
+    # cached encrypted on disk and docker's own credential store is reused when valid.
+    with _login_lock:
+        if registry in _logged_in_registries:
+            return
+        ensure_docker_login(ecr_client, registry)
+        _logged_in_registries.add(registry)
+
+def run_streaming(command, cwd, label):
+    # Streams BuildKit progress line by line instead of waiting for the command to finish
+    process = subprocess.Popen(command, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    for line in process.stdout:
+        tracer.event(f"  [{label}] {line.rstrip()}")
+    if process.wait() != 0:
+        raise subprocess.CalledProcessError(process.returncode, command)
+
+def buildx_driver(builder=None):
+    result = subprocess.run(['docker', 'buildx', 'inspect'] + ([builder] if builder else []), capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    for line in result.stdout.splitlines():
+        if line.startswith('Driver:'):
+            return line.split(':', 1)[1].strip()
+    return None
+
+def select_builder():
+    # Exporting the layer cache to ECR (--cache-to) needs a builder with the docker-container
+    # driver; Docker's default 'docker' driver rejects it. A dedicated builder is created once
+    # and passed with --builder, so the user's default builder is left untouched.
+    # Returns the extra build arguments, or None when no builder can export the cache.
+    if buildx_driver() not in (None, 'docker'):
+        return []
+    if buildx_driver(BUILDER_NAME) is None:
+        created = subprocess.run(['docker', 'buildx', 'create', '--name', BUILDER_NAME, '--driver', 'docker-container'],
+                                 capture_output=True, text=True)
+        if created.returncode != 0:
+            tracer.event(f"⚠️ Could not create a docker-container builder, building without exporting the layer cache: {created.stderr.strip()}", level='error')
+            return None
+    tracer.event(f"🧱 Using BuildKit builder '{BUILDER_NAME}' (docker-container driver) to export the layer cache")
+    return ['--builder', BUILDER_NAME]
+
+def cache_builder_args():
+    # Parallel deploys share the builder; it is selected once per process
+    with _builder_lock:
+        if 'args' not in _builder:
+            _builder['args'] = select_builder()
+        return _builder['args']
+
+def retag_image(repo_name, source_tag, target_tag):
+    # Moves target_tag (e.g. 'latest') to the image server-side, without pulling or pushing layers
+    image = ecr_client.batch_get_image(repositoryName=repo_name, imageIds=[{'imageTag': source_tag}])['images'][0]
+    put_image_args = {'repositoryName': repo_name, 'imageManifest': image['imageManifest'], 'imageTag': target_tag}
+    if image.get('imageManifestMediaType'):
+        put_image_args['imageManifestMediaType'] = image['imageManifestMediaType']
+    try:
+        ecr_client.put_image(**put_image_args)
+        tracer.event(f"🏷️ Tag '{target_tag}' now points to {source_tag}")
+    except ecr_client.exceptions.ImageAlreadyExistsException:
+        tracer.event(f"ℹ️ Tag '{target_tag}' already points to {source_tag}")
+
+@tracer.step()
+def build_and_push_image(repo_uri, dockerfile_path, context_dir='lambda', alias_tag='latest'):
+    tracer.event("\n🏗️ Building and Pushing Docker Image:")
+    tracer.event("  1. Compute a content hash of the build context")
+    tracer.event("  2. Skip everything if ECR already has an image with that hash")
+    tracer.event("  3. Authenticate with Amazon ECR")
+    tracer.event("  4. Build with BuildKit, reusing the layer cache stored in ECR, and push")
+
+    repo_name = repo_uri.split('/', 1)[1]
+    registry = repo_uri.split('/', 1)[0]
+    image_tag = f"ctx-{compute_context_hash(context_dir, dockerfile_path)}"
+    tracer.event(f"\n🧮 Build context hash tag: {image_tag}")
+
+    if image_exists(repo_name, image_tag):
+        tracer.event(f"✅ Image {repo_uri}:{image_tag} already in ECR. Skipping build and push.")
+    else:
+        docker_login(registry)
+        tracer.event(f"\n🏗️ Building and pushing Docker image...")
+        tracer.event("  • Installing dependencies specified in requirements.txt")
+        tracer.event("  • Copying Lambda function code into the image")
+        tracer.event("  • Reusing cached layers from the registry when possible")
+        cache_ref = f"{repo_uri}:{BUILD_CACHE_TAG}"
+        builder_args = cache_builder_args()
+        cache_args = ['--cache-from', f'type=registry,ref={cache_ref}']
+        if builder_args is not None:
+            cache_args += ['--cache-to', f'type=registry,ref={cache_ref},mode=max,image-manifest=true,oci-mediatypes=true']
+        run_streaming([
+            'docker', 'buildx', 'build',
+            *(builder_args or []),
+            '--platform', 'linux/amd64',
+            '--provenance=false',  # Lambda only accepts single-platform Docker v2 / OCI manifests
+            '--progress=plain',
+            *cache_args,
+            '--tag', f'{repo_uri}:{image_tag}',
+            '--push',
+            '-f', dockerfile_path,
+            '.'
+        ], cwd=context_dir, label=repo_name)
+        tracer.event(f"✅ Image pushed to ECR successfully!")
+
+    if alias_tag:
+        retag_image(repo_name, image_tag, alias_tag)
+    return image_tag
+
+# Step 3: Create or update the Lambda function
+def function_configuration(role_arn):
+    return {
+        'Role': role_arn,
+        'Timeout': 30,
+        'MemorySize': 256,
+        'Environment': {
             'Variables': {
                 'ENV': 'production',
                 'LOG_LEVEL': 'INFO'
             }
         },
-        TracingConfig={
+        'TracingConfig': {
             'Mode': 'Active'
-        },
-        Tags={
-            'Environment': 'Production',
-            'Project': 'Serverless Demo'
         }
+    }
+
+def get_function(function_name):
+    try:
+        return lambda_client.get_function(FunctionName=function_name)
+    except lambda_client.exceptions.ResourceNotFoundException:
+        return None
+
+def configuration_changed(current, desired):
+    return (
+        current['Role'] != desired['Role']
+        or current['Timeout'] != desired['Timeout']
+        or current['MemorySize'] != desired['MemorySize']
+        or current.get('Environment', {}).get('Variables', {}) != desired['Environment']['Variables']
+        or current.get('TracingConfig', {}).get('Mode') != desired['TracingConfig']['Mode']
     )
-    
-    print(f"\n✅ Lambda function created successfully!")
-    return response['FunctionArn']
+
+def point_alias(function_name, alias_name, version):
+    try:
+        alias = lambda_client.get_alias(FunctionName=function_name, Name=alias_name)
+        if alias['FunctionVersion'] == version:
+            tracer.event(f"ℹ️ Alias '{alias_name}' already serves version {version}")
+            return alias['AliasArn']
+        tracer.event(f"🔀 Shifting alias '{alias_name}' from version {alias['FunctionVersion']} to {version}")
+        return lambda_client.update_alias(FunctionName=function_name, Name=alias_name, FunctionVersion=version)['AliasArn']
+    except lambda_client.exceptions.ResourceNotFoundException:
+        tracer.event(f"🆕 Creating alias '{alias_name}' for version {version}")
+        return lambda_client.create_alias(FunctionName=function_name, Name=alias_name, FunctionVersion=version)['AliasArn']
+
+def configure_provisioned_concurrency(function_name, alias_name, executions, timeout=600):
+    # Keeps pre-initialized environments behind the alias so live traffic never hits a cold start
+    tracer.event(f"🔥 Requesting {executions} provisioned environments for alias '{alias_name}'")
+    lambda_client.put_provisioned_concurrency_config(
+        FunctionName=function_name,
+        Qualifier=alias_name,
+        ProvisionedConcurrentExecutions=executions
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = lambda_client.get_provisioned_concurrency_config(FunctionName=function_name, Qualifier=alias_name)
+        if status['Status'] == 'READY':
+            tracer.event("✅ Provisioned concurrency is ready")
+            return True
+        if status['Status'] == 'FAILED':
+            tracer.event(f"❌ Provisioned concurrency failed: {status.get('StatusReason')}", level='error')
+            return False
+        time.sleep(5)
+    tracer.event("⚠️ Timed out waiting for provisioned concurrency", level='error')
+    return False
+
+@tracer.step()
+def create_lambda_function(function_name, repo_uri, image_tag, role_arn, alias_name='live', provisioned_concurrency=None):
+    tracer.event(f"\n⚙️ Deploying Lambda function: {function_name}")
+    tracer.event("\n📊 Lambda Function Properties:")
+    tracer.event("  • Timeout: 30 seconds (maximum execution time for each invocation)")
+    tracer.event("  • Memory: 256 MB (affects CPU power and pricing)")
+    tracer.event("  • Package Type: Image (using container image from ECR)")
+    tracer.event("  • Runtime: Defined by the container image")
+    tracer.event("  • Handler: Defined in the Dockerfile CMD")
+    tracer.event("  • Environment Variables: Set for configuration")
+    tracer.event("  • Tracing: X-Ray tracing enabled for debugging")
+    tracer.event("  • Tags: Added for resource management")
+    tracer.event(f"  • Alias: '{alias_name}' always points to the latest published version")
+
+    image_uri = f'{repo_uri}:{image_tag}'
+    desired = function_configuration(role_arn)
+    existing = get_function(function_name)
+
+    if existing is None:
+        tracer.event(f"🆕 Function does not exist yet. Creating it...")
+        response = lambda_client.create_function(
+            FunctionName=function_name,
+            PackageType='Image',
+            Code={'ImageUri': image_uri},
+            Publish=True,
+            Tags={
+                'Environment': 'Production',
+                'Project': 'Serverless Demo'
+            },
+            **desired
+        )
+        lambda_client.get_waiter('function_active_v2').wait(FunctionName=function_name)
+        version = response['Version']
+        tracer.event(f"\n✅ Lambda function created successfully!")
+    else:
+        # Update in place: only the parts that changed, each followed by a wait on LastUpdateStatus
+        waiter = lambda_client.get_waiter('function_updated_v2')
+        if existing['Code'].get('ImageUri') != image_uri:
+            tracer.event(f"🔄 Updating function code to {image_uri}")
+            lambda_client.update_function_code(FunctionName=function_name, ImageUri=image_uri)
+            waiter.wait(FunctionName=function_name)
+        else:
+            tracer.event("ℹ️ Function code is already up to date")
+        if configuration_changed(existing['Configuration'], desired):
+            tracer.event("🔄 Updating function configuration")
+            lambda_client.update_function_configuration(FunctionName=function_name, **desired)
+            waiter.wait(FunctionName=function_name)
+        else:
+            tracer.event("ℹ️ Function configuration is already up to date")
+        # Lambda returns the latest version instead of creating a new one when nothing changed
+        version = lambda_client.publish_version(FunctionName=function_name)['Version']
+        lambda_client.get_waiter('published_version_active').wait(FunctionName=function_name, Qualifier=version)
+        tracer.event(f"\n✅ Lambda function updated successfully! Version: {version}")
+
+    alias_arn = point_alias(function_name, alias_name, version)
+    if provisioned_concurrency:
+        configure_provisioned_concurrency(function_name, alias_name, provisioned_concurrency)
+    return alias_arn
+
+def deploy_function(spec, role_arn):
+    with tracer.span('deploy_function', function=spec['function_name']):
+        # Create ECR repository
+        tracer.event(f"\n🏭 Creating ECR Repository for {spec['function_name']}")
+        repo_uri = create_ecr_repository(spec['repo_name'])
+        tracer.event(f"📦 ECR repository URI: {repo_uri}")
+
+        # Build and push Docker image
+        tracer.event(f"\n🐳 Building and Pushing Docker Image for {spec['function_name']}")
+        image_tag = build_and_push_image(repo_uri, spec['dockerfile_path'], spec['context_dir'])
+
+        # Create and deploy Lambda function
+        tracer.event(f"\n⚙️ Creating and Configuring Lambda Function {spec['function_name']}")
+        function_arn = create_lambda_function(
+            spec['function_name'], repo_uri, image_tag, role_arn,
+            alias_name=spec.get('alias_name', 'live'),
+            provisioned_concurrency=spec.get('provisioned_concurrency')
+        )
+        tracer.event(f"🎊 Lambda function live at: {function_arn}")
+        return function_arn
+
+def deploy_functions(functions, role_arn, max_workers=MAX_PARALLEL_DEPLOYS):
+    # Each function builds and pushes its own image, so deploys run side by side
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda spec: deploy_function(spec, role_arn), functions))
 
 # Main execution
-if __name__ == '__main__':
-    repo_name = 'my-lambda-repo'
-    image_tag = 'latest'
-    function_name = 'my-lambda-function'
-    dockerfile_path = 'Dockerfile'
+def main(session=None):
     role_name = 'my-lambda-execution-role'
+    functions = [
+        {
+            'function_name': 'my-lambda-function',
+            'repo_name': 'my-lambda-repo',
+            'context_dir': 'lambda',
+            'dockerfile_path': 'Dockerfile',
+            'alias_name': 'live',
+            'provisioned_concurrency': None  # e.g. 1 to remove cold starts on the alias
+        },
+    ]
+
+    # Without a target session, run on the instrumented boto3 default session
+    use_session(session or tracer.instrument())
 
-    print("🎉 Starting Lambda deployment process...")
-    print("\n📋 Deployment Process Overview:")
-    print("  1. Create or retrieve IAM role for Lambda execution")
-    print("  2. Create ECR repository to store Docker image")
-    print("  3. Build Docker image from Dockerfile")
-    print("  4. Push Docker image to ECR repository")
-    print("  5. Create Lambda function using the Docker image")
-    print("  6. Configure Lambda function properties and environment")
+    tracer.event("🎉 Starting Lambda deployment process...")
+    tracer.event("\n📋 Deployment Process Overview:")
+    tracer.event("  1. Create or retrieve IAM role for Lambda execution")
+    tracer.event("  2. Create ECR repository to store Docker image")
+    tracer.event("  3. Build Docker image from Dockerfile (skipped if unchanged)")
+    tracer.event("  4. Push Docker image to ECR repository (skipped if unchanged)")
+    tracer.event("  5. Create the Lambda function, or update it in place if it already exists")
+    tracer.event("  6. Publish a version and point the 'live' alias to it")
 
     print_docker_info()
 
     # Step 0: Create or get IAM role
-    print("\n👤 Step 1: Setting up IAM Role")
+    tracer.event("\n👤 Step 1: Setting up IAM Role")
     role_arn = create_or_get_lambda_role(role_name)
-    print(f"🔑 Using IAM role ARN: {role_arn}")
-
-    # Create ECR repository
-    print("\n🏭 Step 2: Creating ECR Repository")
-    repo_uri = create_ecr_repository(repo_name)
-    print(f"📦 ECR repository URI: {repo_uri}")
-
-    # Build and push Docker image
-    print("\n🐳 Step 3 & 4: Building and Pushing Docker Image")
-    build_and_push_image(repo_uri, dockerfile_path, image_tag)
-
-    # Create and deploy Lambda function
-    print("\n⚙️ Step 5 & 6: Creating and Configuring Lambda Function")
-    function_arn = create_lambda_function(function_name, repo_uri, image_tag, role_arn)
-    print(f"🎊 Lambda function created with ARN: {function_arn}")
-
-    print("\n🏁 Deployment process completed successfully!")
-    print("\n💡 Key Serverless and Docker Benefits:")
-    print("  • Reduced operational complexity")
-    print("  • Automatic scaling and high availability")
-    print("  • Pay-per-use pricing model")
-    print("  • Faster time to market and improved developer productivity")
-    print("  • Consistent runtime environment across development and production")
-    print("  • Easy integration with other AWS services")
-    print("  • Simplified dependency management with containers")
-    print("  • Improved application isolation and security")
-    print("  • Flexibility to use any programming language or library")
-
-    print("\n🚀 Next steps:")
-    print("  1. Test your Lambda function using the AWS Console or CLI")
-    print("  2. Set up triggers (e.g., API Gateway, S3 events) for your function")
-    print("  3. Monitor function performance and logs in CloudWatch")
-    print("  4. Iterate and update your function as needed")
-    print("  5. Implement CI/CD pipeline for automated deployments")
-    print("  6. Optimize function performance and cost")
\ No newline at end of file
+    tracer.event(f"🔑 Using IAM role ARN: {role_arn}")
+
+    # Steps 2-6 run concurrently for every function
+    deploy_functions(functions, role_arn)
+
+    tracer.event("\n🏁 Deployment process completed successfully!")
+    tracer.event("\n💡 Key Serverless and Docker Benefits:")
+    tracer.event("  • Reduced operational complexity")
+    tracer.event("  • Automatic scaling and high availability")
+    tracer.event("  • Pay-per-use pricing model")
+    tracer.event("  • Faster time to market and improved developer productivity")
+    tracer.event("  • Consistent runtime environment across development and production")
+    tracer.event("  • Easy integration with other AWS services")
+    tracer.event("  • Simplified dependency management with containers")
+    tracer.event("  • Improved application isolation and security")
+    tracer.event("  • Flexibility to use any programming language or library")
+
+    tracer.event("\n🚀 Next steps:")
+    tracer.event("  1. Test your Lambda function using the AWS Console or CLI")
+    tracer.event("  2. Set up triggers (e.g., API Gateway, S3 events) for your function")
+    tracer.event("  3. Monitor function performance and logs in CloudWatch")
+    tracer.event("  4. Iterate and update your function as needed")
+    tracer.event("  5. Implement CI/CD pipeline for automated deployments")
+    tracer.event("  6. Optimize function performance and cost")
+    return True
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,22 @@
-import boto3
 import json
 import uuid
 from botocore.exceptions import ClientError
+from instrumentation import tracer
+from s3_reencrypt import S3ReencryptionJob
+
+# Time every AWS call and step; output goes to the configured sinks
+tracer.instrument()
 
 class KMSS3Manager:
-    def __init__(self, region_name='us-east-1'):
-        self.kms_client = boto3.client('kms', region_name=region_name)
-        self.s3_client = boto3.client('s3', region_name=region_name)
+    def __init__(self, region_name='us-east-1', session=None):
+        # Sin sesión se usa la sesión por defecto de boto3, ya instrumentada
+        session = session or tracer.instrument()
+        self.kms_client = session.client('kms', region_name=region_name)
+        self.s3_client = session.client('s3', region_name=region_name)
         self.key_id = None
         self.bucket_name = None
 
+    @tracer.step()
     def create_kms_key(self, description="🔐 Clave para cifrado S3 alineado con ISO 27017"):
         try:
             response = self.kms_client.create_key(
@@ -18,26 +25,28 @@ class KMSS3Manager:
                 Origin='AWS_KMS'
             )
             self.key_id = response['KeyMetadata']['KeyId']
-            print(f"🔑 Nueva clave KMS creada. ID: {self.key_id}")
+            tracer.event(f"🔑 Nueva clave KMS creada. ID: {self.key_id}")
             return self.key_id
         except ClientError as e:
-            print(f"❌ Error al crear la clave KMS: {e}")
+            tracer.event(f"❌ Error al crear la clave KMS: {e}", level='error')
             return None
 
+    @tracer.step()
     def create_s3_bucket(self, bucket_name_prefix):
         bucket_name = f"{bucket_name_prefix}-{uuid.uuid4()}"
         try:
             self.s3_client.create_bucket(Bucket=bucket_name)
             self.bucket_name = bucket_name
-            print(f"🪣 Bucket S3 creado: {bucket_name}")
+            tracer.event(f"🪣 Bucket S3 creado: {bucket_name}")
             return True
         except ClientError as e:
-            print(f"❌ Error al crear el bucket S3: {e}")
+            tracer.event(f"❌ Error al crear el bucket S3: {e}", level='error')
             return False
 
+    @tracer.step()
     def configure_s3_encryption(self):
         if not self.key_id or not self.bucket_name:
-            print("⚠️ Error: Se requiere una clave KMS y un bucket S3.")
+            tracer.event("⚠️ Error: Se requiere una clave KMS y un bucket S3.", level='error')
             return False
         try:
             self.s3_client.put_bucket_encryption(
@@ -51,81 +60,103 @@ class KMSS3Manager:
                     }]
                 }
             )
-            print(f"🔒 Cifrado configurado para el bucket {self.bucket_name}")
+            tracer.event(f"🔒 Cifrado configurado para el bucket {self.bucket_name}")
             return True
         except ClientError as e:
-            print(f"❌ Error al configurar el cifrado del bucket: {e}")
+            tracer.event(f"❌ Error al configurar el cifrado del bucket: {e}", level='error')
             return False
 
+    @tracer.step()
+    def reencrypt_existing_objects(self, max_workers=32):
+        # configure_s3_encryption solo cambia el cifrado por defecto; los objetos existentes
+        # se reescriben del lado del servidor con la clave actual
+        if not self.key_id or not self.bucket_name:
+            tracer.event("⚠️ Error: Se requiere una clave KMS y un bucket S3.", level='error')
+            return None
+        try:
+            job = S3ReencryptionJob(self.bucket_name, self.key_id, region_name=self.s3_client.meta.region_name, max_workers=max_workers)
+        except ClientError:
+            return None  # El trabajo ya informó del error y no llegó a empezar
+        return job.run()
+
+    @tracer.step()
     def upload_file(self, file_name, object_name=None):
         if object_name is None:
             object_name = file_name
         try:
             self.s3_client.upload_file(file_name, self.bucket_name, object_name)
-            print(f"📤 Archivo {file_name} subido como {object_name}")
+            tracer.event(f"📤 Archivo {file_name} subido como {object_name}")
             return True
         except ClientError as e:
-            print(f"❌ Error al subir el archivo: {e}")
+            tracer.event(f"❌ Error al subir el archivo: {e}", level='error')
             return False
 
+    @tracer.step()
     def download_file(self, object_name, file_name):
         try:
             self.s3_client.download_file(self.bucket_name, object_name, file_name)
-            print(f"📥 Archivo {object_name} descargado como {file_name}")
+            tracer.event(f"📥 Archivo {object_name} descargado como {file_name}")
             return True
         except ClientError as e:
-            print(f"❌ Error al descargar el archivo: {e}")
+            tracer.event(f"❌ Error al descargar el archivo: {e}", level='error')
             return False
 
+    @tracer.step()
     def verify_bucket_encryption(self):
         try:
             response = self.s3_client.get_bucket_encryption(Bucket=self.bucket_name)
             rules = response['ServerSideEncryptionConfiguration']['Rules']
             for rule in rules:
                 if rule['ApplyServerSideEncryptionByDefault']['SSEAlgorithm'] == 'aws:kms' and rule['ApplyServerSideEncryptionByDefault']['KMSMasterKeyID'] == self.key_id:
-                    print("✅ El bucket está correctamente configurado para usar KMS.")
+                    tracer.event("✅ El bucket está correctamente configurado para usar KMS.")
                     return True
-            print("❌ El bucket no está configurado correctamente para usar KMS.")
+            tracer.event("❌ El bucket no está configurado correctamente para usar KMS.", level='error')
             return False
         except ClientError as e:
-            print(f"❌ Error al verificar el cifrado del bucket: {e}")
+            tracer.event(f"❌ Error al verificar el cifrado del bucket: {e}", level='error')
             return False
 
+    @tracer.step()
     def verify_object_encryption(self, object_name):
         try:
             response = self.s3_client.head_object(Bucket=self.bucket_name, Key=object_name)
             if 'ServerSideEncryption' in response and response['ServerSideEncryption'] == 'aws:kms':
-                print(f"✅ El objeto {object_name} está cifrado con KMS.")
+                tracer.event(f"✅ El objeto {object_name} está cifrado con KMS.")
                 return True
-            print(f"❌ El objeto {object_name} no está cifrado con KMS.")
+            tracer.event(f"❌ El objeto {object_name} no está cifrado con KMS.", level='error')
             return False
         except ClientError as e:
-            print(f"❌ Error al verificar el cifrado del objeto: {e}")
+            tracer.event(f"❌ Error al verificar el cifrado del objeto: {e}", level='error')
             return False
 
 # 🌟 Ejemplo de uso
-manager = KMSS3Manager()
+def main(session=None):
+    manager = KMSS3Manager(region_name=session.region_name, session=session) if session else KMSS3Manager()
+
+    # Crear clave KMS
+    key_id = manager.create_kms_key()
 
-# Crear clave KMS
-key_id = manager.create_kms_key()
+    # Crear bucket S3 con un prefijo y UUID único
+    bucket_prefix = "bucket-sfe-test"
+    manager.create_s3_bucket(bucket_prefix)
 
-# Crear bucket S3 con un prefijo y UUID único
-bucket_prefix = "bucket-sfe-test"
-manager.create_s3_bucket(bucket_prefix)
+    # Configurar cifrado del bucket
+    manager.configure_s3_encryption()
 
-# Configurar cifrado del bucket
-manager.configure_s3_encryption()
+    # Verificar la configuración de cifrado del bucket
+    manager.verify_bucket_encryption()
 
-# Verificar la configuración de cifrado del bucket
-manager.verify_bucket_encryption()
+    # Subir un archivo (asumiendo que existe un archivo 'documento_secreto.txt')
+    manager.upload_file('assets/documento_secreto.txt')
 
-# Subir un archivo (asumiendo que existe un archivo 'documento_secreto.txt')
-manager.upload_file('assets/documento_secreto.txt')
+    # Verificar el cifrado del objeto
+    manager.verify_object_encryption('assets/documento_secreto.txt')
 
-# Verificar el cifrado del objeto
-manager.verify_object_encryption('assets/documento_secreto.txt')
+    # Descargar el archivo (asegúrate de usar el mismo nombre de objeto que el nombre usado al subir)
+    manager.download_file('assets/documento_secreto.txt', 'documento_descargado.txt')
 
-# Descargar el archivo (asegúrate de usar el mismo nombre de objeto que el nombre usado al subir)
-manager.download_file('assets/documento_secreto.txt', 'documento_descargado.txt')
+    tracer.event("🚀 Flujo completado.")
+    return manager
 
-print("🚀 Flujo completado.")
+if __name__ == "__main__":
+    main()
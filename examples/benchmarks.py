@@ -0,0 +1,556 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.request
+import uuid
+from datetime import datetime, timedelta
+import boto3
+from botocore.awsrequest import AWSResponse
+from botocore.exceptions import ClientError
+from instrumentation import tracer
+from multi_region_runner import load_example
+
+try:
+    from moto import mock_aws
+    from moto.core.models import botocore_stubber
+except ImportError:
+    mock_aws = botocore_stubber = None
+
+REGION = 'us-east-1'
+EXAMPLES_DIR = os.path.dirname(os.path.abspath(__file__))
+# Each flow runs in a scratch directory; these read-only inputs are linked into it
+SHARED_PATHS = ('assets', 'lambda', 'scripts')
+BASELINE_FILE = os.path.join(EXAMPLES_DIR, 'benchmark-baseline.json')
+REPEAT = 3
+WARMUP = 1
+LOG_OBJECTS = 300
+# Account contents the controls flow audits
+CONTROL_PRINCIPALS = 40
+CONTROL_BUCKETS = 20
+CONTROL_KEYS = 10
+
+# A flow regresses when it is slower by both a relative and an absolute margin (so
+# millisecond noise on fast flows never fails a run), makes more calls to any operation,
+# or needs noticeably more memory
+TIME_TOLERANCE = 0.25
+TIME_NOISE_MS = 50
+MEMORY_TOLERANCE = 0.25
+MEMORY_NOISE_KB = 1024
+
+# Throttling error as each service returns it: (HTTP status, error code, wire protocol)
+THROTTLE_ERRORS = {
+    'ec2': (503, 'RequestLimitExceeded', 'ec2'),
+    'iam': (400, 'Throttling', 'query'),
+    'sts': (400, 'Throttling', 'query'),
+    's3': (503, 'SlowDown', 'rest-xml'),
+    'lambda': (429, 'TooManyRequestsException', 'rest-json'),
+}
+DEFAULT_THROTTLE_ERROR = (400, 'ThrottlingException', 'json')
+
+# Smallest manifest ECR accepts, standing in for the image docker would have pushed
+IMAGE_MANIFEST = json.dumps({
+    'schemaVersion': 2,
+    'mediaType': 'application/vnd.docker.distribution.manifest.v2+json',
+    'config': {'mediaType': 'application/vnd.docker.container.image.v1+json', 'size': 1, 'digest': 'sha256:' + '0' * 64},
+    'layers': [],
+})
+
+
+class RawBody:
+    def __init__(self, body):
+        self.body = body
+
+    def stream(self, **kwargs):
+        yield self.body
+
+
+def throttle_response(service, url):
+    status, code, protocol = THROTTLE_ERRORS.get(service, DEFAULT_THROTTLE_ERROR)
+    headers = {}
+    if protocol == 'ec2':
+        body = f"<Response><Errors><Error><Code>{code}</Code><Message>Request limit exceeded.</Message></Error></Errors><RequestID>{uuid.uuid4()}</RequestID></Response>"
+    elif protocol == 'query':
+        body = f"<ErrorResponse><Error><Type>Sender</Type><Code>{code}</Code><Message>Rate exceeded</Message></Error><RequestId>{uuid.uuid4()}</RequestId></ErrorResponse>"
+    elif protocol == 'rest-xml':
+        body = f"<Error><Code>{code}</Code><Message>Please reduce your request rate.</Message></Error>"
+    else:
+        headers['x-amzn-ErrorType'] = code
+        body = json.dumps({'__type': code, 'message': 'Rate exceeded'})
+    return AWSResponse(url, status, headers, RawBody(body.encode()))
+
+
+class FaultInjector:
+    # botocore 'before-send' hook: delays every request and answers a seeded share of them
+    # with the service's own throttling error, so botocore retries them as it would on AWS.
+    # Every handler of an event runs, so in-process moto (also a before-send handler) is
+    # called from here, and only for the requests that are not throttled.
+    def __init__(self, latency_ms=0, jitter_ms=0, throttle_rate=0.0, seed=0, forward=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.throttle_rate = throttle_rate
+        self.seed = seed
+        self.forward = forward
+        self.enabled = False
+        self.injected_throttles = 0
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self._counts = {}
+            self.injected_throttles = 0
+
+    def _draw(self, event_name):
+        # The n-th request of an operation always gets the same draw, whatever the
+        # interleaving of the threads that send them
+        with self._lock:
+            count = self._counts[event_name] = self._counts.get(event_name, 0) + 1
+        return random.Random(f"{self.seed}:{event_name}:{count}")
+
+    def __call__(self, request, event_name, **kwargs):
+        if not self.enabled:
+            return self._forward(request, event_name, **kwargs)
+        draw = self._draw(event_name)
+        delay_ms = self.latency_ms + draw.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+        if draw.random() < self.throttle_rate:
+            with self._lock:
+                self.injected_throttles += 1
+            # event_name is before-send.<service>.<Operation>
+            return throttle_response(event_name.split('.')[1], request.url)
+        return self._forward(request, event_name, **kwargs)
+
+    def _forward(self, request, event_name, **kwargs):
+        return self.forward(request=request, event_name=event_name, **kwargs) if self.forward else None
+
+
+class StandIn:
+    # Local replacement for AWS: moto in process by default, or any server speaking the
+    # AWS APIs (moto_server, LocalStack) at endpoint. State is wiped before every run.
+    def __init__(self, endpoint=None):
+        self.endpoint = endpoint
+        self._mock = None
+
+    def start(self):
+        if self.endpoint:
+            try:
+                urllib.request.urlopen(urllib.request.Request(f"{self.endpoint}/moto-api/reset", method='POST'), timeout=10)
+            except OSError:
+                pass  # Not a moto server: resources from earlier runs are reused
+        else:
+            self._mock = mock_aws()
+            self._mock.start()
+
+    def stop(self):
+        if self._mock is not None:
+            self._mock.stop()
+            self._mock = None
+
+
+class NoSleep:
+    # Replaces the time module of an example: fixed waits for IAM propagation or
+    # provisioning finish instantly against the stand-in and would only add noise
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+    def sleep(self, seconds):
+        pass
+
+
+class Stage:
+    def __init__(self, workdir, fixtures):
+        self.workdir = workdir
+        self.fixtures = fixtures
+        self.cleanups = []
+
+
+# ---- fixtures and flows ---------------------------------------------------
+
+def create_fixtures():
+    # The VPC, subnets and route table the provisioning scripts expect to be filled in
+    ec2 = boto3.client('ec2', region_name=REGION)
+    vpc_id = ec2.create_vpc(CidrBlock='10.0.0.0/16')['Vpc']['VpcId']
+    public_subnet_id = ec2.create_subnet(VpcId=vpc_id, CidrBlock='10.0.1.0/24')['Subnet']['SubnetId']
+    private_subnet_id = ec2.create_subnet(VpcId=vpc_id, CidrBlock='10.0.2.0/24')['Subnet']['SubnetId']
+    route_table_id = ec2.create_route_table(VpcId=vpc_id)['RouteTable']['RouteTableId']
+    ec2.associate_route_table(RouteTableId=route_table_id, SubnetId=private_subnet_id)
+    ami_id = ec2.describe_images(Owners=['amazon'], MaxResults=5)['Images'][0]['ImageId']
+    # moto loads the AWS managed policies when IAM is first used; done here, outside the timed flow
+    boto3.client('iam').list_roles()
+    return {
+        'vpc_id': vpc_id,
+        'public_subnet_id': public_subnet_id,
+        'private_subnet_id': private_subnet_id,
+        'route_table_id': route_table_id,
+        'ami_id': ami_id,
+    }
+
+
+def script(script_name, **constants):
+    # A numbered example run through its main(), with its placeholders filled from the fixtures
+    def prepare(stage):
+        module = load_example(script_name)
+        for name, fixture in constants.items():
+            setattr(module, name, stage.fixtures[fixture])
+        if hasattr(module, 'time'):
+            module.time = NoSleep()
+        return module.main
+    return prepare
+
+
+def prepare_lambda_deploy(stage):
+    module = load_example('4-deploy-lambda-image.py')
+    module.time = NoSleep()
+    module.use_session(boto3.DEFAULT_SESSION)
+    spec = {'function_name': 'bench-function', 'repo_name': 'bench-repo', 'context_dir': 'lambda', 'dockerfile_path': 'Dockerfile'}
+    # There is no docker build here: the image of the current build context is pushed
+    # beforehand, so the deploy takes its "image already in ECR" path
+    ecr = boto3.client('ecr', region_name=REGION)
+    ecr.create_repository(repositoryName=spec['repo_name'])
+    image_tag = f"ctx-{module.compute_context_hash(spec['context_dir'], spec['dockerfile_path'])}"
+    ecr.put_image(repositoryName=spec['repo_name'], imageManifest=IMAGE_MANIFEST, imageTag=image_tag)
+
+    def run():
+        role_arn = module.create_or_get_lambda_role('bench-lambda-role')
+        return module.deploy_functions([spec], role_arn)
+    return run
+
+
+def prepare_inventory(stage):
+    from inventory import Inventory
+    inventory = Inventory(path=os.path.join(stage.workdir, 'inventory.sqlite'), regions=[REGION], session=boto3.DEFAULT_SESSION)
+    stage.cleanups.append(inventory.close)
+    return lambda: inventory.refresh(incremental=False)
+
+
+def seed_account(stage):
+    # Something to audit: principals with and without privilege escalation, buckets and
+    # customer keys that pass and fail their controls, and an exposed security group
+    iam = boto3.client('iam')
+    s3 = boto3.client('s3', region_name=REGION)
+    kms = boto3.client('kms', region_name=REGION)
+    ec2 = boto3.client('ec2', region_name=REGION)
+
+    def policy(name, actions):
+        document = {'Version': '2012-10-17', 'Statement': [{'Effect': 'Allow', 'Action': actions, 'Resource': '*'}]}
+        return iam.create_policy(PolicyName=name, PolicyDocument=json.dumps(document))['Policy']['Arn']
+    admin = policy('bench-admin', ['iam:*'])
+    reader = policy('bench-reader', ['s3:Get*', 's3:List*', 'ec2:Describe*'])
+    iam.create_group(GroupName='bench-admins')
+    iam.attach_group_policy(GroupName='bench-admins', PolicyArn=admin)
+    trust = json.dumps({'Version': '2012-10-17', 'Statement': [
+        {'Effect': 'Allow', 'Principal': {'Service': 'ec2.amazonaws.com'}, 'Action': 'sts:AssumeRole'}
+    ]})
+    for i in range(CONTROL_PRINCIPALS):
+        if i % 2:
+            iam.create_role(RoleName=f"bench-role-{i:02d}", AssumeRolePolicyDocument=trust)
+            iam.attach_role_policy(RoleName=f"bench-role-{i:02d}", PolicyArn=admin if i % 10 == 1 else reader)
+        else:
+            iam.create_user(UserName=f"bench-user-{i:02d}")
+            if i % 10 == 0:
+                iam.add_user_to_group(GroupName='bench-admins', UserName=f"bench-user-{i:02d}")
+            else:
+                iam.attach_user_policy(UserName=f"bench-user-{i:02d}", PolicyArn=reader)
+
+    key_ids = [kms.create_key()['KeyMetadata']['KeyId'] for _ in range(CONTROL_KEYS)]
+    for key_id in key_ids[::2]:
+        kms.enable_key_rotation(KeyId=key_id)
+    for i in range(CONTROL_BUCKETS):
+        bucket_name = f"bench-controls-{i:02d}"
+        s3.create_bucket(Bucket=bucket_name)
+        if i % 2:
+            s3.put_bucket_encryption(Bucket=bucket_name, ServerSideEncryptionConfiguration={'Rules': [
+                {'ApplyServerSideEncryptionByDefault': {'SSEAlgorithm': 'aws:kms', 'KMSMasterKeyID': key_ids[i % CONTROL_KEYS]}}
+            ]})
+        if i % 3:
+            s3.put_public_access_block(Bucket=bucket_name, PublicAccessBlockConfiguration={
+                'BlockPublicAcls': True, 'IgnorePublicAcls': True, 'BlockPublicPolicy': True, 'RestrictPublicBuckets': True
+            })
+
+    group_id = ec2.create_security_group(GroupName='bench-open', Description='SSH open to the Internet', VpcId=stage.fixtures['vpc_id'])['GroupId']
+    ec2.authorize_security_group_ingress(GroupId=group_id, IpPermissions=[
+        {'IpProtocol': 'tcp', 'FromPort': 22, 'ToPort': 22, 'IpRanges': [{'CidrIp': '0.0.0.0/0'}, {'CidrIp': '10.0.0.0/8'}]},
+    ])
+
+
+def prepare_controls(stage):
+    from iso27017_controls import ControlEngine
+    seed_account(stage)
+    engine = ControlEngine(REGION, session=boto3.DEFAULT_SESSION)
+    stage.cleanups.append(engine.close)
+    return engine.run
+
+
+def prepare_log_query(stage):
+    from lambda_log_query import LambdaLogQuery
+    bucket_name = 'bench-lambda-logs'
+    s3 = boto3.client('s3', region_name=REGION)
+    s3.create_bucket(Bucket=bucket_name)
+    end = datetime(2024, 6, 2, 12)
+    start = end - timedelta(days=2)
+    step = (end - start) / LOG_OBJECTS
+    for i in range(LOG_OBJECTS):
+        moment = start + step * i
+        request_id = f"{i:08d}-bench"
+        s3.put_object(Bucket=bucket_name, Key=f"log_{moment:%Y%m%d_%H%M%S}_{request_id}.json", Body=json.dumps({
+            'timestamp': moment.isoformat(), 'url': 'https://example.com', 'status_code': 500 if i % 20 == 0 else 200,
+            'elapsed_ms': 50 + i % 200, 'error': None,
+        }))
+    logs = LambdaLogQuery(bucket_name, REGION, cache_dir=stage.workdir)
+    stage.cleanups.append(logs.close)
+    return lambda: logs.query(start, end)
+
+
+FLOWS = {
+    'ec2_instance_connect': script('0-ec2_dcoker_instance_connect.py', VPC_ID='vpc_id', SUBNET_ID='public_subnet_id', AMI_ID='ami_id'),
+    'ssm_instance': script('1-ssm_instance.py', VPC_ID='vpc_id', SUBNET_ID='public_subnet_id', AMI_ID='ami_id'),
+    'nat_gateway': script('2-nat_gateway.py', VPC_ID='vpc_id', PUBLIC_SUBNET_ID='public_subnet_id',
+                          PRIVATE_SUBNET_ID='private_subnet_id', ROUTE_TABLE_ID='route_table_id'),
+    'ssm_private_instance': script('3-ssm_private_instance.py', VPC_ID='vpc_id', PRIVATE_SUBNET_ID='private_subnet_id', AMI_ID='ami_id'),
+    'lambda_deploy': prepare_lambda_deploy,
+    'kms_s3': script('5-ks-s3.py'),
+    'lambda_log_query': prepare_log_query,
+    'inventory': prepare_inventory,
+    'iso27017_controls': prepare_controls,
+}
+
+
+# ---- runner ---------------------------------------------------------------
+
+class Benchmark:
+    def __init__(self, stand_in, injector, verbose=False):
+        self.stand_in = stand_in
+        self.injector = injector
+        self.verbose = verbose
+
+    def setup_session(self):
+        # Every example uses the default session, so hooking it reaches all of their
+        # clients. moto replaces it while active, hence a fresh one for every run.
+        boto3.setup_default_session(region_name=REGION)
+        events = boto3.DEFAULT_SESSION.events
+        if botocore_stubber is not None:
+            # moto only sees the requests the injector lets through
+            events.unregister('before-send', botocore_stubber)
+            self.injector.forward = botocore_stubber
+        events.register_first('before-send', self.injector)
+        tracer.instrument()
+
+    def check_injection(self):
+        # A throttled request must never reach the stand-in, or every retried call would
+        # run twice: an allocate_address throttled on every attempt has to leave nothing
+        injector = self.injector
+        self.injector = FaultInjector(throttle_rate=1.0)
+        self.stand_in.start()
+        sinks = tracer.sinks
+        try:
+            self.setup_session()
+            ec2 = boto3.client('ec2', region_name=REGION)
+            tracer.sinks = []
+            self.injector.enabled = True
+            try:
+                ec2.allocate_address(Domain='vpc')
+            except ClientError:
+                pass
+            self.injector.enabled = False
+            addresses = ec2.describe_addresses()['Addresses']
+        finally:
+            tracer.sinks = sinks
+            tracer.spans.clear()
+            self.stand_in.stop()
+            self.injector = injector
+        return len(addresses)
+
+    def run_once(self, name, measure_memory=False):
+        # Fresh stand-in state and scratch directory; only the flow itself is timed
+        workdir = tempfile.mkdtemp(prefix=f"benchmark-{name}-")
+        for path in SHARED_PATHS:
+            os.symlink(os.path.join(EXAMPLES_DIR, path), os.path.join(workdir, path))
+        previous_dir = os.getcwd()
+        os.chdir(workdir)
+        self.stand_in.start()
+        self.setup_session()
+        sinks = tracer.sinks
+        try:
+            stage = Stage(workdir, create_fixtures())
+            run = FLOWS[name](stage)
+            if not self.verbose:
+                tracer.sinks = []
+            tracer.spans.clear()
+            self.injector.reset()
+            self.injector.enabled = True
+            if measure_memory:
+                tracemalloc.start()
+            error = None
+            started = time.perf_counter()
+            try:
+                if run() is False:
+                    error = 'the flow reported a failure'
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            peak_kb = tracemalloc.get_traced_memory()[1] / 1024 if measure_memory else None
+            for cleanup in stage.cleanups:
+                cleanup()
+        finally:
+            tracemalloc.stop()
+            self.injector.enabled = False
+            tracer.sinks = sinks
+            self.stand_in.stop()
+            os.chdir(previous_dir)
+            shutil.rmtree(workdir, ignore_errors=True)
+        stats = tracer.operation_stats()
+        tracer.spans.clear()
+        return {
+            'wall_ms': elapsed_ms,
+            'peak_memory_kb': peak_kb,
+            'operations': {op: entry['calls'] for op, entry in sorted(stats.items())},
+            'api_calls': sum(entry['calls'] for entry in stats.values()),
+            'retries': sum(entry['retries'] for entry in stats.values()),
+            'throttles': sum(entry['throttles'] for entry in stats.values()),
+            'injected_throttles': self.injector.injected_throttles,
+            'error': error,
+        }
+
+    def run(self, name, repeat=REPEAT, warmup=WARMUP):
+        # Warm-up runs pay one-off imports and service model loading; peak memory comes
+        # from a separate run because tracemalloc slows down the timed ones
+        for _ in range(warmup):
+            self.run_once(name)
+        memory = self.run_once(name, measure_memory=True)
+        runs = [self.run_once(name) for _ in range(repeat)]
+        result = dict(runs[0])
+        result['runs_ms'] = [round(run['wall_ms'], 1) for run in runs]
+        result['wall_ms'] = round(statistics.median(run['wall_ms'] for run in runs), 1)
+        result['peak_memory_kb'] = round(memory['peak_memory_kb'])
+        result['error'] = next((run['error'] for run in [memory] + runs if run['error']), None)
+        return result
+
+
+def compare(baseline, results):
+    regressions = []
+    for name, current in results['flows'].items():
+        previous = baseline['flows'].get(name)
+        if previous is None:
+            continue
+        if current['error'] and not previous['error']:
+            regressions.append(f"{name}: now fails ({current['error']})")
+        slower_ms = current['wall_ms'] - previous['wall_ms']
+        if slower_ms > TIME_NOISE_MS and current['wall_ms'] > previous['wall_ms'] * (1 + TIME_TOLERANCE):
+            regressions.append(f"{name}: wall time {previous['wall_ms']:.0f} → {current['wall_ms']:.0f} ms")
+        for op, calls in current['operations'].items():
+            if calls > previous['operations'].get(op, 0):
+                regressions.append(f"{name}: {op} {previous['operations'].get(op, 0)} → {calls} calls")
+        grown_kb = current['peak_memory_kb'] - previous['peak_memory_kb']
+        if grown_kb > MEMORY_NOISE_KB and current['peak_memory_kb'] > previous['peak_memory_kb'] * (1 + MEMORY_TOLERANCE):
+            regressions.append(f"{name}: peak memory {previous['peak_memory_kb'] / 1024:.1f} → {current['peak_memory_kb'] / 1024:.1f} MB")
+    return regressions
+
+
+def print_results(results, baseline=None):
+    tracer.event(f"\n{'Flow':<22} {'Wall ms':>9} {'Base ms':>9} {'API calls':>9} {'Retries':>7} {'Throttles':>9} {'Peak MB':>8}  Status")
+    for name, result in results['flows'].items():
+        previous = (baseline or {}).get('flows', {}).get(name)
+        base_ms = f"{previous['wall_ms']:.1f}" if previous else '-'
+        status = f"❌ {result['error']}" if result['error'] else '✅'
+        tracer.event(
+            f"{name:<22} {result['wall_ms']:>9.1f} {base_ms:>9} {result['api_calls']:>9} {result['retries']:>7} "
+            f"{result['throttles']:>9} {result['peak_memory_kb'] / 1024:>8.1f}  {status}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the AWS flows of the examples against a local stand-in')
+    parser.add_argument('flows', nargs='*', help=f"flows to run (default: all): {', '.join(FLOWS)}")
+    parser.add_argument('--endpoint', help='AWS-compatible server to use instead of in-process moto, e.g. http://localhost:5000')
+    parser.add_argument('--latency-ms', type=float, default=0, help='latency added to every request')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='random +/- variation of the latency')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='share of requests answered with a throttling error')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--warmup', type=int, default=WARMUP)
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the baseline instead of comparing')
+    parser.add_argument('--output', help='also write the results as JSON to this file')
+    parser.add_argument('--verbose', action='store_true', help='show the output of the flows')
+    args = parser.parse_args()
+    unknown = [name for name in args.flows if name not in FLOWS]
+    if unknown:
+        parser.error(f"unknown flows: {', '.join(unknown)}")
+    baseline_path = os.path.abspath(args.baseline)
+    output_path = os.path.abspath(args.output) if args.output else None
+
+    if not args.endpoint and mock_aws is None:
+        tracer.event("❌ moto is not installed: pip install 'moto[server]' or pass --endpoint", level='error')
+        sys.exit(2)
+    # Fake credentials, so no run can ever reach a real account
+    os.environ.pop('AWS_PROFILE', None)
+    os.environ.update({'AWS_ACCESS_KEY_ID': 'testing', 'AWS_SECRET_ACCESS_KEY': 'testing', 'AWS_SESSION_TOKEN': 'testing', 'AWS_DEFAULT_REGION': REGION})
+    if args.endpoint:
+        os.environ['AWS_ENDPOINT_URL'] = args.endpoint
+    else:
+        # The flows attach AWS managed policies such as AmazonSSMManagedInstanceCore
+        os.environ['MOTO_IAM_LOAD_MANAGED_POLICIES'] = 'true'
+
+    settings = {
+        'stand_in': args.endpoint or 'moto',
+        'latency_ms': args.latency_ms,
+        'jitter_ms': args.jitter_ms,
+        'throttle_rate': args.throttle_rate,
+        'seed': args.seed,
+    }
+    baseline = None
+    if not args.save_baseline and os.path.exists(baseline_path):
+        with open(baseline_path) as file:
+            baseline = json.load(file)
+        if baseline['settings'] != settings:
+            tracer.event(f"❌ The baseline was recorded with other settings: {baseline['settings']}", level='error')
+            sys.exit(2)
+
+    injector = FaultInjector(args.latency_ms, args.jitter_ms, args.throttle_rate, args.seed)
+    benchmark = Benchmark(StandIn(args.endpoint), injector, verbose=args.verbose)
+    if args.throttle_rate and benchmark.check_injection():
+        tracer.event("❌ Throttled requests still reach the stand-in: retried calls would run twice", level='error')
+        sys.exit(2)
+    results = {'settings': settings, 'created_at': datetime.now().isoformat(timespec='seconds'), 'flows': {}}
+    for name in args.flows or FLOWS:
+        tracer.event(f"⏱️ {name}...")
+        results['flows'][name] = benchmark.run(name, args.repeat, args.warmup)
+
+    print_results(results, baseline)
+    if output_path:
+        with open(output_path, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.save_baseline:
+        if os.path.exists(baseline_path):
+            with open(baseline_path) as file:
+                previous = json.load(file)
+            # Flows left out of this run keep their previous baseline
+            if previous['settings'] == settings:
+                results['flows'] = {**previous['flows'], **results['flows']}
+        with open(baseline_path, 'w') as file:
+            json.dump(results, file, indent=2)
+        tracer.event(f"\n💾 Baseline saved to {baseline_path}")
+    elif baseline is None:
+        tracer.event(f"\nℹ️ No baseline at {baseline_path}; run with --save-baseline to create one.")
+    else:
+        regressions = compare(baseline, results)
+        if regressions:
+            tracer.event("\n❌ Regressions against the baseline:", level='error')
+            for regression in regressions:
+                tracer.event(f"  • {regression}", level='error')
+            sys.exit(1)
+        tracer.event("\n✅ No regressions against the baseline.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+import base64
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from cryptography.fernet import Fernet, InvalidToken
+from instrumentation import tracer
+
+try:
+    import keyring
+    from keyring.errors import KeyringError
+except ImportError:
+    keyring = None
+
+# ECR tokens last 12 hours; refresh them when less than this is left
+REFRESH_MARGIN = 30 * 60
+CACHE_DIR = os.environ.get('ECR_TOKEN_CACHE_DIR', os.path.expanduser('~/.cache/iso27017/ecr'))
+# Fernet key for the cache, e.g. from a CI secret. Without it the key is kept in the OS
+# keyring when one is available; with neither, tokens are only cached in memory and
+# never written to disk unencrypted.
+CACHE_KEY_ENV = 'ECR_TOKEN_CACHE_KEY'
+KEYRING_SERVICE = 'iso27017-ecr-token-cache'
+DOCKER_CONFIG = os.path.join(os.environ.get('DOCKER_CONFIG', os.path.expanduser('~/.docker')), 'config.json')
+
+
+def registry_host(registry):
+    return registry.replace('https://', '').rstrip('/')
+
+
+def token_expiration(password):
+    # The ECR password is base64-encoded JSON that carries its own expiration timestamp
+    try:
+        return float(json.loads(base64.b64decode(password))['expiration'])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+class EcrTokenCache:
+    # Authorization tokens per registry, in owner-only files shared between processes.
+    # A file lock per registry makes concurrent CI jobs fetch at most one new token.
+    def __init__(self, cache_dir=CACHE_DIR, refresh_margin=REFRESH_MARGIN):
+        self.cache_dir = cache_dir
+        self.refresh_margin = refresh_margin
+        os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+        key = self._load_key()
+        self._fernet = Fernet(key) if key else None
+        # Without a key, tokens live only as long as this process
+        self._memory = None if self._fernet else {}
+        if self._memory is not None:
+            tracer.event(f"⚠️ No {CACHE_KEY_ENV} and no OS keyring: ECR tokens are cached in memory only", level='warning')
+
+    def _load_key(self):
+        # The key never lives in the cache directory: next to the tokens it would protect nothing
+        if os.environ.get(CACHE_KEY_ENV):
+            return os.environ[CACHE_KEY_ENV].encode()
+        if keyring is None:
+            return None
+        with self._locked(os.path.join(self.cache_dir, 'keyring')):
+            try:
+                key = keyring.get_password(KEYRING_SERVICE, 'fernet-key')
+                if key is None:
+                    key = Fernet.generate_key().decode()
+                    keyring.set_password(KEYRING_SERVICE, 'fernet-key', key)
+                return key.encode()
+            except KeyringError:
+                return None
+
+    @contextmanager
+    def _locked(self, path):
+        with open(f"{path}.lock", 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_private(self, path, data):
+        # Write to a temp file and rename so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+        try:
+            os.fchmod(fd, 0o600)
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _path(self, registry):
+        return os.path.join(self.cache_dir, hashlib.sha256(registry.encode()).hexdigest()[:16] + '.token')
+
+    def _read(self, path):
+        if self._memory is not None:
+            return self._memory.get(path)
+        try:
+            with open(path, 'rb') as file:
+                return json.loads(self._fernet.decrypt(file.read()))
+        except (OSError, InvalidToken, ValueError):
+            return None
+
+    def _store(self, path, entry):
+        if self._memory is not None:
+            self._memory[path] = entry
+        else:
+            self._write_private(path, self._fernet.encrypt(json.dumps(entry).encode()))
+
+    def _fresh(self, entry):
+        return entry is not None and entry['expires_at'] - time.time() > self.refresh_margin
+
+    def get(self, ecr_client, registry):
+        registry = registry_host(registry)
+        path = self._path(registry)
+        entry = self._read(path)
+        if self._fresh(entry):
+            return entry
+        with self._locked(path):
+            # Another process may have refreshed the token while we waited for the lock
+            entry = self._read(path)
+            if self._fresh(entry):
+                return entry
+            tracer.event(f"🔑 Fetching a new ECR authorization token for {registry}...")
+            data = ecr_client.get_authorization_token(registryIds=[registry.split('.')[0]])['authorizationData'][0]
+            username, password = base64.b64decode(data['authorizationToken']).decode().split(':', 1)
+            entry = {
+                'registry': registry,
+                'username': username,
+                'password': password,
+                'expires_at': data['expiresAt'].timestamp(),
+            }
+            self._store(path, entry)
+            return entry
+
+
+def _docker_config():
+    try:
+        with open(DOCKER_CONFIG, 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def docker_has_valid_login(registry, margin=REFRESH_MARGIN):
+    # True when docker can already authenticate against the registry without a new login
+    registry = registry_host(registry)
+    config = _docker_config()
+    helper = config.get('credHelpers', {}).get(registry)
+    if helper == 'ecr-login':
+        # amazon-ecr-credential-helper fetches and refreshes tokens by itself
+        return True
+    password = None
+    helper = helper or config.get('credsStore')
+    if helper and shutil.which(f"docker-credential-{helper}"):
+        for server in (registry, f"https://{registry}"):
+            result = subprocess.run([f"docker-credential-{helper}", 'get'], input=server, capture_output=True, text=True)
+            if result.returncode == 0:
+                try:
+                    password = json.loads(result.stdout).get('Secret')
+                except (ValueError, AttributeError):
+                    return False  # Malformed helper output: treat as not logged in
+                break
+    else:
+        for server in (registry, f"https://{registry}"):
+            auth = config.get('auths', {}).get(server, {}).get('auth')
+            if auth:
+                try:
+                    password = base64.b64decode(auth).decode().split(':', 1)[1]
+                except (ValueError, IndexError):
+                    return False  # Not base64 'user:password': treat as not logged in
+                break
+    expiration = token_expiration(password) if password else None
+    return expiration is not None and expiration - time.time() > margin
+
+
+_default_cache = None
+
+
+def ensure_docker_login(ecr_client, registry, cache=None):
+    global _default_cache
+    registry = registry_host(registry)
+    if docker_has_valid_login(registry):
+        tracer.event(f"✅ Docker already holds valid credentials for {registry}. Skipping login.")
+        return False
+    if cache is None:
+        _default_cache = _default_cache or EcrTokenCache()
+        cache = _default_cache
+    entry = cache.get(ecr_client, registry)
+    tracer.event(f"🔐 Logging in to {registry}...")
+    subprocess.run(
+        ['docker', 'login', '--username', entry['username'], '--password-stdin', registry],
+        input=entry['password'].encode(), check=True, capture_output=True
+    )
+    tracer.event(f"✅ Logged in to ECR successfully!")
+    return True
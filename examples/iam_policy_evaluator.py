@@ -0,0 +1,300 @@
+import boto3
+import json
+import re
+import sys
+import time
+from urllib.parse import unquote
+from instrumentation import tracer
+
+ALLOWED = 'allowed'
+DENIED = 'explicit_deny'
+IMPLICIT_DENY = 'implicit_deny'
+
+_VARIABLE = re.compile(r'\\\$\\\{[^}]*\\\}')
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _principal_arn(principal):
+    # Policies may name an account by its bare ID, which stands for its root principal
+    return f"arn:aws:iam::{principal}:root" if principal.isdigit() else principal
+
+
+def _as_document(document):
+    if isinstance(document, str):
+        document = json.loads(unquote(document))
+    return document
+
+
+def compile_pattern(pattern, ignore_case=False):
+    # IAM wildcards: '*' any run of characters, '?' a single character.
+    # Policy variables (${aws:username}) can only be resolved with request context,
+    # so they match any value and the statement is reported as conditional.
+    regex = re.escape(pattern).replace(r'\*', '.*').replace(r'\?', '.')
+    regex = _VARIABLE.sub('.*', regex)
+    return re.compile(regex, re.IGNORECASE if ignore_case else 0)
+
+
+class PatternIndex:
+    # Unique patterns compiled once, bucketed by their literal prefix (the service for
+    # actions, the service segment for ARNs). A value is only matched against the bucket
+    # it can belong to plus the patterns that start with a wildcard, and results are memoized
+    # per index (adding a pattern invalidates them).
+    def __init__(self, ignore_case, bucket_of):
+        self.ignore_case = ignore_case
+        self.bucket_of = bucket_of
+        self.ids = {}
+        self.buckets = {}
+        self._matches = {}
+
+    def add(self, pattern):
+        key = pattern.lower() if self.ignore_case else pattern
+        if key not in self.ids:
+            self.ids[key] = len(self.ids)
+            self.buckets.setdefault(self.bucket_of(key), []).append((self.ids[key], compile_pattern(key, self.ignore_case)))
+            self._matches.clear()
+        return self.ids[key]
+
+    def matches(self, value):
+        if value not in self._matches:
+            key = value.lower() if self.ignore_case else value
+            candidates = self.buckets.get(self.bucket_of(key), []) + self.buckets.get(None, [])
+            self._matches[value] = frozenset(pattern_id for pattern_id, regex in candidates if regex.fullmatch(key))
+        return self._matches[value]
+
+
+def _action_bucket(value):
+    service = value.split(':', 1)[0]
+    return None if '*' in service or '?' in service else service
+
+
+def _resource_bucket(value):
+    parts = value.split(':')
+    if len(parts) < 3 or '*' in parts[2] or '?' in parts[2] or '*' in parts[0] or '?' in parts[0]:
+        return None
+    return parts[2]
+
+
+class Statement:
+    __slots__ = ('effect', 'actions', 'not_actions', 'resources', 'not_resources', 'conditional', 'policy', 'sid')
+
+    def __init__(self, effect, policy, sid):
+        self.effect = effect
+        self.policy = policy
+        self.sid = sid
+        self.actions = frozenset()
+        self.not_actions = frozenset()
+        self.resources = frozenset()
+        self.not_resources = frozenset()
+        self.conditional = False
+
+
+class PolicySimulator:
+    # Local evaluation of identity-based policies: explicit deny > allow > implicit deny.
+    # Conditions are not evaluated; matching statements with conditions are flagged instead.
+    def __init__(self):
+        self.action_patterns = PatternIndex(True, _action_bucket)
+        self.resource_patterns = PatternIndex(False, _resource_bucket)
+        self.statements = []
+        self.policies = {}
+        self.principals = {}
+        # Inverted indexes: pattern id -> statements using it
+        self._by_action = {}
+        self._not_action_statements = []
+
+    def add_policy(self, name, document):
+        if name in self.policies:
+            return self.policies[name]
+        ids = []
+        for index, raw in enumerate(_as_list(_as_document(document).get('Statement'))):
+            statement = Statement(raw.get('Effect', 'Allow'), name, raw.get('Sid', str(index)))
+            statement.actions = frozenset(self.action_patterns.add(a) for a in _as_list(raw.get('Action')))
+            statement.not_actions = frozenset(self.action_patterns.add(a) for a in _as_list(raw.get('NotAction')))
+            statement.resources = frozenset(self.resource_patterns.add(r) for r in _as_list(raw.get('Resource')))
+            statement.not_resources = frozenset(self.resource_patterns.add(r) for r in _as_list(raw.get('NotResource')))
+            statement.conditional = 'Condition' in raw or '${' in json.dumps(raw.get('Resource', ''))
+            statement_id = len(self.statements)
+            self.statements.append(statement)
+            for pattern_id in statement.actions:
+                self._by_action.setdefault(pattern_id, set()).add(statement_id)
+            if statement.not_actions:
+                self._not_action_statements.append(statement_id)
+            ids.append(statement_id)
+        self.policies[name] = ids
+        return ids
+
+    def add_principal(self, arn, policy_names):
+        statement_ids = set()
+        for name in policy_names:
+            statement_ids.update(self.policies.get(name, []))
+        self.principals[arn] = statement_ids
+
+    @classmethod
+    @tracer.step('load_authorization_details')
+    def from_account(cls, iam_client=None):
+        # A single paginated call returns every role, user, group and managed policy document
+        iam_client = iam_client or boto3.client('iam')
+        simulator = cls()
+        details = {'RoleDetailList': [], 'UserDetailList': [], 'GroupDetailList': [], 'Policies': []}
+        for page in iam_client.get_paginator('get_account_authorization_details').paginate():
+            for key in details:
+                details[key].extend(page.get(key, []))
+        for policy in details['Policies']:
+            default = next(v for v in policy['PolicyVersionList'] if v['IsDefaultVersion'])
+            simulator.add_policy(policy['Arn'], default['Document'])
+
+        def inline(owner_arn, inline_policies):
+            names = []
+            for inline_policy in inline_policies or []:
+                name = f"{owner_arn}/inline/{inline_policy['PolicyName']}"
+                simulator.add_policy(name, inline_policy['PolicyDocument'])
+                names.append(name)
+            return names
+
+        groups = {}
+        for group in details['GroupDetailList']:
+            groups[group['GroupName']] = [p['PolicyArn'] for p in group.get('AttachedManagedPolicies', [])] + inline(group['Arn'], group.get('GroupPolicyList'))
+        for role in details['RoleDetailList']:
+            simulator.add_principal(role['Arn'], [p['PolicyArn'] for p in role.get('AttachedManagedPolicies', [])] + inline(role['Arn'], role.get('RolePolicyList')))
+        for user in details['UserDetailList']:
+            names = [p['PolicyArn'] for p in user.get('AttachedManagedPolicies', [])] + inline(user['Arn'], user.get('UserPolicyList'))
+            for group_name in user.get('GroupList', []):
+                names.extend(groups.get(group_name, []))
+            simulator.add_principal(user['Arn'], names)
+        tracer.event(f"👥 Indexed {len(simulator.principals)} principals, {len(simulator.policies)} policies, {len(simulator.statements)} statements")
+        return simulator
+
+    def _candidates(self, action):
+        # Statements whose Action matches, plus NotAction statements that do not exclude it
+        matched = self.action_patterns.matches(action)
+        ids = set()
+        for pattern_id in matched:
+            ids.update(self._by_action.get(pattern_id, ()))
+        for statement_id in self._not_action_statements:
+            if not (self.statements[statement_id].not_actions & matched):
+                ids.add(statement_id)
+        return ids
+
+    def _resource_applies(self, statement, resource):
+        matched = self.resource_patterns.matches(resource)
+        if statement.not_resources:
+            return not (statement.not_resources & matched)
+        return bool(statement.resources & matched)
+
+    def _decide(self, statement_ids, resource):
+        decision, conditional, reasons = IMPLICIT_DENY, False, []
+        for statement_id in statement_ids:
+            statement = self.statements[statement_id]
+            if not self._resource_applies(statement, resource):
+                continue
+            if statement.effect == 'Deny' and not statement.conditional:
+                return DENIED, False, [f"{statement.policy}#{statement.sid}"]
+            if statement.effect == 'Allow':
+                decision = ALLOWED
+                conditional = conditional or statement.conditional
+                reasons.append(f"{statement.policy}#{statement.sid}")
+            elif statement.effect == 'Deny':
+                # A conditional deny may or may not apply: the allow becomes conditional
+                conditional = True
+        return decision, conditional and decision == ALLOWED, reasons
+
+    def can(self, principal, action, resource):
+        # Returns (decision, conditional, matching statements)
+        statement_ids = self._candidates(action) & self.principals.get(principal, set())
+        return self._decide(statement_ids, resource)
+
+    def who_can(self, action, resource):
+        # Bulk query: every principal allowed to perform `action` on `resource`
+        candidates = self._candidates(action)
+        result = {}
+        for principal, statement_ids in self.principals.items():
+            relevant = candidates & statement_ids
+            if relevant:
+                decision, conditional, reasons = self._decide(relevant, resource)
+                if decision == ALLOWED:
+                    result[principal] = {'conditional': conditional, 'statements': reasons}
+        return result
+
+    def who_can_decrypt(self, key_arn, key_policy=None):
+        # For KMS the key policy must also allow the call. A principal it names directly can
+        # decrypt on that grant alone; naming an account root delegates to IAM, so only then
+        # the principals of that account whose IAM policies allow kms:Decrypt are added
+        allowed = self.who_can('kms:Decrypt', key_arn)
+        if key_policy is None:
+            return allowed
+        result = {}
+
+        def grant(arn, conditional, reasons):
+            # A principal is conditional only if every grant that reaches it is
+            info = result.setdefault(arn, {'conditional': True, 'statements': []})
+            info['conditional'] = info['conditional'] and conditional
+            info['statements'].extend(reasons)
+
+        for index, statement in enumerate(_as_list(_as_document(key_policy).get('Statement'))):
+            actions = [compile_pattern(a, True) for a in _as_list(statement.get('Action'))]
+            if statement.get('Effect') != 'Allow' or not any(regex.fullmatch('kms:decrypt') for regex in actions):
+                continue
+            conditional = 'Condition' in statement
+            reason = f"key-policy#{statement.get('Sid', str(index))}"
+            principal = statement.get('Principal', {})
+            principal = principal.get('AWS') if isinstance(principal, dict) else principal
+            for arn in map(_principal_arn, _as_list(principal)):
+                if arn == '*':
+                    for known in self.principals:
+                        grant(known, conditional, [reason])
+                elif arn.endswith(':root'):
+                    account = arn.split(':')[4]
+                    for known, info in allowed.items():
+                        if known.split(':')[4] == account:
+                            grant(known, conditional or info['conditional'], [reason] + info['statements'])
+                else:
+                    grant(arn, conditional, [reason])
+        return result
+
+
+def local_example():
+    # The policies the example scripts attach, evaluated without calling AWS
+    simulator = PolicySimulator()
+    simulator.add_policy('AmazonSSMManagedInstanceCore', {
+        'Version': '2012-10-17',
+        'Statement': [
+            {'Effect': 'Allow', 'Action': ['ssm:DescribeAssociation', 'ssm:GetDocument', 'ssm:UpdateInstanceInformation', 'ssmmessages:*', 'ec2messages:*'], 'Resource': '*'}
+        ]
+    })
+    simulator.add_policy('AWSLambdaBasicExecutionRole', {
+        'Version': '2012-10-17',
+        'Statement': [
+            {'Effect': 'Allow', 'Action': ['logs:CreateLogGroup', 'logs:CreateLogStream', 'logs:PutLogEvents'], 'Resource': '*'}
+        ]
+    })
+    simulator.add_principal('arn:aws:iam::123456789012:role/SSMInstanceRole', ['AmazonSSMManagedInstanceCore'])
+    simulator.add_principal('arn:aws:iam::123456789012:role/my-lambda-execution-role', ['AWSLambdaBasicExecutionRole'])
+    return simulator
+
+
+def main():
+    # python iam_policy_evaluator.py [--local] <action> <resource>
+    args = sys.argv[1:]
+    simulator = local_example() if args[:1] == ['--local'] else PolicySimulator.from_account()
+    args = args[1:] if args[:1] == ['--local'] else args
+    action = args[0] if args else 'kms:Decrypt'
+    resource = args[1] if len(args) > 1 else '*'
+    start = time.perf_counter()
+    allowed = simulator.who_can(action, resource)
+    elapsed = (time.perf_counter() - start) * 1000
+    tracer.event(f"\n🔎 Principals that can {action} on {resource} ({elapsed:.1f} ms):")
+    for principal, info in sorted(allowed.items()):
+        suffix = ' ⚠️ (conditional)' if info['conditional'] else ''
+        tracer.event(f"  ✅ {principal}{suffix}")
+        for reason in info['statements']:
+            tracer.event(f"      ↳ {reason}")
+    if not allowed:
+        tracer.event("  Nobody ✅")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,379 @@
+import atexit
+import functools
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+# Error codes AWS uses to signal throttling, counted separately from other retries
+THROTTLE_ERROR_CODES = {
+    'Throttling',
+    'ThrottlingException',
+    'ThrottledException',
+    'RequestThrottled',
+    'RequestThrottledException',
+    'RequestLimitExceeded',
+    'TooManyRequestsException',
+    'ProvisionedThroughputExceededException',
+    'SlowDown',
+    'PriorRequestNotComplete',
+}
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_CONTEXT_KEY = 'instrumentation_span'
+
+
+class Span:
+    def __init__(self, name, kind, trace_id, parent_id=None, attributes=None):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.events = []
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = STATUS_OK
+        self.error = None
+        self._perf_start = time.perf_counter_ns()
+
+    def finish(self, error=None):
+        self.end_ns = self.start_ns + (time.perf_counter_ns() - self._perf_start)
+        if error is not None:
+            self.status = STATUS_ERROR
+            self.error = str(error)
+
+    @property
+    def duration_ms(self):
+        if self.end_ns is None:
+            return None
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_record(self):
+        return {
+            'type': 'span',
+            'name': self.name,
+            'kind': 'aws' if self.kind == SPAN_KIND_CLIENT else 'step',
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start': self.start_ns / 1e9,
+            'duration_ms': round(self.duration_ms, 3),
+            'status': 'error' if self.status == STATUS_ERROR else 'ok',
+            'error': self.error,
+            'attributes': self.attributes,
+        }
+
+
+class ConsoleSink:
+    # Human-readable output: progress messages exactly as the examples used to print them
+    def __init__(self, stream=None, show_spans=False):
+        self.stream = stream
+        self.show_spans = show_spans
+
+    def _write(self, text):
+        print(text, file=self.stream or sys.stdout)
+
+    def on_event(self, record):
+        self._write(record['message'])
+
+    def on_span(self, span):
+        if self.show_spans:
+            self._write(f"  ⏱️ {span.name}: {span.duration_ms:.1f} ms")
+
+    def close(self, tracer):
+        pass
+
+
+class JsonlSink:
+    # One JSON object per event and finished span, appended as they happen
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a')
+
+    def _write(self, record):
+        with self._lock:
+            self._file.write(json.dumps(record, default=str) + '\n')
+            self._file.flush()
+
+    def on_event(self, record):
+        self._write(record)
+
+    def on_span(self, span):
+        self._write(span.to_record())
+
+    def close(self, tracer):
+        self._file.close()
+
+
+class OtlpJsonSink:
+    # Writes an OTLP/JSON ExportTraceServiceRequest on close, which can be replayed into
+    # any OpenTelemetry collector (otlphttp receiver) or inspected by hand
+    def __init__(self, path, service_name='iso27017-examples'):
+        self.path = path
+        self.service_name = service_name
+        self._spans = []
+        self._lock = threading.Lock()
+
+    def on_event(self, record):
+        pass
+
+    def on_span(self, span):
+        with self._lock:
+            self._spans.append(span)
+
+    @staticmethod
+    def _attributes(values):
+        attributes = []
+        for key, value in values.items():
+            if isinstance(value, bool):
+                typed = {'boolValue': value}
+            elif isinstance(value, int):
+                typed = {'intValue': str(value)}
+            elif isinstance(value, float):
+                typed = {'doubleValue': value}
+            else:
+                typed = {'stringValue': str(value)}
+            attributes.append({'key': key, 'value': typed})
+        return attributes
+
+    def _span(self, span):
+        otlp_span = {
+            'traceId': span.trace_id,
+            'spanId': span.span_id,
+            'name': span.name,
+            'kind': span.kind,
+            'startTimeUnixNano': str(span.start_ns),
+            'endTimeUnixNano': str(span.end_ns),
+            'attributes': self._attributes(span.attributes),
+            'events': [
+                {
+                    'timeUnixNano': str(event['time_ns']),
+                    'name': event['message'],
+                    'attributes': self._attributes(event['attributes']),
+                }
+                for event in span.events
+            ],
+            'status': {'code': span.status},
+        }
+        if span.parent_id:
+            otlp_span['parentSpanId'] = span.parent_id
+        if span.error:
+            otlp_span['status']['message'] = span.error
+        return otlp_span
+
+    def close(self, tracer):
+        payload = {
+            'resourceSpans': [{
+                'resource': {'attributes': self._attributes({'service.name': self.service_name})},
+                'scopeSpans': [{
+                    'scope': {'name': 'instrumentation'},
+                    'spans': [self._span(span) for span in self._spans],
+                }],
+            }]
+        }
+        with open(self.path, 'w') as file:
+            json.dump(payload, file)
+
+
+class Tracer:
+    def __init__(self, sinks=None):
+        self.sinks = list(sinks) if sinks is not None else [ConsoleSink()]
+        self.spans = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # Weak, so a new session never inherits the id() of a collected one
+        self._instrumented = weakref.WeakSet()
+        self._closed = False
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    # ---- span bookkeeping -------------------------------------------------
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def current_span(self):
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def _start(self, name, kind, attributes):
+        parent = self.current_span()
+        trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        return Span(name, kind, trace_id, parent.span_id if parent else None, attributes)
+
+    def _finish(self, span, error=None):
+        span.finish(error)
+        with self._lock:
+            self.spans.append(span)
+        for sink in self.sinks:
+            sink.on_span(span)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        # Times a logical step; AWS calls made inside it become its children
+        span = self._start(name, SPAN_KIND_INTERNAL, attributes)
+        self._stack().append(span)
+        try:
+            yield span
+        except BaseException as e:
+            self._stack().pop()
+            self._finish(span, e)
+            raise
+        self._stack().pop()
+        self._finish(span)
+
+    def step(self, name=None):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name or func.__name__):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def event(self, message, level='info', **attributes):
+        # Progress message; replaces the print() calls of the examples
+        span = self.current_span()
+        record = {
+            'type': 'event',
+            'time': time.time(),
+            'level': level,
+            'message': str(message),
+            'span_id': span.span_id if span else None,
+            'attributes': attributes,
+        }
+        if span:
+            span.events.append({'time_ns': time.time_ns(), 'message': record['message'], 'attributes': dict(attributes, level=level)})
+        for sink in self.sinks:
+            sink.on_event(record)
+
+    # ---- botocore hooks ---------------------------------------------------
+
+    def instrument(self, target=None):
+        # Accepts a boto3 Session, a client or nothing (the boto3 default session).
+        # Sessions must be instrumented before creating the clients that should be timed.
+        if target is None:
+            import boto3
+            if boto3.DEFAULT_SESSION is None:
+                boto3.setup_default_session()
+            target = boto3.DEFAULT_SESSION
+        events = target.meta.events if hasattr(target, 'meta') else target.events
+        with self._lock:
+            if events in self._instrumented:
+                return target
+            self._instrumented.add(events)
+        events.register('before-call', self._before_call)
+        events.register('needs-retry', self._needs_retry)
+        events.register('after-call', self._after_call)
+        events.register('after-call-error', self._after_call_error)
+        return target
+
+    def _before_call(self, model, context, **kwargs):
+        span = self._start(f"{model.service_model.service_name}.{model.name}", SPAN_KIND_CLIENT, {
+            'rpc.system': 'aws-api',
+            'rpc.service': model.service_model.service_name,
+            'rpc.method': model.name,
+        })
+        span.attributes['aws.throttles'] = 0
+        context[_CONTEXT_KEY] = span
+
+    def _needs_retry(self, response=None, request_dict=None, **kwargs):
+        if not response or not request_dict:
+            return None
+        span = request_dict.get('context', {}).get(_CONTEXT_KEY)
+        code = response[1].get('Error', {}).get('Code') if response[1] else None
+        if span is not None and code in THROTTLE_ERROR_CODES:
+            span.attributes['aws.throttles'] += 1
+        return None
+
+    def _after_call(self, http_response, parsed, context, **kwargs):
+        span = context.pop(_CONTEXT_KEY, None)
+        if span is None:
+            return
+        metadata = parsed.get('ResponseMetadata', {})
+        span.attributes['http.status_code'] = metadata.get('HTTPStatusCode', http_response.status_code)
+        span.attributes['aws.retries'] = metadata.get('RetryAttempts', 0)
+        if metadata.get('RequestId'):
+            span.attributes['aws.request_id'] = metadata['RequestId']
+        error_code = parsed.get('Error', {}).get('Code')
+        if error_code:
+            span.attributes['aws.error_code'] = error_code
+        self._finish(span, error_code)
+
+    def _after_call_error(self, exception, context, **kwargs):
+        span = context.pop(_CONTEXT_KEY, None)
+        if span is not None:
+            self._finish(span, exception)
+
+    # ---- reporting --------------------------------------------------------
+
+    def operation_stats(self):
+        stats = {}
+        for span in self.spans:
+            if span.kind != SPAN_KIND_CLIENT:
+                continue
+            entry = stats.setdefault(span.name, {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'retries': 0, 'throttles': 0, 'errors': 0})
+            entry['calls'] += 1
+            entry['total_ms'] += span.duration_ms
+            entry['max_ms'] = max(entry['max_ms'], span.duration_ms)
+            entry['retries'] += span.attributes.get('aws.retries', 0)
+            entry['throttles'] += span.attributes.get('aws.throttles', 0)
+            entry['errors'] += span.status == STATUS_ERROR
+        return stats
+
+    def summary(self, top=10):
+        steps = sorted((span for span in self.spans if span.kind == SPAN_KIND_INTERNAL), key=lambda s: s.duration_ms, reverse=True)
+        lines = ["\n📊 Slowest steps:"]
+        for span in steps[:top]:
+            marker = ' ❌' if span.status == STATUS_ERROR else ''
+            lines.append(f"  {span.duration_ms:>10.1f} ms  {span.name}{marker}")
+        stats = self.operation_stats()
+        if stats:
+            lines.append("\n☁️ AWS API calls:")
+            lines.append(f"  {'Operation':<45} {'Calls':>5} {'Total ms':>10} {'Max ms':>9} {'Retries':>7} {'Throttles':>9}")
+            for name, entry in sorted(stats.items(), key=lambda item: item[1]['total_ms'], reverse=True):
+                lines.append(f"  {name:<45} {entry['calls']:>5} {entry['total_ms']:>10.1f} {entry['max_ms']:>9.1f} {entry['retries']:>7} {entry['throttles']:>9}")
+        return '\n'.join(lines)
+
+    def close(self, print_summary=True):
+        if self._closed:
+            return
+        self._closed = True
+        if print_summary and self.spans:
+            print(self.summary())
+        for sink in self.sinks:
+            sink.close(self)
+
+
+def configure(jsonl_path=None, otlp_path=None, show_spans=None):
+    # Output destinations default to the TRACE_JSONL / TRACE_OTLP environment variables
+    jsonl_path = jsonl_path or os.environ.get('TRACE_JSONL')
+    otlp_path = otlp_path or os.environ.get('TRACE_OTLP')
+    if show_spans is None:
+        show_spans = os.environ.get('TRACE_VERBOSE') == '1'
+    sinks = [ConsoleSink(show_spans=show_spans)]
+    if jsonl_path:
+        sinks.append(JsonlSink(jsonl_path))
+    if otlp_path:
+        sinks.append(OtlpJsonSink(otlp_path))
+    tracer.sinks = sinks
+    return tracer
+
+
+tracer = Tracer()
+configure()
+atexit.register(tracer.close)
@@ -0,0 +1,288 @@
+import boto3
+import hashlib
+import json
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from instrumentation import tracer
+
+DATABASE = 'inventory.sqlite'
+REGIONS = ['us-east-1']
+MAX_WORKERS = 16
+# CloudTrail event history only goes back 90 days; older snapshots get a full refresh
+CHANGE_FEED_WINDOW = timedelta(days=89)
+# CloudTrail delivers events to the event history some minutes late; the feed starts this
+# much before the last snapshot so nothing written just before it is missed
+CHANGE_FEED_LAG = timedelta(minutes=15)
+# Global services (IAM) record their events in us-east-1 whatever region the call went to
+GLOBAL_EVENTS_REGION = 'us-east-1'
+
+
+def _flatten_instances(page):
+    return [instance for reservation in page['Reservations'] for instance in reservation['Instances']]
+
+
+# resource type -> (service, operation, result key or extractor, id field, global service)
+COLLECTORS = {
+    'vpcs': ('ec2', 'describe_vpcs', 'Vpcs', 'VpcId', False),
+    'subnets': ('ec2', 'describe_subnets', 'Subnets', 'SubnetId', False),
+    'route_tables': ('ec2', 'describe_route_tables', 'RouteTables', 'RouteTableId', False),
+    'security_groups': ('ec2', 'describe_security_groups', 'SecurityGroups', 'GroupId', False),
+    'security_group_rules': ('ec2', 'describe_security_group_rules', 'SecurityGroupRules', 'SecurityGroupRuleId', False),
+    'nat_gateways': ('ec2', 'describe_nat_gateways', 'NatGateways', 'NatGatewayId', False),
+    'instances': ('ec2', 'describe_instances', _flatten_instances, 'InstanceId', False),
+    'kms_keys': ('kms', 'list_keys', 'Keys', 'KeyId', False),
+    'lambda_functions': ('lambda', 'list_functions', 'Functions', 'FunctionArn', False),
+    'roles': ('iam', 'list_roles', 'Roles', 'Arn', True),
+    'buckets': ('s3', 'list_buckets', 'Buckets', 'Name', True),
+}
+
+# CloudTrail event name fragments -> resource types they modify
+CHANGE_FEED_RULES = [
+    ('SecurityGroup', ['security_groups', 'security_group_rules']),
+    ('Subnet', ['subnets']),
+    ('RouteTable', ['route_tables']),
+    ('Route', ['route_tables']),
+    ('NatGateway', ['nat_gateways']),
+    ('Instance', ['instances']),
+    ('Vpc', ['vpcs']),
+]
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    mode TEXT NOT NULL,
+    refreshed TEXT,
+    -- type@region pairs whose collection failed; the next refresh collects them again
+    failed TEXT
+);
+-- One row per version of a resource; valid_to is NULL while it is current.
+-- "As of snapshot N" is valid_from <= N AND (valid_to IS NULL OR valid_to > N).
+CREATE TABLE IF NOT EXISTS resource_versions (
+    resource_type TEXT NOT NULL,
+    region TEXT NOT NULL,
+    resource_id TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    data TEXT NOT NULL,
+    valid_from INTEGER NOT NULL REFERENCES snapshots(id),
+    valid_to INTEGER REFERENCES snapshots(id)
+);
+CREATE INDEX IF NOT EXISTS idx_current ON resource_versions (resource_type, region, resource_id) WHERE valid_to IS NULL;
+CREATE INDEX IF NOT EXISTS idx_history ON resource_versions (resource_type, valid_from, valid_to);
+'''
+
+
+def _content_hash(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class Inventory:
+    def __init__(self, path=DATABASE, regions=REGIONS, session=None, max_workers=MAX_WORKERS):
+        self.path = path
+        self.regions = regions
+        self.session = session or boto3.Session()
+        self.max_workers = max_workers
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+        if 'failed' not in {row['name'] for row in self.db.execute('PRAGMA table_info(snapshots)')}:
+            self.db.execute('ALTER TABLE snapshots ADD COLUMN failed TEXT')
+        self._clients = {}
+        self._config = Config(retries={'mode': 'adaptive', 'max_attempts': 10}, max_pool_connections=max_workers)
+
+    def _client(self, service, region):
+        # Not thread-safe (the session is shared): refresh() creates every client it needs
+        # on the calling thread before the collectors start
+        key = (service, region)
+        if key not in self._clients:
+            self._clients[key] = self.session.client(service, region_name=None if region == 'global' else region, config=self._config)
+        return self._clients[key]
+
+    def _targets(self, resource_types):
+        for resource_type in resource_types:
+            is_global = COLLECTORS[resource_type][4]
+            for region in (['global'] if is_global else self.regions):
+                yield resource_type, region
+
+    def _collect(self, resource_type, region):
+        service, operation, extractor, id_field, _ = COLLECTORS[resource_type]
+        client = self._client(service, region)
+        items = []
+        if client.can_paginate(operation):
+            pages = client.get_paginator(operation).paginate()
+        else:
+            pages = [getattr(client, operation)()]
+        for page in pages:
+            items.extend(extractor(page) if callable(extractor) else page.get(extractor, []))
+        return resource_type, region, {item[id_field]: item for item in items}
+
+    def last_snapshot(self):
+        return self.db.execute('SELECT * FROM snapshots WHERE finished_at IS NOT NULL ORDER BY id DESC LIMIT 1').fetchone()
+
+    def changed_types(self, since):
+        # CloudTrail event history as a change feed: only resource types with write
+        # events since the last snapshot are collected again. lookup_events takes a single
+        # lookup attribute, so the feed asks for write events only and the event source
+        # is matched here: one listing per region covers every service.
+        changed = set()
+        sources = {'ec2.amazonaws.com': 'ec2', 'iam.amazonaws.com': 'iam', 's3.amazonaws.com': 's3',
+                   'kms.amazonaws.com': 'kms', 'lambda.amazonaws.com': 'lambda'}
+        types_by_source = {
+            source: {name for name, collector in COLLECTORS.items() if collector[0] == service}
+            for source, service in sources.items()
+        }
+        global_sources = {source for source, types in types_by_source.items() if any(COLLECTORS[name][4] for name in types)}
+        for region in sorted(set(self.regions) | {GLOBAL_EVENTS_REGION}):
+            # Outside the inventoried regions only the events of global services matter
+            watched = set(sources) if region in self.regions else global_sources
+            watched = {source for source in watched if not types_by_source[source] <= changed}
+            if not watched:
+                continue
+            paginator = self._client('cloudtrail', region).get_paginator('lookup_events')
+            for page in paginator.paginate(
+                LookupAttributes=[{'AttributeKey': 'ReadOnly', 'AttributeValue': 'false'}],
+                StartTime=since - CHANGE_FEED_LAG
+            ):
+                for event in page['Events']:
+                    source = event.get('EventSource')
+                    if source not in watched:
+                        continue
+                    types = types_by_source[source]
+                    if sources[source] != 'ec2':
+                        changed.update(types)
+                    else:
+                        matched = [affected for fragment, affected in CHANGE_FEED_RULES if fragment in event['EventName']]
+                        changed.update(matched[0] if matched else types)
+                    if types <= changed:
+                        watched.discard(source)
+                if not watched:
+                    break
+        return changed
+
+    def failed_targets(self, snapshot):
+        # (type, region) pairs a snapshot could not collect; their stored state is stale
+        if snapshot is None or not snapshot['failed']:
+            return []
+        return [tuple(target.split('@', 1)) for target in snapshot['failed'].split(',')]
+
+    @tracer.step()
+    def refresh(self, incremental=True):
+        last = self.last_snapshot()
+        resource_types = list(COLLECTORS)
+        mode = 'full'
+        if incremental and last is not None:
+            since = datetime.fromisoformat(last['started_at'])
+            if datetime.now(timezone.utc) - since < CHANGE_FEED_WINDOW:
+                try:
+                    resource_types = sorted(self.changed_types(since))
+                    mode = 'incremental'
+                except ClientError as e:
+                    tracer.event(f"⚠️ Change feed unavailable ({e}); doing a full refresh", level='error')
+
+        # Whatever the last snapshot failed to collect is collected again, changed or not
+        targets = list(dict.fromkeys([*self._targets(resource_types), *self.failed_targets(last)]))
+        resource_types = sorted({resource_type for resource_type, _ in targets})
+        started_at = datetime.now(timezone.utc).isoformat()
+        snapshot_id = self.db.execute(
+            'INSERT INTO snapshots (started_at, mode, refreshed) VALUES (?, ?, ?)',
+            (started_at, mode, ','.join(resource_types))
+        ).lastrowid
+        tracer.event(f"📸 Snapshot {snapshot_id} ({mode}): collecting {len(resource_types)} resource types...")
+
+        # Describe calls run concurrently; SQLite is only written from this thread
+        for resource_type, region in targets:
+            self._client(COLLECTORS[resource_type][0], region)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._collect, resource_type, region): (resource_type, region) for resource_type, region in targets}
+            changes = 0
+            failed = []
+            for future, (resource_type, region) in futures.items():
+                try:
+                    resource_type, region, items = future.result()
+                except (ClientError, BotoCoreError) as e:
+                    tracer.event(f"❌ Collection of {resource_type} in {region} failed: {e}", level='error')
+                    failed.append(f"{resource_type}@{region}")
+                    continue
+                changes += self._store(snapshot_id, resource_type, region, items)
+
+        self.db.execute(
+            'UPDATE snapshots SET finished_at = ?, failed = ? WHERE id = ?',
+            (datetime.now(timezone.utc).isoformat(), ','.join(failed) or None, snapshot_id)
+        )
+        self.db.commit()
+        tracer.event(f"✅ Snapshot {snapshot_id} stored: {changes} resources added, changed or removed")
+        if failed:
+            tracer.event(f"⚠️ {len(failed)} collections failed and will be retried on the next refresh: {', '.join(failed)}", level='error')
+        return snapshot_id
+
+    def _store(self, snapshot_id, resource_type, region, items):
+        current = {
+            row['resource_id']: row['content_hash']
+            for row in self.db.execute(
+                'SELECT resource_id, content_hash FROM resource_versions WHERE resource_type = ? AND region = ? AND valid_to IS NULL',
+                (resource_type, region)
+            )
+        }
+        hashes = {resource_id: _content_hash(data) for resource_id, data in items.items()}
+        closed = [resource_id for resource_id, content_hash in current.items() if hashes.get(resource_id) != content_hash]
+        added = [resource_id for resource_id, content_hash in hashes.items() if current.get(resource_id) != content_hash]
+        self.db.executemany(
+            'UPDATE resource_versions SET valid_to = ? WHERE resource_type = ? AND region = ? AND resource_id = ? AND valid_to IS NULL',
+            [(snapshot_id, resource_type, region, resource_id) for resource_id in closed]
+        )
+        self.db.executemany(
+            'INSERT INTO resource_versions (resource_type, region, resource_id, content_hash, data, valid_from) VALUES (?, ?, ?, ?, ?, ?)',
+            [(resource_type, region, resource_id, hashes[resource_id], json.dumps(items[resource_id], default=str), snapshot_id) for resource_id in added]
+        )
+        return len(set(closed) | set(added))
+
+    def resources(self, resource_type, as_of=None, region=None):
+        # Current resources, or the state at a past snapshot (audit evidence)
+        sql = 'SELECT region, resource_id, data FROM resource_versions WHERE resource_type = ?'
+        params = [resource_type]
+        if as_of is None:
+            sql += ' AND valid_to IS NULL'
+        else:
+            sql += ' AND valid_from <= ? AND (valid_to IS NULL OR valid_to > ?)'
+            params += [as_of, as_of]
+        if region:
+            sql += ' AND region = ?'
+            params.append(region)
+        return [dict(json.loads(row['data']), _region=row['region']) for row in self.db.execute(sql, params)]
+
+    def query(self, sql, params=()):
+        # Free-form SQL over the snapshot, e.g. with json_extract(data, '$.VpcId')
+        return [dict(row) for row in self.db.execute(sql, params)]
+
+    def to_dataframe(self, resource_type, as_of=None):
+        import pandas as pd
+        return pd.json_normalize(self.resources(resource_type, as_of))
+
+    def close(self):
+        self.db.close()
+
+
+def main():
+    # python inventory.py [--full]
+    inventory = Inventory()
+    inventory.refresh(incremental='--full' not in sys.argv)
+    start = time.perf_counter()
+    route_tables = inventory.query(
+        "SELECT resource_id, json_extract(data, '$.VpcId') AS vpc_id, json_array_length(data, '$.Associations') AS associations "
+        "FROM resource_versions WHERE resource_type = 'route_tables' AND valid_to IS NULL"
+    )
+    elapsed = (time.perf_counter() - start) * 1000
+    tracer.event(f"\n🛣️ {len(route_tables)} route tables from the snapshot in {elapsed:.1f} ms")
+    for row in route_tables:
+        tracer.event(f"  {row['resource_id']} (VPC {row['vpc_id']}, {row['associations']} associations)")
+    inventory.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,389 @@
+import boto3
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from instrumentation import tracer
+from sg_analyzer import SENSITIVE_PORTS, RuleIndex, describe
+from iam_policy_evaluator import PolicySimulator
+
+MAX_WORKERS = 16
+PASS = 'pass'
+FAIL = 'fail'
+
+# Data sources that can be read from an inventory snapshot (inventory.py) instead of AWS
+INVENTORY_SOURCES = ['vpcs', 'security_groups', 'security_group_rules', 'buckets', 'kms_keys']
+
+FETCHERS = {}
+CONTROLS = {}
+
+
+def fetcher(name):
+    # Registers a data source. Fetchers receive the engine, so they can depend on other sources.
+    def decorator(func):
+        FETCHERS[name] = func
+        return func
+    return decorator
+
+
+def control(control_id, title, clause):
+    # Registers a check. It receives the engine and returns (resource, status, detail) findings.
+    def decorator(func):
+        CONTROLS[control_id] = {'id': control_id, 'title': title, 'clause': clause, 'check': func}
+        return func
+    return decorator
+
+
+class DataCache:
+    # Memoized fetches shared by every control of a run. The first caller of a source
+    # fetches it; concurrent callers wait on the same per-source lock and reuse the result.
+    def __init__(self, engine):
+        self.engine = engine
+        self._values = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            if name not in self._values:
+                with tracer.span(f"fetch:{name}"):
+                    self._values[name] = FETCHERS[name](self.engine)
+            return self._values[name]
+
+    def preload(self, name, value):
+        self._values[name] = value
+
+
+class ControlEngine:
+    def __init__(self, region_name='us-east-1', session=None, inventory=None, max_workers=MAX_WORKERS):
+        self.region_name = region_name
+        self.session = tracer.instrument(session or boto3.Session(region_name=region_name))
+        self.inventory = inventory
+        self.max_workers = max_workers
+        self._config = Config(retries={'mode': 'adaptive', 'max_attempts': 10}, max_pool_connections=max_workers)
+        self._clients = {}
+        self._clients_lock = threading.Lock()
+        # Per-resource calls (one per bucket, one per key...) use their own pool so a
+        # control waiting on them never blocks the pool the controls run in
+        self._item_pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.data = None
+
+    def client(self, service):
+        with self._clients_lock:
+            if service not in self._clients:
+                self._clients[service] = self.session.client(service, region_name=self.region_name, config=self._config)
+            return self._clients[service]
+
+    def paginate(self, service, operation, key, **kwargs):
+        items = []
+        for page in self.client(service).get_paginator(operation).paginate(**kwargs):
+            items.extend(page.get(key, []))
+        return items
+
+    def map(self, func, items):
+        return list(self._item_pool.map(func, items))
+
+    def get(self, name):
+        return self.data.get(name)
+
+    def _api_calls(self):
+        return sum(entry['calls'] for entry in tracer.operation_stats().values())
+
+    @tracer.step('evaluate_controls')
+    def run(self, control_ids=None):
+        controls = [CONTROLS[control_id] for control_id in (control_ids or CONTROLS)]
+        self.data = DataCache(self)
+        if self.inventory is not None:
+            # sqlite3 connections belong to the thread that opened them, so snapshot data
+            # is read here before the controls start
+            for name in INVENTORY_SOURCES:
+                region = None if name == 'buckets' else self.region_name
+                self.data.preload(name, self.inventory.resources(name, region=region))
+        calls_before = self._api_calls()
+        start = time.perf_counter()
+
+        def evaluate(definition):
+            with tracer.span(f"control:{definition['id']}"):
+                try:
+                    findings = list(definition['check'](self))
+                    error = None
+                except (ClientError, BotoCoreError) as e:
+                    findings, error = [], str(e)
+            passed = sum(1 for _, status, _ in findings if status == PASS)
+            return {
+                'id': definition['id'],
+                'title': definition['title'],
+                'clause': definition['clause'],
+                'score': round(passed / len(findings) * 100, 1) if findings else None,
+                'passed': passed,
+                'failed': len(findings) - passed,
+                'error': error,
+                'findings': [{'resource': resource, 'status': status, 'detail': detail} for resource, status, detail in findings],
+            }
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(evaluate, controls))
+        scored = [result['score'] for result in results if result['score'] is not None]
+        return {
+            'region': self.region_name,
+            'score': round(sum(scored) / len(scored), 1) if scored else None,
+            'elapsed_s': round(time.perf_counter() - start, 2),
+            'api_calls': self._api_calls() - calls_before,
+            'source': 'inventory' if self.inventory is not None else 'live',
+            'controls': results,
+        }
+
+    def close(self):
+        self._item_pool.shutdown()
+
+
+# ---- data sources -----------------------------------------------------
+
+@fetcher('vpcs')
+def fetch_vpcs(engine):
+    return engine.paginate('ec2', 'describe_vpcs', 'Vpcs')
+
+
+@fetcher('security_groups')
+def fetch_security_groups(engine):
+    return engine.paginate('ec2', 'describe_security_groups', 'SecurityGroups')
+
+
+@fetcher('security_group_rules')
+def fetch_security_group_rules(engine):
+    return engine.paginate('ec2', 'describe_security_group_rules', 'SecurityGroupRules', PaginationConfig={'PageSize': 1000})
+
+
+@fetcher('rule_index')
+def fetch_rule_index(engine):
+    return RuleIndex(engine.get('security_group_rules'))
+
+
+@fetcher('flow_logs')
+def fetch_flow_logs(engine):
+    return engine.paginate('ec2', 'describe_flow_logs', 'FlowLogs')
+
+
+@fetcher('buckets')
+def fetch_buckets(engine):
+    return engine.client('s3').list_buckets()['Buckets']
+
+
+@fetcher('bucket_encryption')
+def fetch_bucket_encryption(engine):
+    s3 = engine.client('s3')
+
+    def encryption(bucket):
+        try:
+            rules = s3.get_bucket_encryption(Bucket=bucket['Name'])['ServerSideEncryptionConfiguration']['Rules']
+            return bucket['Name'], rules[0]['ApplyServerSideEncryptionByDefault']
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ServerSideEncryptionConfigurationNotFoundError':
+                raise
+            return bucket['Name'], None
+    return dict(engine.map(encryption, engine.get('buckets')))
+
+
+@fetcher('bucket_public_access')
+def fetch_bucket_public_access(engine):
+    s3 = engine.client('s3')
+
+    def public_access(bucket):
+        try:
+            return bucket['Name'], s3.get_public_access_block(Bucket=bucket['Name'])['PublicAccessBlockConfiguration']
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'NoSuchPublicAccessBlockConfiguration':
+                raise
+            return bucket['Name'], {}
+    return dict(engine.map(public_access, engine.get('buckets')))
+
+
+@fetcher('kms_keys')
+def fetch_kms_keys(engine):
+    return engine.paginate('kms', 'list_keys', 'Keys')
+
+
+@fetcher('customer_keys')
+def fetch_customer_keys(engine):
+    kms = engine.client('kms')
+
+    def rotation(key):
+        metadata = kms.describe_key(KeyId=key['KeyId'])['KeyMetadata']
+        # AWS managed keys rotate on their own; asymmetric and pending-deletion keys cannot
+        if metadata['KeyManager'] != 'CUSTOMER' or metadata['KeyState'] != 'Enabled' or metadata.get('KeySpec', 'SYMMETRIC_DEFAULT') != 'SYMMETRIC_DEFAULT':
+            return None
+        enabled = kms.get_key_rotation_status(KeyId=key['KeyId'])['KeyRotationEnabled']
+        return metadata['Arn'], enabled
+    return dict(result for result in engine.map(rotation, engine.get('kms_keys')) if result)
+
+
+@fetcher('trails')
+def fetch_trails(engine):
+    cloudtrail = engine.client('cloudtrail')
+    trails = cloudtrail.describe_trails()['trailList']
+    return engine.map(lambda trail: dict(trail, IsLogging=cloudtrail.get_trail_status(Name=trail['TrailARN'])['IsLogging']), trails)
+
+
+@fetcher('guardduty_detectors')
+def fetch_guardduty_detectors(engine):
+    guardduty = engine.client('guardduty')
+    detector_ids = engine.paginate('guardduty', 'list_detectors', 'DetectorIds')
+    return {detector_id: guardduty.get_detector(DetectorId=detector_id)['Status'] for detector_id in detector_ids}
+
+
+@fetcher('account_summary')
+def fetch_account_summary(engine):
+    return engine.client('iam').get_account_summary()['SummaryMap']
+
+
+@fetcher('policy_simulator')
+def fetch_policy_simulator(engine):
+    return PolicySimulator.from_account(engine.client('iam'))
+
+
+# ---- controls ---------------------------------------------------------
+
+@control('A.9.2.3', 'Management of privileged access rights', 'No principal can escalate privileges without conditions')
+def check_privileged_access(engine):
+    # Attaching any policy to any role is equivalent to administrator access
+    simulator = engine.get('policy_simulator')
+    escalation = simulator.who_can('iam:AttachRolePolicy', '*')
+    for principal in sorted(simulator.principals):
+        allowed = escalation.get(principal)
+        if allowed and not allowed['conditional']:
+            yield principal, FAIL, 'can attach policies to any role via ' + ', '.join(allowed['statements'])
+        else:
+            yield principal, PASS, 'no unconditional privilege escalation'
+
+
+@control('A.9.4.2', 'Secure log-on procedures', 'Root account MFA is enabled')
+def check_root_mfa(engine):
+    summary = engine.get('account_summary')
+    yield 'root', PASS if summary.get('AccountMFAEnabled') else FAIL, f"AccountMFAEnabled={summary.get('AccountMFAEnabled')}"
+    yield 'root-access-keys', FAIL if summary.get('AccountAccessKeysPresent') else PASS, f"AccountAccessKeysPresent={summary.get('AccountAccessKeysPresent')}"
+
+
+@control('A.9.4.1', 'Information access restriction', 'S3 Block Public Access is fully enabled on every bucket')
+def check_bucket_public_access(engine):
+    for bucket, configuration in engine.get('bucket_public_access').items():
+        missing = [flag for flag in ('BlockPublicAcls', 'IgnorePublicAcls', 'BlockPublicPolicy', 'RestrictPublicBuckets') if not configuration.get(flag)]
+        yield bucket, FAIL if missing else PASS, 'missing ' + ', '.join(missing) if missing else 'all four settings enabled'
+
+
+@control('A.10.1.1', 'Policy on the use of cryptographic controls', 'S3 buckets encrypt by default with KMS')
+def check_bucket_encryption(engine):
+    # Same check as KMSS3Manager.verify_bucket_encryption, for every bucket at once
+    for bucket, default in engine.get('bucket_encryption').items():
+        algorithm = default['SSEAlgorithm'] if default else None
+        yield bucket, PASS if algorithm in ('aws:kms', 'aws:kms:dsse') else FAIL, f"default encryption: {algorithm or 'none'}"
+
+
+@control('A.10.1.2', 'Key management', 'Customer managed KMS keys have automatic rotation enabled')
+def check_key_rotation(engine):
+    for key_arn, enabled in engine.get('customer_keys').items():
+        yield key_arn, PASS if enabled else FAIL, 'rotation enabled' if enabled else 'rotation disabled'
+
+
+@control('A.12.4.1', 'Event logging', 'A multi-region CloudTrail trail is logging')
+def check_cloudtrail(engine):
+    trails = engine.get('trails')
+    for trail in trails:
+        ok = trail['IsLogging'] and trail.get('IsMultiRegionTrail')
+        yield trail['TrailARN'], PASS if ok else FAIL, f"logging={trail['IsLogging']} multi_region={trail.get('IsMultiRegionTrail')}"
+    if not trails:
+        yield 'cloudtrail', FAIL, 'no trails configured'
+
+
+@control('CLD.12.4.5', 'Monitoring of cloud services', 'GuardDuty is enabled in the region')
+def check_guardduty(engine):
+    detectors = engine.get('guardduty_detectors')
+    enabled = [detector_id for detector_id, status in detectors.items() if status == 'ENABLED']
+    yield f"guardduty:{engine.region_name}", PASS if enabled else FAIL, f"{len(enabled)} enabled detectors"
+
+
+@control('A.13.1.1', 'Network controls', 'Sensitive ports are not open to the Internet')
+def check_exposed_ports(engine):
+    index = engine.get('rule_index')
+    exposed = {}
+    for port, service in SENSITIVE_PORTS.items():
+        for rule in index.exposed(port):
+            exposed.setdefault(rule['GroupId'], []).append(f"{service} ({describe(rule)})")
+    for group in engine.get('security_groups'):
+        findings = exposed.get(group['GroupId'])
+        yield group['GroupId'], FAIL if findings else PASS, '; '.join(findings) if findings else 'no sensitive ports exposed'
+
+
+@control('A.13.1.2', 'Security of network services', 'Security group rules are not redundant')
+def check_redundant_rules(engine):
+    redundant = {}
+    for rule, covering in engine.get('rule_index').redundant():
+        redundant.setdefault(rule['GroupId'], []).append(f"{rule.get('SecurityGroupRuleId')} covered by {covering.get('SecurityGroupRuleId')}")
+    for group in engine.get('security_groups'):
+        findings = redundant.get(group['GroupId'])
+        yield group['GroupId'], FAIL if findings else PASS, '; '.join(findings) if findings else 'no redundant rules'
+
+
+@control('CLD.9.5.1', 'Segregation in virtual computing environments', 'Default security groups allow no traffic')
+def check_default_security_groups(engine):
+    for group in engine.get('security_groups'):
+        if group['GroupName'] != 'default':
+            continue
+        rules = len(group.get('IpPermissions', [])) + len(group.get('IpPermissionsEgress', []))
+        yield group['GroupId'], FAIL if rules else PASS, f"{rules} rules in the default group of {group.get('VpcId')}"
+
+
+@control('CLD.9.5.2', 'Virtual machine hardening', 'VPC flow logs are enabled on every VPC')
+def check_flow_logs(engine):
+    logged = {flow_log['ResourceId'] for flow_log in engine.get('flow_logs') if flow_log.get('FlowLogStatus') == 'ACTIVE'}
+    for vpc in engine.get('vpcs'):
+        yield vpc['VpcId'], PASS if vpc['VpcId'] in logged else FAIL, 'flow logs active' if vpc['VpcId'] in logged else 'no active flow logs'
+
+
+def print_report(report):
+    tracer.event(f"\n📋 ISO 27017 evaluation ({report['region']}, {report['source']} data)")
+    for result in sorted(report['controls'], key=lambda r: [int(part) if part.isdigit() else part for part in r['id'].split('.')]):
+        if result['error']:
+            tracer.event(f"  ⚠️ {result['id']:<11} {result['title']}: {result['error']}", level='error')
+            continue
+        score = 'n/a' if result['score'] is None else f"{result['score']:.0f}%"
+        icon = '✅' if not result['failed'] else '❌'
+        tracer.event(f"  {icon} {result['id']:<11} {score:>5}  {result['title']} ({result['passed']}/{result['passed'] + result['failed']})",
+                     level='error' if result['failed'] else 'info')
+        for finding in result['findings']:
+            if finding['status'] == FAIL:
+                tracer.event(f"        ↳ {finding['resource']}: {finding['detail']}")
+    score = 'n/a' if report['score'] is None else f"{report['score']:.1f}%"
+    tracer.event(f"\n🏁 Overall score {score} in {report['elapsed_s']} s with {report['api_calls']} AWS API calls")
+
+
+def main():
+    # python iso27017_controls.py [--inventory inventory.sqlite] [--json report.json] [control ids...]
+    args = sys.argv[1:]
+    inventory = json_path = None
+    if '--inventory' in args:
+        from inventory import Inventory
+        position = args.index('--inventory')
+        inventory = Inventory(args[position + 1])
+        del args[position:position + 2]
+    if '--json' in args:
+        position = args.index('--json')
+        json_path = args[position + 1]
+        del args[position:position + 2]
+    engine = ControlEngine(inventory=inventory)
+    try:
+        report = engine.run(args or None)
+    finally:
+        engine.close()
+    print_report(report)
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+
+
+if __name__ == '__main__':
+    main()
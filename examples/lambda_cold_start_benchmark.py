@@ -0,0 +1,140 @@
+import json
+import re
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from instrumentation import tracer
+
+# Build contexts to compare: the stock Dockerfile against the optimized one
+CONTEXTS = ['lambda', '../notebook/Demo-1/webservice/lambda']
+VARIANTS = ['Dockerfile', 'Dockerfile.optimized']
+RUNS = 5
+PORT = 9000
+MEMORY = '256m'
+INVOKE_URL = f'http://localhost:{PORT}/2015-03-31/functions/function/invocations'
+STARTUP_TIMEOUT = 60
+
+# The AWS Lambda base images ship the Runtime Interface Emulator, which prints a
+# REPORT line per invocation (Init Duration only appears on the cold one)
+REPORT_PATTERN = re.compile(r'Init Duration: ([\d.]+) ms')
+
+
+def docker(*args, check=True):
+    return subprocess.run(['docker', *args], capture_output=True, text=True, check=check)
+
+
+def build_image(context_dir, dockerfile):
+    tag = f"cold-start-bench:{context_dir.strip('./').replace('/', '-').lower()}-{dockerfile.lower().replace('.', '-')}"
+    tracer.event(f"🏗️ Building {tag}...")
+    docker('build', '-t', tag, '-f', dockerfile, context_dir)
+    size = int(docker('image', 'inspect', '--format', '{{.Size}}', tag).stdout.strip())
+    return tag, size
+
+
+def invoke(payload=b'{}'):
+    start = time.perf_counter()
+    request = urllib.request.Request(INVOKE_URL, data=payload, method='POST')
+    with urllib.request.urlopen(request, timeout=STARTUP_TIMEOUT) as response:
+        response.read()
+    return (time.perf_counter() - start) * 1000
+
+
+def memory_usage_mb(container_id):
+    usage = docker('stats', '--no-stream', '--format', '{{.MemUsage}}', container_id).stdout.split('/')[0].strip()
+    value, unit = re.match(r'([\d.]+)\s*([KMG]i?B)', usage).groups()
+    return float(value) * {'KiB': 1 / 1024, 'KB': 1 / 1000, 'MiB': 1, 'MB': 1, 'GiB': 1024, 'GB': 1000}[unit]
+
+
+def measure_cold_start(tag):
+    container_id = docker('run', '-d', '--rm', '-p', f'{PORT}:8080', '--memory', MEMORY, tag).stdout.strip()
+    try:
+        # The emulator accepts connections almost immediately; the function init runs on the first invoke
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            try:
+                cold_ms = invoke()
+                break
+            except (urllib.error.URLError, ConnectionError):
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+        warm_ms = invoke()
+        memory_mb = memory_usage_mb(container_id)
+        match = REPORT_PATTERN.search(docker('logs', container_id, check=False).stdout)
+        init_ms = float(match.group(1)) if match else None
+        return {'cold_ms': cold_ms, 'warm_ms': warm_ms, 'init_ms': init_ms, 'memory_mb': memory_mb}
+    finally:
+        docker('stop', container_id, check=False)
+
+
+def import_profile(tag, module='lambda_function', top=10):
+    # python -X importtime inside the image: which imports dominate the init phase
+    result = docker('run', '--rm', '--entrypoint', 'python', tag, '-X', 'importtime', '-c', f'import {module}', check=False)
+    rows = []
+    for line in result.stderr.splitlines():
+        parts = line.replace('import time:', '').split('|')
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def median(values):
+    values = sorted(value for value in values if value is not None)
+    return values[len(values) // 2] if values else None
+
+
+def fmt(value, unit):
+    return f"{value:.1f} {unit}" if value is not None else 'n/a'
+
+
+@tracer.step()
+def benchmark(context_dir, variants=VARIANTS, runs=RUNS):
+    results = {}
+    for dockerfile in variants:
+        tag, size = build_image(context_dir, dockerfile)
+        samples = []
+        for run in range(runs):
+            with tracer.span('cold_start', image=tag, run=run):
+                samples.append(measure_cold_start(tag))
+        results[dockerfile] = {
+            'image': tag,
+            'size_mb': size / 1024 / 1024,
+            'cold_ms': median(s['cold_ms'] for s in samples),
+            'warm_ms': median(s['warm_ms'] for s in samples),
+            'init_ms': median(s['init_ms'] for s in samples),
+            'memory_mb': median(s['memory_mb'] for s in samples),
+            'imports': import_profile(tag),
+        }
+    return results
+
+
+def print_report(context_dir, results):
+    tracer.event(f"\n📊 Cold start report for {context_dir} (median of {RUNS} runs)")
+    tracer.event(f"  {'Variant':<22} {'Image':>10} {'Init':>10} {'1st invoke':>12} {'2nd invoke':>12} {'Memory':>10}")
+    for variant, result in results.items():
+        tracer.event(
+            f"  {variant:<22} {fmt(result['size_mb'], 'MB'):>10} {fmt(result['init_ms'], 'ms'):>10} "
+            f"{fmt(result['cold_ms'], 'ms'):>12} {fmt(result['warm_ms'], 'ms'):>12} {fmt(result['memory_mb'], 'MB'):>10}"
+        )
+    for variant, result in results.items():
+        tracer.event(f"\n🐢 Slowest imports ({variant}, cumulative):")
+        for cumulative_us, module in result['imports']:
+            tracer.event(f"  {cumulative_us / 1000:>8.1f} ms  {module}")
+
+
+def main():
+    # Optional: python lambda_cold_start_benchmark.py [context_dir ...]
+    contexts = sys.argv[1:] or CONTEXTS
+    report = {}
+    for context_dir in contexts:
+        report[context_dir] = benchmark(context_dir)
+        print_report(context_dir, report[context_dir])
+    with open('cold_start_report.json', 'w') as file:
+        json.dump(report, file, indent=2)
+    tracer.event("\n💾 Report saved to cold_start_report.json")
+
+
+if __name__ == '__main__':
+    main()
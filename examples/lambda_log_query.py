@@ -0,0 +1,247 @@
+import boto3
+import json
+import os
+import re
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pandas as pd
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from instrumentation import tracer
+
+# Claves escritas por la Lambda de Demo-1: log_YYYYMMDD_HHMMSS_<request_id>.json
+KEY_PATTERN = re.compile(r'^log_(\d{8}_\d{6})_(.+)\.json$')
+KEY_TIME_FORMAT = '%Y%m%d_%H%M%S'
+MAX_WORKERS = 32
+CHUNK_SIZE = 1000
+CACHE_DIR = os.path.expanduser('~/.cache/iso27017/lambda-logs')
+# Margen tras el fin de un día para que lleguen sus últimos logs (una invocación puede
+# escribir su clave hasta 15 min después); pasado este tiempo el día ya no cambia
+DAY_CLOSE_MARGIN = timedelta(hours=1)
+
+COLUMNS = ['key', 'request_id', 'key_time', 'timestamp', 'url', 'status_code', 'elapsed_ms', 'error']
+# Histograma logarítmico de latencias (0,1 ms a 1 h, ~2 % por intervalo): se suma chunk a
+# chunk y da percentiles aproximados sin guardar cada valor
+LATENCY_BINS = np.geomspace(0.1, 3.6e6, 801)
+STATUS_TOTALS = {'requests': 'sum', 'count': 'sum', 'sum': 'sum', 'sumsq': 'sum', 'min': 'min', 'max': 'max'}
+
+
+def day_prefixes(start, end):
+    # Un prefijo por día del rango: el listado solo recorre las claves de esos días
+    day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    while day < end:
+        yield day, f"log_{day.strftime('%Y%m%d')}_"
+        day += timedelta(days=1)
+
+
+class LambdaLogQuery:
+    def __init__(self, bucket_name, region_name=None, max_workers=MAX_WORKERS, cache_dir=CACHE_DIR):
+        self.bucket_name = bucket_name
+        self.max_workers = max_workers
+        self.s3_client = boto3.client('s3', region_name=region_name, config=Config(
+            max_pool_connections=max_workers,
+            retries={'mode': 'adaptive', 'max_attempts': 10}
+        ))
+        # Los logs nunca se reescriben, así que cada objeto descargado se guarda en una
+        # caché local y no vuelve a pedirse a S3
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_path = os.path.join(cache_dir, f"{bucket_name}.sqlite")
+        self.cache = sqlite3.connect(self.cache_path)
+        self.cache.execute(
+            'CREATE TABLE IF NOT EXISTS logs (key TEXT PRIMARY KEY, request_id TEXT, key_time TEXT, timestamp TEXT, '
+            'url TEXT, status_code INTEGER, elapsed_ms REAL, error TEXT)'
+        )
+        self.cache.execute('CREATE INDEX IF NOT EXISTS idx_key_time ON logs (key_time)')
+        # Prefijos de días cerrados cuyos logs están todos en la caché: no se vuelven a listar
+        self.cache.execute('CREATE TABLE IF NOT EXISTS complete_days (prefix TEXT PRIMARY KEY)')
+
+    def _list_day(self, day, prefix, start, end):
+        # StartAfter salta directamente al inicio del rango dentro del día y el listado
+        # se corta en cuanto las claves (ordenadas) superan el final del rango
+        args = {'Bucket': self.bucket_name, 'Prefix': prefix}
+        if start > day:
+            args['StartAfter'] = f"log_{start.strftime(KEY_TIME_FORMAT)}"
+        end_key = f"log_{end.strftime(KEY_TIME_FORMAT)}"
+        keys = []
+        for page in self.s3_client.get_paginator('list_objects_v2').paginate(**args):
+            for obj in page.get('Contents', []):
+                if obj['Key'] >= end_key:
+                    return keys
+                if KEY_PATTERN.match(obj['Key']):
+                    keys.append(obj['Key'])
+        return keys
+
+    @tracer.step()
+    def list_keys(self, start, end, skip=()):
+        # skip: prefijos que no hace falta listar
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            days = [executor.submit(self._list_day, day, prefix, start, end)
+                    for day, prefix in day_prefixes(start, end) if prefix not in skip]
+            keys = [key for future in days for key in future.result()]
+        tracer.event(f"🔎 {len(keys)} logs entre {start:%Y-%m-%d %H:%M:%S} y {end:%Y-%m-%d %H:%M:%S} ({len(days)} prefijos)")
+        return keys
+
+    def _complete_days(self):
+        return {row[0] for row in self.cache.execute('SELECT prefix FROM complete_days')}
+
+    def _closed_days(self, start, end, listed_at):
+        # Días que el listado recorrió enteros y que ya habían cerrado cuando se listaron
+        closed = set()
+        for day, prefix in day_prefixes(start, end):
+            day_end = day + timedelta(days=1)
+            # Las claves están en UTC: una fecha sin zona horaria se toma como UTC
+            closes_at = (day_end if day_end.tzinfo else day_end.replace(tzinfo=timezone.utc)) + DAY_CLOSE_MARGIN
+            if day >= start and day_end <= end and closes_at <= listed_at:
+                closed.add(prefix)
+        return closed
+
+    def _fetch(self, key):
+        key_time, request_id = KEY_PATTERN.match(key).groups()
+        row = {'key': key, 'request_id': request_id, 'key_time': key_time}
+        try:
+            content = json.loads(self.s3_client.get_object(Bucket=self.bucket_name, Key=key)['Body'].read())
+        except (ClientError, BotoCoreError, ValueError) as e:
+            tracer.event(f"❌ No se pudo leer {key}: {e}", level='error')
+            return None
+        # Solo se conservan los campos que se analizan; el payload 'data' se descarta
+        row.update({column: content.get(column) for column in ('timestamp', 'url', 'status_code', 'elapsed_ms', 'error')})
+        return row
+
+    def _cached_keys(self, start, end):
+        rows = self.cache.execute(
+            'SELECT key FROM logs WHERE key_time >= ? AND key_time < ?',
+            (start.strftime(KEY_TIME_FORMAT), end.strftime(KEY_TIME_FORMAT))
+        )
+        return {row[0] for row in rows}
+
+    def iter_chunks(self, start, end, chunk_size=CHUNK_SIZE):
+        # DataFrames de como mucho chunk_size filas: primero lo que ya está en caché y
+        # después lo nuevo, descargado en paralelo por bloques para acotar la memoria
+        cached = self._cached_keys(start, end)
+        for chunk in pd.read_sql_query(
+            'SELECT * FROM logs WHERE key_time >= ? AND key_time < ? ORDER BY key_time',
+            self.cache, params=(start.strftime(KEY_TIME_FORMAT), end.strftime(KEY_TIME_FORMAT)), chunksize=chunk_size
+        ):
+            yield chunk
+        complete = self._complete_days()
+        listed_at = datetime.now(timezone.utc)
+        missing = [key for key in self.list_keys(start, end, skip=complete) if key not in cached]
+        tracer.event(f"💾 {len(cached)} logs en caché, {len(missing)} por descargar")
+        # Un día cerrado queda completo cuando todos sus logs se han descargado
+        closed = self._closed_days(start, end, listed_at) - complete
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for i in range(0, len(missing), chunk_size):
+                keys = missing[i:i + chunk_size]
+                with tracer.span('fetch_chunk', objects=len(keys)):
+                    rows = list(executor.map(self._fetch, keys))
+                closed -= {key[:len('log_YYYYMMDD_')] for key, row in zip(keys, rows) if row is None}
+                chunk = pd.DataFrame([row for row in rows if row], columns=COLUMNS)
+                chunk.to_sql('logs', self.cache, if_exists='append', index=False)
+                self.cache.commit()
+                yield chunk
+        self.cache.executemany('INSERT OR IGNORE INTO complete_days (prefix) VALUES (?)', [(prefix,) for prefix in closed])
+        self.cache.commit()
+
+    @tracer.step()
+    def query(self, start, end, chunk_size=CHUNK_SIZE):
+        # Cada chunk se agrega en cuanto llega: la memoria depende del número de códigos
+        # de estado y de horas del rango, no del número de logs
+        return aggregate(self.iter_chunks(start, end, chunk_size))
+
+    def close(self):
+        self.cache.close()
+
+
+def _fold(total, part, how='sum'):
+    # Combina un agregado parcial con el acumulado, grupo a grupo
+    if total is None:
+        return part
+    return pd.concat([total, part]).groupby(level=list(range(part.index.nlevels))).agg(how)
+
+
+def _histogram_quantile(histogram, q):
+    # Centro geométrico del intervalo que contiene el cuantil q, por grupo (primer nivel)
+    def quantile(counts):
+        counts = counts.droplevel(0).sort_index()
+        index = counts.index[np.searchsorted(counts.cumsum().to_numpy(), q * counts.sum())]
+        return float(np.sqrt(LATENCY_BINS[index] * LATENCY_BINS[index + 1]))
+    return histogram.groupby(level=0).apply(quantile)
+
+
+def aggregate(chunks):
+    # Códigos de estado, percentiles de latencia y volumen/errores por hora. De cada chunk
+    # solo se acumulan conteos, sumas, mínimos, máximos e histogramas, nunca sus filas
+    requests = 0
+    status_totals = status_bins = hourly_totals = hourly_bins = None
+    for chunk in chunks:
+        status_code = chunk['status_code'].astype('Int64')
+        elapsed = chunk['elapsed_ms'].astype('float64')
+        status = status_code.fillna(-1).rename('status_code')
+        hour = pd.to_datetime(chunk['key_time'], format=KEY_TIME_FORMAT).dt.floor('h').rename('key_time')
+        requests += len(chunk)
+        status_totals = _fold(status_totals, pd.DataFrame({
+            'requests': 1, 'count': elapsed.notna(), 'sum': elapsed, 'sumsq': elapsed ** 2, 'min': elapsed, 'max': elapsed
+        }).groupby(status).agg(STATUS_TOTALS), STATUS_TOTALS)
+        hourly_totals = _fold(hourly_totals, pd.DataFrame({
+            'requests': 1, 'errors': (status_code >= 400).fillna(True).astype(int)
+        }).groupby(hour).sum())
+        timed = elapsed.notna()
+        bins = pd.Series(np.searchsorted(LATENCY_BINS, elapsed[timed].to_numpy(), side='right') - 1, index=elapsed.index[timed])
+        bins = bins.clip(0, len(LATENCY_BINS) - 2).rename('bin')
+        status_bins = _fold(status_bins, bins.groupby([status[timed], bins]).size())
+        hourly_bins = _fold(hourly_bins, bins.groupby([hour[timed], bins]).size())
+    if not requests:
+        return {'requests': 0}
+
+    status = status_totals[['requests']].sort_values('requests', ascending=False)
+    status['share'] = (status['requests'] / requests * 100).round(1)
+    count = status_totals['count'].astype('float64')
+    mean = status_totals['sum'] / count
+    variance = (status_totals['sumsq'] - status_totals['sum'] * mean) / (count - 1)
+    latency = pd.DataFrame({
+        'count': count, 'mean': mean, 'std': np.sqrt(variance.clip(lower=0)).where(count > 1), 'min': status_totals['min'],
+        **{f"{q:.0%}": _histogram_quantile(status_bins, q).clip(status_totals['min'], status_totals['max']) for q in (0.5, 0.9, 0.99)},
+        'max': status_totals['max'],
+    })
+    hourly = hourly_totals.reindex(pd.date_range(hourly_totals.index.min(), hourly_totals.index.max(), freq='h', name='key_time'))
+    hourly = hourly.fillna(0).astype(int)
+    hourly['p90_ms'] = _histogram_quantile(hourly_bins, 0.9) if len(hourly_bins) else np.nan
+    return {'requests': requests, 'status': status, 'latency': latency, 'hourly': hourly}
+
+
+def parse_time(value):
+    # Acepta una fecha ISO o una duración relativa a ahora como 24h o 7d. Las claves
+    # están en UTC: una fecha sin zona horaria se toma como UTC y las demás se convierten
+    match = re.fullmatch(r'(\d+)([hd])', value)
+    if match:
+        amount = int(match.group(1))
+        return datetime.now(timezone.utc) - (timedelta(hours=amount) if match.group(2) == 'h' else timedelta(days=amount))
+    moment = datetime.fromisoformat(value)
+    return moment.replace(tzinfo=timezone.utc) if moment.tzinfo is None else moment.astimezone(timezone.utc)
+
+
+def main():
+    # python lambda_log_query.py <bucket> [inicio=24h] [fin=ahora]
+    if len(sys.argv) < 2:
+        tracer.event("Uso: python lambda_log_query.py <bucket> [inicio] [fin]", level='error')
+        sys.exit(1)
+    start = parse_time(sys.argv[2]) if len(sys.argv) > 2 else parse_time('24h')
+    end = parse_time(sys.argv[3]) if len(sys.argv) > 3 else datetime.now(timezone.utc)
+    logs = LambdaLogQuery(sys.argv[1])
+    try:
+        result = logs.query(start, end)
+    finally:
+        logs.close()
+    if not result['requests']:
+        tracer.event("📭 No hay logs en el rango indicado.")
+        return
+    tracer.event(f"\n📊 Códigos de estado ({result['requests']} solicitudes):\n{result['status'].to_string()}")
+    tracer.event(f"\n⏱️ Latencia por código de estado (ms):\n{result['latency'].round(1).to_string()}")
+    tracer.event(f"\n🕒 Solicitudes por hora:\n{result['hourly'].to_string()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+import boto3
+import botocore.session
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from botocore.credentials import CredentialProvider, RefreshableCredentials
+from instrumentation import tracer
+
+# Targets to run the ISO 27017 baseline on: one entry per (account role, region).
+# 'params' overrides the module constants of the example (VPC_ID, SUBNET_ID, ...).
+# A role_arn of None uses the default credentials of the current session.
+TARGETS = [
+    {
+        'role_arn': 'arn:aws:iam::<account_id>:role/<baseline_role>',
+        'region': 'us-east-1',
+        'params': {'VPC_ID': '<your_vpc_id>', 'SUBNET_ID': '<your_subnet_id>'}
+    },
+    {
+        'role_arn': 'arn:aws:iam::<account_id>:role/<baseline_role>',
+        'region': 'eu-west-1',
+        'params': {'VPC_ID': '<your_vpc_id>', 'SUBNET_ID': '<your_subnet_id>'}
+    },
+]
+
+EXAMPLE_SCRIPT = '1-ssm_instance.py'
+MAX_WORKERS = 8
+LOG_DIR = 'logs'
+ROLE_SESSION_NAME = 'iso27017-baseline'
+
+# Public SSM parameter with the latest Ubuntu AMI, resolved per region
+AMI_PARAMETER = '/aws/service/canonical/ubuntu/server/24.04/stable/current/amd64/hvm/ebs-gp3/ami-id'
+AMI_CACHE_FILE = os.path.join(LOG_DIR, 'ami_cache.json')
+AMI_CACHE_TTL = 24 * 3600
+
+def load_example(script_name, module_name=None):
+    # Example scripts have hyphens in their names, so load them by path.
+    # Every call returns a fresh module so concurrent targets never share globals.
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), script_name)
+    module_name = module_name or os.path.splitext(script_name)[0].replace('-', '_')
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class AssumedRoleProvider(CredentialProvider):
+    # Hands the shared refreshable credentials to a botocore session through its
+    # public provider chain
+    METHOD = 'assume-role-cache'
+
+    def __init__(self, credentials):
+        self.credentials = credentials
+
+    def load(self):
+        return self.credentials
+
+
+class CredentialCache:
+    # Assumed-role credentials shared by every target that uses the same role.
+    # botocore refreshes them transparently shortly before they expire.
+    def __init__(self, base_session=None, session_name=ROLE_SESSION_NAME):
+        self.base_session = base_session or boto3.Session()
+        self.session_name = session_name
+        self._credentials = {}
+        self._lock = threading.Lock()
+        self._sts = None
+
+    def _sts_client(self):
+        if self._sts is None:
+            self._sts = self.base_session.client('sts')
+        return self._sts
+
+    def _assume_role(self, role_arn):
+        print(f"Assuming role {role_arn}... 🔑")
+        response = self._sts_client().assume_role(RoleArn=role_arn, RoleSessionName=self.session_name)
+        credentials = response['Credentials']
+        return {
+            'access_key': credentials['AccessKeyId'],
+            'secret_key': credentials['SecretAccessKey'],
+            'token': credentials['SessionToken'],
+            'expiry_time': credentials['Expiration'].isoformat(),
+        }
+
+    def get(self, role_arn):
+        with self._lock:
+            if role_arn not in self._credentials:
+                # botocore refreshes them 15 minutes before they expire
+                self._credentials[role_arn] = RefreshableCredentials.create_from_metadata(
+                    metadata=self._assume_role(role_arn),
+                    refresh_using=lambda: self._assume_role(role_arn),
+                    method='sts-assume-role'
+                )
+            return self._credentials[role_arn]
+
+    def session_for(self, role_arn, region):
+        if role_arn is None:
+            return boto3.Session(region_name=region)
+        core_session = botocore.session.get_session()
+        core_session.get_component('credential_provider').insert_before('env', AssumedRoleProvider(self.get(role_arn)))
+        return boto3.Session(botocore_session=core_session, region_name=region)
+
+
+class AmiResolver:
+    # Region -> AMI lookup backed by memory and a small JSON file so repeated runs
+    # do not hit SSM again until the TTL expires.
+    def __init__(self, parameter=AMI_PARAMETER, cache_file=AMI_CACHE_FILE, ttl=AMI_CACHE_TTL):
+        self.parameter = parameter
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._cache = self._load()
+
+    def _load(self):
+        try:
+            with open(self.cache_file, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.cache_file) or '.', exist_ok=True)
+        with open(self.cache_file, 'w') as file:
+            json.dump(self._cache, file, indent=2)
+
+    def resolve(self, session, region):
+        key = f"{region}:{self.parameter}"
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry and time.time() - entry['fetched_at'] < self.ttl:
+                return entry['ami_id']
+        ami_id = session.client('ssm', region_name=region).get_parameter(Name=self.parameter)['Parameter']['Value']
+        with self._lock:
+            self._cache[key] = {'ami_id': ami_id, 'fetched_at': time.time()}
+            self._save()
+        return ami_id
+
+
+class ThreadLogRouter:
+    # Replaces sys.stdout so that print() calls made by a worker thread land in that
+    # target's log file, while the main thread keeps writing to the console.
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+
+    def attach(self, file):
+        self._local.file = file
+
+    def detach(self):
+        self._local.file = None
+
+    def write(self, data):
+        file = getattr(self._local, 'file', None)
+        return (file or self.stream).write(data)
+
+    def flush(self):
+        file = getattr(self._local, 'file', None)
+        (file or self.stream).flush()
+
+
+def target_label(target):
+    # Roles of the same account get their own label, and so their own log file
+    role_arn = target.get('role_arn')
+    if not role_arn:
+        return f"default-{target['region']}"
+    return f"{role_arn.split(':')[4]}-{role_arn.split('/')[-1]}-{target['region']}"
+
+
+def run_target(target, script_name, credentials, amis, router, log_dir):
+    label = target_label(target)
+    log_path = os.path.join(log_dir, f"{label}.log")
+    result = {'target': label, 'region': target['region'], 'log': log_path}
+    start = time.monotonic()
+    with open(log_path, 'w') as log_file:
+        router.attach(log_file)
+        try:
+            session = tracer.instrument(credentials.session_for(target.get('role_arn'), target['region']))
+            example = load_example(script_name, module_name=f"{script_name}:{label}")
+            if hasattr(example, 'AMI_ID'):
+                example.AMI_ID = amis.resolve(session, target['region'])
+                print(f"Using AMI {example.AMI_ID} in {target['region']} 🖼️")
+            for name, value in target.get('params', {}).items():
+                setattr(example, name, value)
+            with tracer.span(f"{script_name}.main", target=label, region=target['region']):
+                result['status'] = 'ok' if example.main(session=session) is not False else 'failed'
+        except Exception as e:
+            traceback.print_exc(file=log_file)
+            result['status'] = 'error'
+            result['error'] = str(e)
+        finally:
+            router.detach()
+    result['duration'] = round(time.monotonic() - start, 2)
+    return result
+
+
+def run_matrix(targets, script_name=EXAMPLE_SCRIPT, max_workers=MAX_WORKERS, log_dir=LOG_DIR):
+    os.makedirs(log_dir, exist_ok=True)
+    credentials = CredentialCache()
+    amis = AmiResolver(cache_file=os.path.join(log_dir, 'ami_cache.json'))
+    router = ThreadLogRouter(sys.stdout)
+    results = []
+
+    print(f"Running {script_name} on {len(targets)} targets with {max_workers} workers... 🌍")
+    sys.stdout = router
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(run_target, target, script_name, credentials, amis, router, log_dir) for target in targets]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                icon = '✅' if result['status'] == 'ok' else '❌'
+                print(f"{icon} {result['target']}: {result['status']} in {result['duration']}s")
+    finally:
+        sys.stdout = router.stream
+
+    print_summary(results)
+    return results
+
+
+def print_summary(results):
+    print("\n📊 Summary:")
+    print(f"  {'Target':<48} {'Status':<8} {'Seconds':>8}  Log")
+    for result in sorted(results, key=lambda r: r['target']):
+        print(f"  {result['target']:<48} {result['status']:<8} {result['duration']:>8}  {result['log']}")
+        if 'error' in result:
+            print(f"    ⚠️ {result['error']}")
+    ok = sum(1 for result in results if result['status'] == 'ok')
+    print(f"\n{ok}/{len(results)} targets completed successfully.")
+
+
+def main():
+    # Optional: python multi_region_runner.py <targets.json> [example_script]
+    targets = TARGETS
+    script_name = EXAMPLE_SCRIPT
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'r') as file:
+            targets = json.load(file)
+    if len(sys.argv) > 2:
+        script_name = sys.argv[2]
+    results = run_matrix(targets, script_name)
+    return all(result['status'] == 'ok' for result in results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,267 @@
+import boto3
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from instrumentation import tracer
+
+# copy_object acepta como máximo 5 GB; por encima se usa upload_part_copy
+MAX_SINGLE_COPY = 5 * 1024 ** 3
+PART_SIZE = 512 * 1024 ** 2
+MAX_WORKERS = 32
+PART_WORKERS = 8
+
+
+class S3ReencryptionJob:
+    # Reescribe cada objeto del bucket sobre sí mismo con la nueva clave KMS.
+    # Las copias son del lado del servidor: ningún byte pasa por el cliente.
+    # Se conservan metadatos, etiquetas, clase de almacenamiento, ACL y bloqueo de objetos
+    # (retención y retención legal). Solo se re-cifra la versión actual: en buckets con
+    # versionado, las versiones anteriores siguen cifradas con la clave antigua (y la copia
+    # añade una versión nueva); hay que expirarlas aparte, p. ej. con una regla de ciclo de
+    # vida NoncurrentVersionExpiration, salvo que el bloqueo de objetos lo impida.
+    def __init__(self, bucket_name, key_id, region_name='us-east-1', prefix='', max_workers=MAX_WORKERS,
+                 checkpoint_path=None, part_size=PART_SIZE):
+        self.bucket_name = bucket_name
+        self.key_id = key_id
+        self.prefix = prefix
+        self.max_workers = max_workers
+        self.part_size = part_size
+        self.checkpoint_path = checkpoint_path or f"reencrypt-{bucket_name}.checkpoint.json"
+        # Un pool de conexiones del tamaño del pool de hilos y reintentos adaptativos ante throttling
+        self.s3_client = boto3.client('s3', region_name=region_name, config=Config(
+            max_pool_connections=max_workers + PART_WORKERS,
+            retries={'mode': 'adaptive', 'max_attempts': 10}
+        ))
+        self._lock = threading.Lock()
+        self._copy_acls = self._acls_enabled()
+        self.state = self._load_checkpoint()
+
+    def _acls_enabled(self):
+        # Con BucketOwnerEnforced las ACL están desactivadas y no hay nada que copiar
+        try:
+            rules = self.s3_client.get_bucket_ownership_controls(Bucket=self.bucket_name)['OwnershipControls']['Rules']
+            return rules[0]['ObjectOwnership'] != 'BucketOwnerEnforced'
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'OwnershipControlsNotFoundError':
+                return True
+            # Sin saber si hay ACL, re-cifrar podría perderlas: mejor no empezar
+            tracer.event(f"❌ No se pudo comprobar la propiedad de objetos de {self.bucket_name}: {e}", level='error')
+            raise
+
+    def _load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, 'r') as file:
+                state = json.load(file)
+            # Un checkpoint de un trabajo terminado no se reanuda: la siguiente ejecución empieza de nuevo
+            if (state['bucket'] == self.bucket_name and state['key_id'] == self.key_id and state['prefix'] == self.prefix
+                    and not state['done']):
+                tracer.event(f"♻️ Reanudando desde el checkpoint: {state['processed']} objetos ya procesados")
+                return state
+        except (OSError, ValueError, KeyError):
+            pass
+        return {
+            'bucket': self.bucket_name,
+            'key_id': self.key_id,
+            'prefix': self.prefix,
+            'start_after': '',
+            'done': False,
+            'processed': 0,
+            'reencrypted': 0,
+            'skipped': 0,
+            'bytes': 0,
+            'failed': [],
+            'elapsed': 0.0,
+        }
+
+    def _save_checkpoint(self):
+        # Escritura atómica: un corte a mitad de escritura nunca deja un checkpoint corrupto
+        directory = os.path.dirname(os.path.abspath(self.checkpoint_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, 'w') as file:
+            json.dump(self.state, file, indent=2)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _already_encrypted(self, head):
+        current_key = head.get('SSEKMSKeyId', '')
+        return head.get('ServerSideEncryption') == 'aws:kms' and (current_key == self.key_id or current_key.endswith(f"/{self.key_id}"))
+
+    def _copy_args(self, head):
+        # Conserva la clase de almacenamiento y el bloqueo de objetos; metadatos y etiquetas se copian por defecto
+        args = {'ServerSideEncryption': 'aws:kms', 'SSEKMSKeyId': self.key_id}
+        for field in ('StorageClass', 'ObjectLockMode', 'ObjectLockRetainUntilDate', 'ObjectLockLegalHoldStatus'):
+            if head.get(field):
+                args[field] = head[field]
+        if head.get('BucketKeyEnabled'):
+            args['BucketKeyEnabled'] = True
+        return args
+
+    def _single_copy(self, key, head):
+        self.s3_client.copy_object(
+            Bucket=self.bucket_name,
+            Key=key,
+            CopySource={'Bucket': self.bucket_name, 'Key': key},
+            CopySourceIfMatch=head['ETag'],
+            **self._copy_args(head)
+        )
+
+    def _multipart_copy(self, key, head):
+        size = head['ContentLength']
+        args = self._copy_args(head)
+        for field in ('ContentType', 'ContentEncoding', 'ContentDisposition', 'ContentLanguage', 'CacheControl', 'Metadata'):
+            if head.get(field):
+                args[field] = head[field]
+        tags = self.s3_client.get_object_tagging(Bucket=self.bucket_name, Key=key)['TagSet']
+        if tags:
+            args['Tagging'] = urlencode([(tag['Key'], tag['Value']) for tag in tags])
+        upload_id = self.s3_client.create_multipart_upload(Bucket=self.bucket_name, Key=key, **args)['UploadId']
+
+        def copy_part(number):
+            start = (number - 1) * self.part_size
+            end = min(start + self.part_size, size) - 1
+            response = self.s3_client.upload_part_copy(
+                Bucket=self.bucket_name,
+                Key=key,
+                UploadId=upload_id,
+                PartNumber=number,
+                CopySource={'Bucket': self.bucket_name, 'Key': key},
+                CopySourceRange=f"bytes={start}-{end}",
+                CopySourceIfMatch=head['ETag']
+            )
+            return {'PartNumber': number, 'ETag': response['CopyPartResult']['ETag']}
+
+        try:
+            part_count = (size + self.part_size - 1) // self.part_size
+            with ThreadPoolExecutor(max_workers=PART_WORKERS) as executor:
+                parts = list(executor.map(copy_part, range(1, part_count + 1)))
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket_name, Key=key, UploadId=upload_id, MultipartUpload={'Parts': parts}
+            )
+        except BaseException:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket_name, Key=key, UploadId=upload_id)
+            raise
+
+    def _process(self, key):
+        try:
+            head = self.s3_client.head_object(Bucket=self.bucket_name, Key=key)
+            if self._already_encrypted(head):
+                result = ('skipped', 0)
+            else:
+                # La copia vuelve a la ACL por defecto (privada); la original se restaura después
+                acl = self.s3_client.get_object_acl(Bucket=self.bucket_name, Key=key) if self._copy_acls else None
+                if head['ContentLength'] > MAX_SINGLE_COPY:
+                    self._multipart_copy(key, head)
+                else:
+                    self._single_copy(key, head)
+                if acl:
+                    self.s3_client.put_object_acl(
+                        Bucket=self.bucket_name, Key=key,
+                        AccessControlPolicy={'Grants': acl['Grants'], 'Owner': acl['Owner']}
+                    )
+                result = ('reencrypted', head['ContentLength'])
+        except (ClientError, BotoCoreError) as e:
+            # Errores de red o de timeout (BotoCoreError) cuentan como fallos del objeto, no abortan la página
+            code = e.response['Error']['Code'] if isinstance(e, ClientError) else type(e).__name__
+            with self._lock:
+                self.state['failed'].append({'key': key, 'error': code, 'message': str(e)})
+                self.state['processed'] += 1
+            return
+        with self._lock:
+            self.state[result[0]] += 1
+            self.state['bytes'] += result[1]
+            self.state['processed'] += 1
+
+    def _pages(self):
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        params = {'Bucket': self.bucket_name, 'Prefix': self.prefix, 'PaginationConfig': {'PageSize': 1000}}
+        if self.state['start_after']:
+            params['StartAfter'] = self.state['start_after']
+        for page in paginator.paginate(**params):
+            keys = [obj['Key'] for obj in page.get('Contents', [])]
+            if keys:
+                yield keys
+
+    @tracer.step()
+    def run(self):
+        if self.state['done']:
+            tracer.event("✅ El checkpoint indica que el trabajo ya terminó.")
+            return self.report()
+        tracer.event(f"🔁 Re-cifrando objetos de {self.bucket_name} con la clave {self.key_id}...")
+        start = time.monotonic() - self.state['elapsed']
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                for keys in self._pages():
+                    # Cada página (hasta 1000 objetos) se procesa en paralelo; al terminarla se guarda el checkpoint
+                    list(executor.map(self._process, keys))
+                    with self._lock:
+                        self.state['start_after'] = keys[-1]
+                        self.state['elapsed'] = time.monotonic() - start
+                        self._save_checkpoint()
+                    self._progress()
+        except (ClientError, BotoCoreError):
+            # Un error del listado ocurre entre páginas: el checkpoint guardado permite reanudar
+            with self._lock:
+                self.state['elapsed'] = time.monotonic() - start
+                self._save_checkpoint()
+            raise
+        self.state['done'] = True
+        self.state['elapsed'] = time.monotonic() - start
+        self._save_checkpoint()
+        return self.report()
+
+    @tracer.step()
+    def retry_failed(self):
+        # Los objetos fallidos quedan fuera del checkpoint de listado; se reintentan aparte
+        failed, self.state['failed'] = self.state['failed'], []
+        with self._lock:
+            self.state['processed'] -= len(failed)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(self._process, [failure['key'] for failure in failed]))
+        self._save_checkpoint()
+        return self.report()
+
+    def _progress(self):
+        elapsed = max(self.state['elapsed'], 1e-6)
+        tracer.event(
+            f"  📦 {self.state['processed']} objetos ({self.state['processed'] / elapsed:.1f}/s, "
+            f"{self.state['bytes'] / elapsed / 1024 ** 2:.1f} MB/s), {len(self.state['failed'])} errores"
+        )
+
+    def report(self):
+        elapsed = max(self.state['elapsed'], 1e-6)
+        report = {
+            'bucket': self.bucket_name,
+            'key_id': self.key_id,
+            'processed': self.state['processed'],
+            'reencrypted': self.state['reencrypted'],
+            'skipped': self.state['skipped'],
+            'failed': len(self.state['failed']),
+            'bytes': self.state['bytes'],
+            'elapsed_seconds': round(elapsed, 2),
+            'objects_per_second': round(self.state['processed'] / elapsed, 2),
+            'mb_per_second': round(self.state['bytes'] / elapsed / 1024 ** 2, 2),
+            'errors_by_code': {},
+        }
+        for failure in self.state['failed']:
+            report['errors_by_code'][failure['error']] = report['errors_by_code'].get(failure['error'], 0) + 1
+        tracer.event(f"\n📊 Re-cifrado de {self.bucket_name}:")
+        tracer.event(f"  ✅ Re-cifrados: {report['reencrypted']}  ⏭️ Ya cifrados: {report['skipped']}  ❌ Errores: {report['failed']}")
+        tracer.event(f"  ⏱️ {report['elapsed_seconds']} s, {report['objects_per_second']} objetos/s, {report['mb_per_second']} MB/s")
+        for code, count in report['errors_by_code'].items():
+            tracer.event(f"  ⚠️ {code}: {count}", level='error')
+        return report
+
+
+if __name__ == '__main__':
+    # python s3_reencrypt.py <bucket> <kms_key_id> [prefix]
+    job = S3ReencryptionJob(sys.argv[1], sys.argv[2], prefix=sys.argv[3] if len(sys.argv) > 3 else '')
+    result = job.run()
+    with open(f"reencrypt-{job.bucket_name}.report.json", 'w') as file:
+        json.dump({**result, 'failures': job.state['failed']}, file, indent=2)
+    sys.exit(1 if result['failed'] else 0)
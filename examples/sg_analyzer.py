@@ -0,0 +1,198 @@
+import boto3
+import ipaddress
+import sys
+import time
+import numpy as np
+from instrumentation import tracer
+
+# Ports checked by default for exposure to the whole Internet
+SENSITIVE_PORTS = {22: 'SSH', 3389: 'RDP', 3306: 'MySQL', 5432: 'PostgreSQL', 6379: 'Redis', 27017: 'MongoDB', 9200: 'Elasticsearch'}
+
+PROTOCOLS = {'-1': -1, 'all': -1, 'tcp': 6, 'udp': 17, 'icmp': 1, 'icmpv6': 58}
+
+SOURCE_CIDR = 0
+SOURCE_GROUP = 1
+SOURCE_PREFIX_LIST = 2
+
+# Every address is stored as a 128-bit value in two uint64 columns (hi, lo), next to its
+# address family: ranges are only compared within the same family, so ::/0 never covers IPv4
+_MASK64 = (1 << 64) - 1
+
+
+def cidr_range(cidr):
+    network = ipaddress.ip_network(cidr, strict=False)
+    first, last = int(network.network_address), int(network.broadcast_address)
+    return network.version, first >> 64, first & _MASK64, last >> 64, last & _MASK64
+
+
+def _le128(a_hi, a_lo, b_hi, b_lo):
+    # a <= b for 128-bit values split in two uint64 arrays
+    return (a_hi < b_hi) | ((a_hi == b_hi) & (a_lo <= b_lo))
+
+
+def _normalize_ports(protocol, from_port, to_port):
+    if protocol == -1 or from_port is None or from_port == -1:
+        return 0, 65535
+    return from_port, to_port if to_port != -1 else 65535
+
+
+class RuleIndex:
+    # Every rule of every security group as parallel NumPy columns:
+    # (family, ip_lo, ip_hi, port_lo, port_hi, proto) plus group, direction and source.
+    # Queries are boolean masks over all rules at once instead of nested loops.
+    def __init__(self, rules):
+        self.rules = rules
+        count = len(rules)
+        self.family = np.zeros(count, dtype=np.int8)
+        self.ip_lo_hi = np.zeros(count, dtype=np.uint64)
+        self.ip_lo_lo = np.zeros(count, dtype=np.uint64)
+        self.ip_hi_hi = np.zeros(count, dtype=np.uint64)
+        self.ip_hi_lo = np.zeros(count, dtype=np.uint64)
+        self.port_lo = np.zeros(count, dtype=np.int32)
+        self.port_hi = np.zeros(count, dtype=np.int32)
+        self.proto = np.zeros(count, dtype=np.int16)
+        self.egress = np.zeros(count, dtype=bool)
+        self.source_kind = np.zeros(count, dtype=np.int8)
+        self.source_id = np.full(count, -1, dtype=np.int64)
+        group_codes = {}
+        source_codes = {}
+        self.group = np.zeros(count, dtype=np.int64)
+
+        for i, rule in enumerate(rules):
+            protocol = PROTOCOLS.get(str(rule['IpProtocol']).lower())
+            protocol = int(rule['IpProtocol']) if protocol is None else protocol
+            self.proto[i] = protocol
+            self.port_lo[i], self.port_hi[i] = _normalize_ports(protocol, rule.get('FromPort'), rule.get('ToPort'))
+            self.egress[i] = rule.get('IsEgress', False)
+            self.group[i] = group_codes.setdefault(rule['GroupId'], len(group_codes))
+            cidr = rule.get('CidrIpv4') or rule.get('CidrIpv6')
+            if cidr:
+                self.family[i], self.ip_lo_hi[i], self.ip_lo_lo[i], self.ip_hi_hi[i], self.ip_hi_lo[i] = cidr_range(cidr)
+            else:
+                referenced = rule.get('ReferencedGroupInfo', {}).get('GroupId')
+                self.source_kind[i] = SOURCE_GROUP if referenced else SOURCE_PREFIX_LIST
+                self.source_id[i] = source_codes.setdefault(referenced or rule.get('PrefixListId'), len(source_codes))
+
+    def __len__(self):
+        return len(self.rules)
+
+    @classmethod
+    @tracer.step('load_security_group_rules')
+    def from_account(cls, ec2_client=None):
+        ec2_client = ec2_client or boto3.client('ec2')
+        rules = []
+        paginator = ec2_client.get_paginator('describe_security_group_rules')
+        for page in paginator.paginate(PaginationConfig={'PageSize': 1000}):
+            rules.extend(page['SecurityGroupRules'])
+        tracer.event(f"🛡️ Loaded {len(rules)} security group rules")
+        return cls(rules)
+
+    def _covers_ip(self, family, first_hi, first_lo, last_hi, last_lo):
+        return (self.source_kind == SOURCE_CIDR) & (self.family == family) & _le128(self.ip_lo_hi, self.ip_lo_lo, first_hi, first_lo) & _le128(last_hi, last_lo, self.ip_hi_hi, self.ip_hi_lo)
+
+    def exposed(self, port, protocol='tcp', cidrs=('0.0.0.0/0', '::/0')):
+        # Ingress rules that allow `port` to every address in any of `cidrs`
+        protocol = PROTOCOLS.get(protocol, protocol)
+        mask_proto = ~self.egress & ((self.proto == protocol) | (self.proto == -1)) & (self.port_lo <= port) & (self.port_hi >= port)
+        mask_ip = np.zeros(len(self), dtype=bool)
+        for cidr in cidrs:
+            family, *bounds = cidr_range(cidr)
+            mask_ip |= self._covers_ip(family, *(np.uint64(value) for value in bounds))
+        return [self.rules[i] for i in np.flatnonzero(mask_proto & mask_ip)]
+
+    def redundant(self):
+        # A rule is redundant when another rule of the same group and direction allows a
+        # superset of its traffic (security groups only allow, so it is fully shadowed).
+        # All candidate pairs within each (group, direction) block are built at once.
+        order = np.lexsort((self.egress, self.group))
+        block_key = self.group[order] * 2 + self.egress[order]
+        starts = np.flatnonzero(np.r_[True, block_key[1:] != block_key[:-1]])
+        sizes = np.diff(np.r_[starts, len(order)])
+        row_block_size = np.repeat(sizes, sizes)
+        row_block_start = np.repeat(starts, sizes)
+        # Pair k compares rule a (row) with rule b (another row of the same block)
+        a = np.repeat(np.arange(len(order)), row_block_size)
+        offsets = np.arange(len(a)) - np.repeat(np.cumsum(row_block_size) - row_block_size, row_block_size)
+        b = np.repeat(row_block_start, row_block_size) + offsets
+        a, b = order[a], order[b]
+        keep = a != b
+        a, b = a[keep], b[keep]
+
+        covers_proto = (self.proto[b] == -1) | (self.proto[b] == self.proto[a])
+        covers_port = (self.port_lo[b] <= self.port_lo[a]) & (self.port_hi[b] >= self.port_hi[a])
+        both_cidr = (self.source_kind[a] == SOURCE_CIDR) & (self.source_kind[b] == SOURCE_CIDR) & (self.family[a] == self.family[b])
+        covers_cidr = both_cidr & _le128(self.ip_lo_hi[b], self.ip_lo_lo[b], self.ip_lo_hi[a], self.ip_lo_lo[a]) \
+            & _le128(self.ip_hi_hi[a], self.ip_hi_lo[a], self.ip_hi_hi[b], self.ip_hi_lo[b])
+        same_source = (self.source_kind[a] != SOURCE_CIDR) & (self.source_kind[a] == self.source_kind[b]) & (self.source_id[a] == self.source_id[b])
+        covered = covers_proto & covers_port & (covers_cidr | same_source)
+
+        # Identical rules cover each other; only report the later one
+        identical = covered & covers_proto & (self.family[a] == self.family[b]) & (self.proto[a] == self.proto[b]) & (self.port_lo[a] == self.port_lo[b]) \
+            & (self.port_hi[a] == self.port_hi[b]) & (self.ip_lo_lo[a] == self.ip_lo_lo[b]) & (self.ip_hi_lo[a] == self.ip_hi_lo[b]) \
+            & (self.ip_lo_hi[a] == self.ip_lo_hi[b]) & (self.ip_hi_hi[a] == self.ip_hi_hi[b])
+        covered &= ~identical | (b < a)
+
+        a, b = a[covered], b[covered]
+        first = np.unique(a, return_index=True)[1]
+        return [(self.rules[a[i]], self.rules[b[i]]) for i in first]
+
+
+def describe(rule):
+    source = rule.get('CidrIpv4') or rule.get('CidrIpv6') or rule.get('PrefixListId') or rule.get('ReferencedGroupInfo', {}).get('GroupId')
+    ports = 'all' if rule['IpProtocol'] == '-1' else f"{rule.get('FromPort')}-{rule.get('ToPort')}"
+    direction = 'egress' if rule.get('IsEgress') else 'ingress'
+    return f"{rule['GroupId']} {rule.get('SecurityGroupRuleId', '')} {direction} {rule['IpProtocol']}/{ports} {source}"
+
+
+def synthetic_rules(count, groups=None, seed=0):
+    # Random rules to measure the analyzer without an account
+    rng = np.random.default_rng(seed)
+    groups = groups or max(1, count // 40)
+    rules = []
+    for i in range(count):
+        prefix = int(rng.choice([0, 8, 16, 24, 29, 32]))
+        address = ipaddress.ip_address(int(rng.integers(0, 2 ** 32)))
+        port = int(rng.choice([22, 80, 443, 3306, 5432, int(rng.integers(1024, 65535))]))
+        rules.append({
+            'SecurityGroupRuleId': f"sgr-{i:08x}",
+            'GroupId': f"sg-{int(rng.integers(0, groups)):08x}",
+            'IsEgress': bool(rng.random() < 0.2),
+            'IpProtocol': str(rng.choice(['tcp', 'udp', '-1'], p=[0.8, 0.15, 0.05])),
+            'FromPort': port,
+            'ToPort': port + int(rng.choice([0, 0, 0, 100])),
+            'CidrIpv4': str(ipaddress.ip_network(f"{address}/{prefix}", strict=False)),
+        })
+    return rules
+
+
+def analyze(index, ports=SENSITIVE_PORTS):
+    start = time.perf_counter()
+    with tracer.span('exposure_queries', rules=len(index)):
+        exposures = {port: index.exposed(port) for port in ports}
+    with tracer.span('redundancy_query', rules=len(index)):
+        redundant = index.redundant()
+    elapsed = (time.perf_counter() - start) * 1000
+
+    tracer.event(f"\n🌍 Rules open to the Internet ({len(index)} rules analyzed in {elapsed:.1f} ms):")
+    for port, rules in exposures.items():
+        icon = '❌' if rules else '✅'
+        tracer.event(f"  {icon} {ports[port]} ({port}): {len(rules)} rules", level='error' if rules else 'info')
+        for rule in rules[:10]:
+            tracer.event(f"      {describe(rule)}")
+    tracer.event(f"\n♻️ Redundant rules: {len(redundant)}")
+    for rule, covering in redundant[:20]:
+        tracer.event(f"  {describe(rule)}\n      ↳ covered by {describe(covering)}")
+    return exposures, redundant
+
+
+def main():
+    # python sg_analyzer.py [--synthetic N]
+    if len(sys.argv) > 2 and sys.argv[1] == '--synthetic':
+        index = RuleIndex(synthetic_rules(int(sys.argv[2])))
+    else:
+        index = RuleIndex.from_account()
+    analyze(index)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+import boto3
+import io
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import paramiko
+from botocore.exceptions import ClientError
+from instrumentation import tracer
+
+# Instances to target, selected by tag like the examples create them
+TAG_KEY = 'Name'
+TAG_VALUE = '<your_instance_name>'
+OS_USER = 'ubuntu'
+MAX_WORKERS = 64
+CONNECT_TIMEOUT = 10
+COMMAND_TIMEOUT = 120
+KEEPALIVE_SECONDS = 30
+
+# Local test fleet started with ssh_test/docker-compose.yml
+LOCAL_TEST_PORTS = [2221, 2222, 2223]
+LOCAL_TEST_USER = 'fleet'
+
+
+class Host:
+    def __init__(self, address, username=OS_USER, port=22, instance_id=None, availability_zone=None):
+        self.address = address
+        self.username = username
+        self.port = port
+        self.instance_id = instance_id
+        self.availability_zone = availability_zone
+
+    @property
+    def name(self):
+        return self.instance_id or f"{self.address}:{self.port}"
+
+
+def discover_hosts(tag_key=TAG_KEY, tag_value=TAG_VALUE, username=OS_USER, use_private_ip=False):
+    ec2 = boto3.client('ec2')
+    hosts = []
+    paginator = ec2.get_paginator('describe_instances')
+    for page in paginator.paginate(Filters=[
+        {'Name': f'tag:{tag_key}', 'Values': [tag_value]},
+        {'Name': 'instance-state-name', 'Values': ['running']}
+    ]):
+        for reservation in page['Reservations']:
+            for instance in reservation['Instances']:
+                address = instance.get('PrivateIpAddress') if use_private_ip else instance.get('PublicIpAddress')
+                if address:
+                    hosts.append(Host(address, username, instance_id=instance['InstanceId'],
+                                      availability_zone=instance['Placement']['AvailabilityZone']))
+    tracer.event(f"🔍 Found {len(hosts)} running instances with {tag_key}={tag_value}")
+    return hosts
+
+
+class InstanceConnectKeyPusher:
+    # Pushes the run's ephemeral public key with send_ssh_public_key. The key is accepted
+    # for 60 seconds, which is enough to open the connection that the pool then keeps.
+    def __init__(self, public_key):
+        self.public_key = public_key
+        self.client = boto3.client('ec2-instance-connect')
+
+    def __call__(self, host):
+        args = {'InstanceId': host.instance_id, 'InstanceOSUser': host.username, 'SSHPublicKey': self.public_key}
+        if host.availability_zone:
+            args['AvailabilityZone'] = host.availability_zone
+        self.client.send_ssh_public_key(**args)
+
+
+class SSHConnectionPool:
+    # One persistent paramiko connection per host, reused across commands and reopened
+    # (pushing the key again) when the transport drops
+    def __init__(self, key, key_pusher=None, connect_timeout=CONNECT_TIMEOUT, host_key_policy=None):
+        self.key = key
+        self.key_pusher = key_pusher
+        self.connect_timeout = connect_timeout
+        # Fleet instances are ephemeral, so unknown host keys are accepted by default.
+        # Pass paramiko.RejectPolicy() together with a known_hosts file for strict checking.
+        self.host_key_policy = host_key_policy or paramiko.AutoAddPolicy()
+        self._clients = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _host_lock(self, host):
+        with self._lock:
+            return self._locks.setdefault(host.name, threading.Lock())
+
+    def get(self, host):
+        with self._host_lock(host):
+            client = self._clients.get(host.name)
+            transport = client.get_transport() if client else None
+            if transport is not None and transport.is_active():
+                return client
+            if self.key_pusher:
+                self.key_pusher(host)
+            client = paramiko.SSHClient()
+            client.set_missing_host_key_policy(self.host_key_policy)
+            client.connect(
+                host.address,
+                port=host.port,
+                username=host.username,
+                pkey=self.key,
+                timeout=self.connect_timeout,
+                banner_timeout=self.connect_timeout,
+                auth_timeout=self.connect_timeout,
+                look_for_keys=False,
+                allow_agent=False
+            )
+            client.get_transport().set_keepalive(KEEPALIVE_SECONDS)
+            self._clients[host.name] = client
+            return client
+
+    def close(self):
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
+
+
+class FleetRunner:
+    def __init__(self, hosts, pool, max_workers=MAX_WORKERS):
+        self.hosts = hosts
+        self.pool = pool
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    @classmethod
+    def for_instance_connect(cls, hosts, max_workers=MAX_WORKERS):
+        # Ephemeral key for this run only; it never touches the disk
+        key = paramiko.RSAKey.generate(3072)
+        public_key = f"{key.get_name()} {key.get_base64()}"
+        return cls(hosts, SSHConnectionPool(key, InstanceConnectKeyPusher(public_key)), max_workers)
+
+    @classmethod
+    def for_static_key(cls, hosts, key_path, max_workers=MAX_WORKERS):
+        # Hosts that already trust the key, e.g. local SSH server containers for testing
+        return cls(hosts, SSHConnectionPool(paramiko.RSAKey.from_private_key_file(key_path)), max_workers)
+
+    def _emit(self, host, stream, buffer, data, collected):
+        buffer.write(data.decode(errors='replace'))
+        *lines, rest = buffer.getvalue().split('\n')
+        buffer.seek(0)
+        buffer.truncate()
+        buffer.write(rest)
+        for line in lines:
+            collected.append(line)
+            tracer.event(f"[{host.name}] {line}", level='error' if stream == 'stderr' else 'info', host=host.name, stream=stream)
+
+    def _run_on_host(self, host, command, timeout):
+        result = {'host': host.name, 'exit_code': None, 'stdout': [], 'stderr': [], 'error': None}
+        start = time.monotonic()
+        try:
+            channel = self.pool.get(host).get_transport().open_session()
+            channel.settimeout(1.0)
+            channel.exec_command(command)
+            buffers = {'stdout': io.StringIO(), 'stderr': io.StringIO()}
+            deadline = start + timeout
+            # Stream both outputs line by line until the command exits or times out
+            while True:
+                if channel.recv_ready():
+                    self._emit(host, 'stdout', buffers['stdout'], channel.recv(32768), result['stdout'])
+                if channel.recv_stderr_ready():
+                    self._emit(host, 'stderr', buffers['stderr'], channel.recv_stderr(32768), result['stderr'])
+                if channel.exit_status_ready() and not channel.recv_ready() and not channel.recv_stderr_ready():
+                    break
+                if time.monotonic() > deadline:
+                    channel.close()
+                    raise TimeoutError(f"command timed out after {timeout}s")
+                time.sleep(0.01)
+            for stream, buffer in buffers.items():
+                if buffer.getvalue():
+                    self._emit(host, stream, buffer, b'\n', result[stream])
+            result['exit_code'] = channel.recv_exit_status()
+            channel.close()
+        except (ClientError, paramiko.SSHException, OSError, TimeoutError) as e:
+            result['error'] = str(e)
+            tracer.event(f"❌ [{host.name}] {e}", level='error', host=host.name)
+        result['duration'] = round(time.monotonic() - start, 3)
+        return result
+
+    @tracer.step()
+    def run(self, command, timeout=COMMAND_TIMEOUT):
+        tracer.event(f"🚀 Running '{command}' on {len(self.hosts)} hosts...")
+        results = list(self.executor.map(lambda host: self._run_on_host(host, command, timeout), self.hosts))
+        ok = sum(1 for result in results if result['exit_code'] == 0)
+        failed = [result for result in results if result['exit_code'] != 0]
+        tracer.event(f"📊 {ok}/{len(results)} hosts succeeded")
+        for result in failed:
+            reason = result['error'] or f"exit code {result['exit_code']}"
+            tracer.event(f"  ❌ {result['host']}: {reason}", level='error')
+        return results
+
+    def close(self):
+        self.executor.shutdown()
+        self.pool.close()
+
+
+def local_test_hosts(ports=LOCAL_TEST_PORTS, username=LOCAL_TEST_USER):
+    return [Host('127.0.0.1', username, port=port) for port in ports]
+
+
+def main():
+    # python ssh_fleet_runner.py "<command>" [more commands...]
+    # With SSH_TEST_KEY=<private key> the commands run against the local test containers instead
+    commands = sys.argv[1:] or ['uptime']
+    if os.environ.get('SSH_TEST_KEY'):
+        runner = FleetRunner.for_static_key(local_test_hosts(), os.environ['SSH_TEST_KEY'])
+    else:
+        runner = FleetRunner.for_instance_connect(discover_hosts())
+    try:
+        for command in commands:
+            # Connections opened by the first command are reused by the next ones
+            runner.run(command)
+    finally:
+        runner.close()
+
+
+if __name__ == '__main__':
+    main()
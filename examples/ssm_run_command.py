@@ -0,0 +1,251 @@
+import boto3
+import math
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import unquote, urlparse
+from botocore.config import Config
+from instrumentation import tracer
+
+# Time every AWS call and step; output goes to the configured sinks
+tracer.instrument()
+
+# Instances to target, selected by tag like the examples create them
+TAG_KEY = 'Name'
+TAG_VALUES = ['UbuntuSessionManagerInstance', 'PrivateInstanceWithSessionManager']
+DOCUMENT_NAME = 'AWS-RunShellScript'
+# Bucket for full command output; leave as None to keep only the (truncated) inline output
+OUTPUT_BUCKET = None
+OUTPUT_PREFIX = 'ssm-run-command'
+
+BATCH_SIZE = 50                # send_command accepts at most 50 instance IDs
+SEND_RATE = 2.0                # send_command calls per second
+MAX_CONCURRENCY = '10%'        # per batch, as accepted by SSM
+MAX_ERRORS = '5%'
+POLL_INTERVAL = 5
+MAX_POLL_INTERVAL = 30
+DELIVERY_TIMEOUT = 600         # TimeoutSeconds: how long an instance may take to start the command
+EXECUTION_TIMEOUT = 3600       # executionTimeout of AWS-RunShellScript: how long the script may run
+WAIT_MARGIN = 60
+
+TERMINAL_STATUSES = {'Success', 'Cancelled', 'Failed', 'TimedOut'}
+
+
+class RateLimiter:
+    # Token bucket shared by every sender so bursts stay under the SendCommand TPS quota
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                time.sleep((1 - self.tokens) / self.rate)
+
+
+def error_limit(max_errors, target_count):
+    # MaxErrors as SSM accepts it: an absolute count or a percentage of the targets
+    if max_errors.endswith('%'):
+        return target_count * float(max_errors[:-1]) / 100
+    return int(max_errors)
+
+
+def concurrency_waves(max_concurrency, target_count):
+    # Rounds SSM needs to run one batch when only MaxConcurrency instances run at once
+    batch = min(BATCH_SIZE, target_count)
+    if max_concurrency.endswith('%'):
+        at_once = math.ceil(batch * float(max_concurrency[:-1]) / 100)
+    else:
+        at_once = int(max_concurrency)
+    return math.ceil(batch / max(1, at_once))
+
+
+def wait_timeout(max_concurrency, target_count):
+    # Delivery plus every wave of executions, plus some slack for the last status updates
+    return DELIVERY_TIMEOUT + concurrency_waves(max_concurrency, target_count) * EXECUTION_TIMEOUT + WAIT_MARGIN
+
+
+class SSMRunCommand:
+    def __init__(self, region_name=None, output_bucket=OUTPUT_BUCKET, output_prefix=OUTPUT_PREFIX):
+        config = Config(retries={'mode': 'adaptive', 'max_attempts': 10})
+        self.ssm_client = boto3.client('ssm', region_name=region_name, config=config)
+        self.s3_client = boto3.client('s3', region_name=region_name, config=config)
+        self.output_bucket = output_bucket
+        self.output_prefix = output_prefix
+        self.limiter = RateLimiter(SEND_RATE)
+        self.sent_after = None
+
+    @tracer.step()
+    def find_instances(self, tag_key=TAG_KEY, tag_values=TAG_VALUES):
+        # Only instances whose SSM agent is online can receive commands
+        instance_ids = []
+        paginator = self.ssm_client.get_paginator('describe_instance_information')
+        for page in paginator.paginate(
+            Filters=[
+                {'Key': f'tag:{tag_key}', 'Values': tag_values},
+                {'Key': 'PingStatus', 'Values': ['Online']}
+            ],
+            PaginationConfig={'PageSize': 50}
+        ):
+            instance_ids.extend(info['InstanceId'] for info in page['InstanceInformationList'])
+        tracer.event(f"🔍 {len(instance_ids)} managed instances online with {tag_key} in {tag_values}")
+        return instance_ids
+
+    @tracer.step()
+    def send(self, instance_ids, commands, comment='', max_concurrency=MAX_CONCURRENCY, max_errors=MAX_ERRORS):
+        command_ids = []
+        commands_by_id = {}
+        batches = [instance_ids[i:i + BATCH_SIZE] for i in range(0, len(instance_ids), BATCH_SIZE)]
+        limit = error_limit(max_errors, len(instance_ids))
+        checked_at = time.monotonic()
+        # Lower bound for the InvokedAfter filter of _refresh; a minute of slack for clock skew
+        self.sent_after = datetime.now(timezone.utc) - timedelta(minutes=1)
+        tracer.event(f"📤 Sending command to {len(instance_ids)} instances in {len(batches)} batches...")
+        for batch in batches:
+            # MaxErrors only applies within a batch; across batches it is enforced here by not
+            # sending more once the batches already sent have failed too often
+            if command_ids and time.monotonic() - checked_at >= POLL_INTERVAL:
+                self._refresh(commands_by_id)
+                checked_at = time.monotonic()
+                errors = sum(command['ErrorCount'] for command in commands_by_id.values() if command)
+                if errors > limit:
+                    tracer.event(
+                        f"🛑 {errors} errors exceed MaxErrors={max_errors}: "
+                        f"{len(batches) - len(command_ids)} batches not sent", level='error'
+                    )
+                    break
+            self.limiter.acquire()
+            args = {
+                'InstanceIds': batch,
+                'DocumentName': DOCUMENT_NAME,
+                'Parameters': {'commands': commands, 'executionTimeout': [str(EXECUTION_TIMEOUT)]},
+                'Comment': comment[:100],
+                'MaxConcurrency': max_concurrency,
+                'MaxErrors': max_errors,
+                'TimeoutSeconds': DELIVERY_TIMEOUT,
+            }
+            if self.output_bucket:
+                args['OutputS3BucketName'] = self.output_bucket
+                args['OutputS3KeyPrefix'] = self.output_prefix
+            command_id = self.ssm_client.send_command(**args)['Command']['CommandId']
+            command_ids.append(command_id)
+            commands_by_id[command_id] = None
+        return command_ids
+
+    def _refresh(self, commands_by_id):
+        # One paginated list_commands for every batch sent since send() started, instead of
+        # one call per batch or one get_command_invocation per instance; our batches are
+        # picked out by ID and the listing stops once all unfinished ones were seen
+        pending = {command_id for command_id, command in commands_by_id.items()
+                   if command is None or command['Status'] not in TERMINAL_STATUSES}
+        if not pending:
+            return
+        args = {}
+        if self.sent_after is not None:
+            args['Filters'] = [{'key': 'InvokedAfter', 'value': self.sent_after.strftime('%Y-%m-%dT%H:%M:%SZ')}]
+        for page in self.ssm_client.get_paginator('list_commands').paginate(**args):
+            for command in page['Commands']:
+                if command['CommandId'] in pending:
+                    commands_by_id[command['CommandId']] = command
+                    pending.discard(command['CommandId'])
+            if not pending:
+                break
+
+    @tracer.step()
+    def wait(self, command_ids, timeout=None):
+        timeout = timeout or wait_timeout(MAX_CONCURRENCY, BATCH_SIZE)
+        commands_by_id = dict.fromkeys(command_ids)
+        deadline = time.monotonic() + timeout
+        interval = POLL_INTERVAL
+        while True:
+            time.sleep(max(0, min(interval, deadline - time.monotonic())))
+            self._refresh(commands_by_id)
+            pending = [command_id for command_id, command in commands_by_id.items()
+                       if command is None or command['Status'] not in TERMINAL_STATUSES]
+            tracer.event(f"⏳ {len(command_ids) - len(pending)}/{len(command_ids)} batches finished")
+            if not pending:
+                return []
+            if time.monotonic() >= deadline:
+                tracer.event(f"⌛ Gave up waiting after {timeout} s: {len(pending)} batches still running", level='error')
+                return pending
+            interval = min(interval * 2, MAX_POLL_INTERVAL)
+
+    @tracer.step()
+    def collect(self, command_ids):
+        # Final sweep: one paginated list_command_invocations per batch (50 results per page)
+        results = []
+        paginator = self.ssm_client.get_paginator('list_command_invocations')
+        for command_id in command_ids:
+            for page in paginator.paginate(CommandId=command_id, Details=True):
+                for invocation in page['CommandInvocations']:
+                    plugin = invocation['CommandPlugins'][0] if invocation['CommandPlugins'] else {}
+                    results.append({
+                        'command_id': command_id,
+                        'instance_id': invocation['InstanceId'],
+                        'status': invocation['Status'],
+                        'exit_code': plugin.get('ResponseCode'),
+                        'output': plugin.get('Output', ''),
+                        'stdout_url': invocation.get('StandardOutputUrl') or plugin.get('StandardOutputUrl'),
+                        'stderr_url': invocation.get('StandardErrorUrl') or plugin.get('StandardErrorUrl'),
+                    })
+        return results
+
+    def stream_output(self, url, chunk_size=64 * 1024):
+        # Inline output is truncated at 2,500 characters; the S3 copy is complete and is
+        # streamed line by line so large outputs never have to fit in memory
+        if not url:
+            return
+        path = unquote(urlparse(url).path).lstrip('/')
+        bucket, key = path.split('/', 1)
+        body = self.s3_client.get_object(Bucket=bucket, Key=key)['Body']
+        for line in body.iter_lines(chunk_size=chunk_size):
+            yield line.decode(errors='replace')
+
+    def run(self, commands, tag_key=TAG_KEY, tag_values=TAG_VALUES, **send_args):
+        instance_ids = self.find_instances(tag_key, tag_values)
+        if not instance_ids:
+            return []
+        command_ids = self.send(instance_ids, commands, **send_args)
+        self.wait(command_ids, wait_timeout(send_args.get('max_concurrency', MAX_CONCURRENCY), len(instance_ids)))
+        results = self.collect(command_ids)
+        self.report(results)
+        return results
+
+    def report(self, results):
+        by_status = {}
+        for result in results:
+            by_status[result['status']] = by_status.get(result['status'], 0) + 1
+        tracer.event(f"\n📊 {len(results)} invocations: " + ', '.join(f"{status}={count}" for status, count in sorted(by_status.items())))
+        for result in results:
+            if result['status'] != 'Success':
+                tracer.event(f"  ❌ {result['instance_id']}: {result['status']} (exit code {result['exit_code']})", level='error')
+        calls = {name: stats['calls'] for name, stats in tracer.operation_stats().items() if name.startswith('ssm.')}
+        tracer.event(f"☁️ SSM API calls: {sum(calls.values())} " + str(calls))
+
+
+def main():
+    # python ssm_run_command.py "<shell command>" [more commands...]
+    commands = sys.argv[1:] or ['uptime']
+    runner = SSMRunCommand()
+    results = runner.run(commands)
+    for result in results:
+        tracer.event(f"\n🖥️ {result['instance_id']} ({result['status']})")
+        if runner.output_bucket:
+            for line in runner.stream_output(result['stdout_url']):
+                tracer.event(f"  {line}")
+        else:
+            tracer.event(result['output'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The examples are scripts, not a package: import them the way they import each other
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# moto never reaches AWS, but botocore still wants credentials and a region
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
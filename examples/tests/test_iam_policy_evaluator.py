@@ -0,0 +1,132 @@
+import json
+import boto3
+import pytest
+from moto import mock_aws
+from iam_policy_evaluator import ALLOWED, DENIED, IMPLICIT_DENY, PolicySimulator
+
+ACCOUNT = '123456789012'
+ADMIN = f"arn:aws:iam::{ACCOUNT}:role/admin"
+READER = f"arn:aws:iam::{ACCOUNT}:role/reader"
+OUTSIDER = 'arn:aws:iam::210987654321:role/outsider'
+KEY = f"arn:aws:kms:us-east-1:{ACCOUNT}:key/1234abcd"
+
+
+def policy(*statements):
+    return {'Version': '2012-10-17', 'Statement': list(statements)}
+
+
+@pytest.fixture
+def simulator():
+    simulator = PolicySimulator()
+    simulator.add_policy('admin', policy({'Effect': 'Allow', 'Action': '*', 'Resource': '*'}))
+    simulator.add_policy('no-delete', policy({'Effect': 'Deny', 'Action': 's3:Delete*', 'Resource': 'arn:aws:s3:::audit/*'}))
+    simulator.add_policy('read', policy({'Effect': 'Allow', 'Action': ['s3:Get*', 'kms:Decrypt'], 'Resource': '*'}))
+    simulator.add_principal(ADMIN, ['admin', 'no-delete'])
+    simulator.add_principal(READER, ['read'])
+    simulator.add_principal(OUTSIDER, ['admin'])
+    return simulator
+
+
+def test_explicit_deny_wins_over_allow(simulator):
+    decision, _, reasons = simulator.can(ADMIN, 's3:DeleteObject', 'arn:aws:s3:::audit/2024.log')
+    assert decision == DENIED
+    assert reasons == ['no-delete#0']
+    # The deny is scoped to the audit prefix; elsewhere the allow stands
+    assert simulator.can(ADMIN, 's3:DeleteObject', 'arn:aws:s3:::other/file')[0] == ALLOWED
+
+
+def test_deny_wins_whatever_the_policy_order():
+    simulator = PolicySimulator()
+    simulator.add_policy('deny', policy({'Effect': 'Deny', 'Action': 'iam:*', 'Resource': '*'}))
+    simulator.add_policy('allow', policy({'Effect': 'Allow', 'Action': 'iam:PassRole', 'Resource': '*'}))
+    simulator.add_principal(ADMIN, ['allow', 'deny'])
+    assert simulator.can(ADMIN, 'iam:PassRole', '*')[0] == DENIED
+
+
+def test_conditional_deny_makes_the_allow_conditional():
+    simulator = PolicySimulator()
+    simulator.add_policy('allow', policy({'Effect': 'Allow', 'Action': 'ec2:*', 'Resource': '*'}))
+    simulator.add_policy('deny', policy({
+        'Effect': 'Deny', 'Action': 'ec2:TerminateInstances', 'Resource': '*',
+        'Condition': {'Bool': {'aws:MultiFactorAuthPresent': 'false'}}
+    }))
+    simulator.add_principal(ADMIN, ['allow', 'deny'])
+    assert simulator.can(ADMIN, 'ec2:TerminateInstances', '*')[:2] == (ALLOWED, True)
+    assert simulator.can(ADMIN, 'ec2:DescribeInstances', '*')[:2] == (ALLOWED, False)
+
+
+def test_implicit_deny_and_action_matching(simulator):
+    assert simulator.can(READER, 's3:PutObject', '*')[0] == IMPLICIT_DENY
+    # Actions are case-insensitive, resources are not
+    assert simulator.can(READER, 'S3:GETOBJECT', 'arn:aws:s3:::bucket/key')[0] == ALLOWED
+    assert simulator.can('arn:aws:iam::1:role/unknown', 's3:GetObject', '*')[0] == IMPLICIT_DENY
+
+
+def test_not_action_and_not_resource():
+    simulator = PolicySimulator()
+    simulator.add_policy('all-but-iam', policy({'Effect': 'Allow', 'NotAction': 'iam:*', 'NotResource': 'arn:aws:s3:::secret*'}))
+    simulator.add_principal(ADMIN, ['all-but-iam'])
+    assert simulator.can(ADMIN, 's3:GetObject', 'arn:aws:s3:::public/key')[0] == ALLOWED
+    assert simulator.can(ADMIN, 's3:GetObject', 'arn:aws:s3:::secret/key')[0] == IMPLICIT_DENY
+    assert simulator.can(ADMIN, 'iam:CreateUser', '*')[0] == IMPLICIT_DENY
+
+
+def test_who_can_matches_can(simulator):
+    allowed = simulator.who_can('s3:DeleteObject', 'arn:aws:s3:::audit/2024.log')
+    assert set(allowed) == {OUTSIDER}
+    for principal in simulator.principals:
+        decision = simulator.can(principal, 's3:DeleteObject', 'arn:aws:s3:::audit/2024.log')[0]
+        assert (principal in allowed) == (decision == ALLOWED)
+
+
+def test_who_can_decrypt_key_policy_grants(simulator):
+    key_policy = policy(
+        # Naming the account root delegates to IAM: only its principals allowed by IAM
+        {'Sid': 'Root', 'Effect': 'Allow', 'Principal': {'AWS': ACCOUNT}, 'Action': 'kms:*', 'Resource': '*'},
+        # A principal named directly decrypts on the key policy alone
+        {'Sid': 'Direct', 'Effect': 'Allow', 'Principal': {'AWS': 'arn:aws:iam::555555555555:role/partner'},
+         'Action': 'kms:Decrypt', 'Resource': '*', 'Condition': {'StringEquals': {'kms:ViaService': 's3.us-east-1.amazonaws.com'}}},
+    )
+    result = simulator.who_can_decrypt(KEY, key_policy)
+    assert set(result) == {ADMIN, READER, 'arn:aws:iam::555555555555:role/partner'}
+    assert result[READER] == {'conditional': False, 'statements': ['key-policy#Root', 'read#0']}
+    assert result['arn:aws:iam::555555555555:role/partner']['conditional'] is True
+    # The outsider's IAM allow does not help: the key policy never trusts its account
+    assert OUTSIDER not in result
+
+
+def test_who_can_decrypt_wildcard_principal(simulator):
+    key_policy = policy({'Effect': 'Allow', 'Principal': '*', 'Action': 'kms:Decrypt', 'Resource': '*'})
+    assert set(simulator.who_can_decrypt(KEY, key_policy)) == set(simulator.principals)
+
+
+def test_who_can_decrypt_ignores_deny_and_other_actions(simulator):
+    key_policy = policy(
+        {'Effect': 'Allow', 'Principal': {'AWS': READER}, 'Action': 'kms:Encrypt', 'Resource': '*'},
+        {'Effect': 'Deny', 'Principal': {'AWS': ADMIN}, 'Action': 'kms:Decrypt', 'Resource': '*'},
+    )
+    assert simulator.who_can_decrypt(KEY, key_policy) == {}
+
+
+@mock_aws
+def test_from_account_reads_roles_users_and_groups():
+    iam = boto3.client('iam')
+    trust = json.dumps(policy({'Effect': 'Allow', 'Principal': {'Service': 'ec2.amazonaws.com'}, 'Action': 'sts:AssumeRole'}))
+    role_arn = iam.create_role(RoleName='app', AssumeRolePolicyDocument=trust)['Role']['Arn']
+    iam.put_role_policy(RoleName='app', PolicyName='s3', PolicyDocument=json.dumps(policy(
+        {'Effect': 'Allow', 'Action': 's3:*', 'Resource': '*'},
+        {'Effect': 'Deny', 'Action': 's3:DeleteBucket', 'Resource': '*'},
+    )))
+    managed_arn = iam.create_policy(PolicyName='pass-role', PolicyDocument=json.dumps(policy(
+        {'Effect': 'Allow', 'Action': 'iam:PassRole', 'Resource': '*'}
+    )))['Policy']['Arn']
+    iam.create_group(GroupName='ops')
+    iam.attach_group_policy(GroupName='ops', PolicyArn=managed_arn)
+    user_arn = iam.create_user(UserName='alice')['User']['Arn']
+    iam.add_user_to_group(GroupName='ops', UserName='alice')
+
+    simulator = PolicySimulator.from_account(iam)
+    assert simulator.can(role_arn, 's3:PutObject', 'arn:aws:s3:::b/k')[0] == ALLOWED
+    assert simulator.can(role_arn, 's3:DeleteBucket', 'arn:aws:s3:::b')[0] == DENIED
+    assert simulator.can(user_arn, 'iam:PassRole', role_arn)[0] == ALLOWED
+    assert simulator.can(user_arn, 's3:PutObject', 'arn:aws:s3:::b/k')[0] == IMPLICIT_DENY
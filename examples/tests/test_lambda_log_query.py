@@ -0,0 +1,129 @@
+import json
+from datetime import datetime, timedelta, timezone
+import boto3
+import numpy as np
+import pandas as pd
+import pytest
+from moto import mock_aws
+from lambda_log_query import COLUMNS, KEY_TIME_FORMAT, LambdaLogQuery, aggregate, parse_time
+
+BUCKET = 'lambda-logs-test'
+START = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+
+def synthetic_logs(count, seed=0):
+    rng = np.random.default_rng(seed)
+    moments = [START + timedelta(seconds=int(s)) for s in np.sort(rng.integers(0, 3 * 24 * 3600, count))]
+    frame = pd.DataFrame({
+        'key_time': [moment.strftime(KEY_TIME_FORMAT) for moment in moments],
+        'status_code': rng.choice([200, 201, 404, 500], size=count, p=[0.7, 0.1, 0.15, 0.05]),
+        'elapsed_ms': rng.lognormal(4, 1, size=count),
+    })
+    frame['status_code'] = frame['status_code'].astype('Int64')
+    # Failed invocations log no status code and no latency
+    frame.loc[frame.index % 97 == 0, ['status_code', 'elapsed_ms']] = [pd.NA, np.nan]
+    frame['key'] = [f"log_{key_time}_{i}.json" for i, key_time in enumerate(frame['key_time'])]
+    return frame
+
+
+def chunks(frame, size):
+    return (frame.iloc[i:i + size] for i in range(0, len(frame), size))
+
+
+def test_aggregate_matches_exact_pandas():
+    frame = synthetic_logs(5000)
+    result = aggregate(chunks(frame, 700))
+    status = frame['status_code'].fillna(-1)
+    assert result['requests'] == len(frame)
+    assert result['status']['requests'].to_dict() == status.value_counts().to_dict()
+
+    exact = frame.groupby(status)['elapsed_ms'].agg(['count', 'mean', 'std', 'min', 'max'])
+    latency = result['latency'].loc[exact.index]
+    assert latency['count'].tolist() == exact['count'].tolist()
+    for column in ('mean', 'std', 'min', 'max'):
+        assert np.allclose(latency[column].astype(float), exact[column].astype(float), equal_nan=True)
+    # Percentiles come from a histogram with ~2 % wide bins: each lands in the bin of the
+    # observation at that rank (no interpolation between observations)
+    for q in (0.5, 0.9, 0.99):
+        timed = frame['elapsed_ms'].notna()
+        expected = frame[timed].groupby(status[timed])['elapsed_ms'].apply(lambda values: np.quantile(values, q, method='inverted_cdf'))
+        approx = latency[f"{q:.0%}"].loc[expected.index].astype(float)
+        assert np.all(np.abs(approx - expected) / expected < 0.025)
+
+
+def test_aggregate_hourly_matches_exact_pandas():
+    frame = synthetic_logs(3000, seed=1)
+    result = aggregate(chunks(frame, 256))
+    hour = pd.to_datetime(frame['key_time'], format=KEY_TIME_FORMAT).dt.floor('h')
+    errors = (frame['status_code'] >= 400).fillna(True).astype(int)
+    exact = pd.DataFrame({'requests': 1, 'errors': errors}).groupby(hour).sum()
+    hourly = result['hourly']
+    # Hours without requests are listed with zeros
+    assert len(hourly) == (hour.max() - hour.min()) / pd.Timedelta(hours=1) + 1
+    assert hourly.loc[exact.index, ['requests', 'errors']].to_numpy().tolist() == exact.to_numpy().tolist()
+    assert hourly.drop(exact.index)[['requests', 'errors']].eq(0).all().all()
+
+
+def test_aggregate_does_not_depend_on_chunking():
+    frame = synthetic_logs(2000, seed=2)
+    one = aggregate([frame])
+    many = aggregate(chunks(frame, 13))
+    pd.testing.assert_frame_equal(one['status'], many['status'])
+    pd.testing.assert_frame_equal(one['latency'], many['latency'], check_exact=False)
+    pd.testing.assert_frame_equal(one['hourly'], many['hourly'])
+
+
+def test_aggregate_empty():
+    assert aggregate([]) == {'requests': 0}
+    assert aggregate([pd.DataFrame(columns=COLUMNS)]) == {'requests': 0}
+
+
+def test_parse_time_is_utc():
+    assert parse_time('2024-06-01T12:00:00') == datetime(2024, 6, 1, 12, tzinfo=timezone.utc)
+    assert parse_time('2024-06-01T14:00:00+02:00') == datetime(2024, 6, 1, 12, tzinfo=timezone.utc)
+    assert abs(parse_time('2h') - (datetime.now(timezone.utc) - timedelta(hours=2))) < timedelta(seconds=5)
+
+
+@pytest.fixture
+def bucket():
+    with mock_aws():
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket=BUCKET)
+        yield s3
+
+
+def put_logs(s3, frame):
+    for row in frame.itertuples():
+        s3.put_object(Bucket=BUCKET, Key=row.key, Body=json.dumps({
+            'status_code': None if pd.isna(row.status_code) else int(row.status_code),
+            'elapsed_ms': None if pd.isna(row.elapsed_ms) else row.elapsed_ms,
+            'url': 'https://example.com', 'data': 'x' * 100,
+        }))
+
+
+def test_query_reads_s3_then_cache(bucket, tmp_path):
+    frame = synthetic_logs(300, seed=3)
+    put_logs(bucket, frame)
+    end = START + timedelta(days=3)
+    logs = LambdaLogQuery(BUCKET, cache_dir=str(tmp_path))
+    first = logs.query(START + timedelta(days=1), end)
+    in_range = frame[frame['key_time'] >= (START + timedelta(days=1)).strftime(KEY_TIME_FORMAT)]
+    assert first['requests'] == len(in_range)
+    # The closed days are complete in the cache now: nothing is listed or downloaded again
+    assert logs._complete_days() == {'log_20240602_', 'log_20240603_'}
+    bucket.delete_objects(Bucket=BUCKET, Delete={'Objects': [{'Key': key} for key in frame['key']]})
+    second = logs.query(START + timedelta(days=1), end)
+    pd.testing.assert_frame_equal(first['status'], second['status'])
+    logs.close()
+
+
+def test_query_honours_range_within_a_day(bucket, tmp_path):
+    frame = synthetic_logs(300, seed=4)
+    put_logs(bucket, frame)
+    start, end = START + timedelta(hours=30), START + timedelta(hours=40)
+    logs = LambdaLogQuery(BUCKET, cache_dir=str(tmp_path))
+    expected = frame[(frame['key_time'] >= start.strftime(KEY_TIME_FORMAT)) & (frame['key_time'] < end.strftime(KEY_TIME_FORMAT))]
+    assert logs.query(start, end)['requests'] == len(expected)
+    # A partly listed day is never marked complete
+    assert logs._complete_days() == set()
+    logs.close()
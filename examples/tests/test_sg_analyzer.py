@@ -0,0 +1,128 @@
+import ipaddress
+import boto3
+from moto import mock_aws
+from sg_analyzer import PROTOCOLS, RuleIndex, synthetic_rules
+
+
+def rule(rule_id, cidr=None, protocol='tcp', ports=(22, 22), group='sg-1', egress=False, referenced=None):
+    rule = {'SecurityGroupRuleId': rule_id, 'GroupId': group, 'IsEgress': egress, 'IpProtocol': protocol,
+            'FromPort': ports[0], 'ToPort': ports[1]}
+    if referenced:
+        rule['ReferencedGroupInfo'] = {'GroupId': referenced}
+    elif cidr and ':' in cidr:
+        rule['CidrIpv6'] = cidr
+    else:
+        rule['CidrIpv4'] = cidr
+    return rule
+
+
+def ids(rules):
+    return sorted(rule['SecurityGroupRuleId'] for rule in rules)
+
+
+def redundant_ids(index):
+    return sorted((rule['SecurityGroupRuleId'], covering['SecurityGroupRuleId']) for rule, covering in index.redundant())
+
+
+def test_exposure_keeps_address_families_apart():
+    index = RuleIndex([
+        rule('v4-open', '0.0.0.0/0'),
+        rule('v6-open', '::/0'),
+        rule('v4-office', '203.0.113.0/24'),
+    ])
+    assert ids(index.exposed(22)) == ['v4-open', 'v6-open']
+    assert ids(index.exposed(22, cidrs=('0.0.0.0/0',))) == ['v4-open']
+    assert ids(index.exposed(22, cidrs=('::/0',))) == ['v6-open']
+    assert index.exposed(3389) == []
+
+
+def test_exposure_protocols_and_port_ranges():
+    index = RuleIndex([
+        rule('all-traffic', '0.0.0.0/0', protocol='-1', ports=(-1, -1)),
+        rule('udp-range', '0.0.0.0/0', protocol='udp', ports=(1000, 2000)),
+        rule('egress', '0.0.0.0/0', egress=True),
+    ])
+    assert ids(index.exposed(22)) == ['all-traffic']
+    assert ids(index.exposed(1500, protocol='udp')) == ['all-traffic', 'udp-range']
+
+
+def test_ipv6_rule_never_covers_ipv4_rule():
+    # ::/0 spans the numeric range of every IPv4 address; without the family column it
+    # would shadow the IPv4 rule
+    index = RuleIndex([rule('v6-open', '::/0'), rule('v4-host', '10.0.0.1/32')])
+    assert index.redundant() == []
+
+
+def test_redundant_rules():
+    index = RuleIndex([
+        rule('wide', '10.0.0.0/8', ports=(0, 65535)),
+        rule('narrow', '10.1.2.0/24', ports=(22, 22)),
+        rule('all-proto', '192.168.0.0/16', protocol='-1', ports=(-1, -1)),
+        rule('udp-host', '192.168.1.1/32', protocol='udp', ports=(53, 53)),
+        rule('dup-1', '172.16.0.0/12', ports=(443, 443)),
+        rule('dup-2', '172.16.0.0/12', ports=(443, 443)),
+        rule('v6-wide', '2001:db8::/32', ports=(0, 65535)),
+        rule('v6-narrow', '2001:db8:1::/48', ports=(80, 80)),
+        # Same traffic, but another group or direction: not redundant
+        rule('other-group', '10.1.2.0/24', group='sg-2'),
+        rule('egress', '10.1.2.0/24', egress=True),
+        # Group references only cover rules naming the same group
+        rule('ref', referenced='sg-9', ports=(0, 65535)),
+        rule('ref-narrow', referenced='sg-9', ports=(22, 22)),
+        rule('ref-other', referenced='sg-8', ports=(22, 22)),
+    ])
+    assert redundant_ids(index) == [
+        ('dup-2', 'dup-1'),
+        ('narrow', 'wide'),
+        ('ref-narrow', 'ref'),
+        ('udp-host', 'all-proto'),
+        ('v6-narrow', 'v6-wide'),
+    ]
+
+
+def _covers(outer, inner):
+    # Straightforward reference: one rule allows everything another one does
+    def proto(rule):
+        value = PROTOCOLS.get(rule['IpProtocol'])
+        return int(rule['IpProtocol']) if value is None else value
+
+    def ports(rule):
+        if proto(rule) == -1:
+            return 0, 65535
+        return rule['FromPort'], rule['ToPort']
+
+    if outer['GroupId'] != inner['GroupId'] or outer['IsEgress'] != inner['IsEgress']:
+        return False
+    if proto(outer) not in (-1, proto(inner)):
+        return False
+    if not (ports(outer)[0] <= ports(inner)[0] and ports(inner)[1] <= ports(outer)[1]):
+        return False
+    return ipaddress.ip_network(inner['CidrIpv4']).subnet_of(ipaddress.ip_network(outer['CidrIpv4']))
+
+
+def test_redundant_matches_pairwise_reference():
+    rules = synthetic_rules(400, groups=5, seed=7)
+    index = RuleIndex(rules)
+    found = {rule['SecurityGroupRuleId']: covering for rule, covering in index.redundant()}
+    for i, inner in enumerate(rules):
+        covering = [j for j, outer in enumerate(rules) if j != i and _covers(outer, inner)]
+        identical = [j for j in covering if _covers(inner, rules[j])]
+        # Of two identical rules only the later one is reported
+        expected = bool([j for j in covering if j not in identical or j < i])
+        assert (inner['SecurityGroupRuleId'] in found) == expected
+        if expected:
+            assert _covers(found[inner['SecurityGroupRuleId']], inner)
+
+
+@mock_aws
+def test_from_account():
+    ec2 = boto3.client('ec2')
+    vpc_id = ec2.create_vpc(CidrBlock='10.0.0.0/16')['Vpc']['VpcId']
+    group_id = ec2.create_security_group(GroupName='web', Description='web', VpcId=vpc_id)['GroupId']
+    ec2.authorize_security_group_ingress(GroupId=group_id, IpPermissions=[
+        {'IpProtocol': 'tcp', 'FromPort': 22, 'ToPort': 22, 'IpRanges': [{'CidrIp': '0.0.0.0/0'}]},
+        {'IpProtocol': 'tcp', 'FromPort': 443, 'ToPort': 443, 'Ipv6Ranges': [{'CidrIpv6': '::/0'}]},
+    ])
+    index = RuleIndex.from_account(ec2)
+    assert [rule['GroupId'] for rule in index.exposed(22)] == [group_id]
+    assert [rule.get('CidrIpv6') for rule in index.exposed(443)] == ['::/0']
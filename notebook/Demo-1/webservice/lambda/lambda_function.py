@@ -9,48 +9,63 @@ from datetime import datetime
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# El cliente de S3 y la sesión HTTP se crean una sola vez durante la fase de init
+# y se reutilizan (junto con sus conexiones) en las invocaciones "calientes"
+s3 = boto3.client('s3')
+http = requests.Session()
+
+def store_log(bucket_name, request_id, log_content):
+    # Crear nombre de archivo único para el log
+    log_file_name = f'log_{datetime.now().strftime("%Y%m%d_%H%M%S")}_{request_id}.json'
+    
+    # Convertir contenido del log a JSON
+    log_content_json = json.dumps(log_content, indent=4)
+    
+    # Subir el log al bucket S3
+    s3.put_object(
+        Bucket=bucket_name,
+        Key=log_file_name,
+        Body=log_content_json,
+        ContentType='application/json'
+    )
+    logger.info(f'✅ Log almacenado en {bucket_name}/{log_file_name}')
+
 def lambda_handler(event, context):
     # Obtener el nombre del bucket y la URL desde variables de entorno
     bucket_name = os.environ.get('BUCKET_NAME', 'nombre-unico-del-bucket')
     url_to_fetch = os.environ.get('URL_TO_FETCH', 'https://api.example.com/data')
     
-    # Crear un cliente de S3
-    s3 = boto3.client('s3')
-    
     try:
         # Realizar solicitud GET a la URL
-        response = requests.get(url_to_fetch)
+        response = http.get(url_to_fetch)
         response.raise_for_status()
         data = response.json()
         
-        # Crear nombre de archivo único para el log
-        log_file_name = f'log_{datetime.now().strftime("%Y%m%d_%H%M%S")}_{context.aws_request_id}.json'
-        
-        # Crear contenido del log
-        log_content = {
+        # Crear contenido del log (elapsed_ms es la latencia de la solicitud)
+        store_log(bucket_name, context.aws_request_id, {
             'timestamp': datetime.now().isoformat(),
             'url': url_to_fetch,
             'status_code': response.status_code,
+            'elapsed_ms': round(response.elapsed.total_seconds() * 1000, 1),
             'data': data
-        }
-        
-        # Convertir contenido del log a JSON
-        log_content_json = json.dumps(log_content, indent=4)
-        
-        # Subir el log al bucket S3
-        s3.put_object(
-            Bucket=bucket_name,
-            Key=log_file_name,
-            Body=log_content_json,
-            ContentType='application/json'
-        )
-        logger.info(f'✅ Log almacenado en {bucket_name}/{log_file_name}')
+        })
         return {
             'statusCode': 200,
             'body': json.dumps('Log almacenado exitosamente.')
         }
     except requests.exceptions.RequestException as e:
         logger.error(f'⚠️ Error al realizar la solicitud: {e}')
+        # Las solicitudes fallidas también se registran para poder analizar los códigos de estado
+        try:
+            store_log(bucket_name, context.aws_request_id, {
+                'timestamp': datetime.now().isoformat(),
+                'url': url_to_fetch,
+                'status_code': e.response.status_code if e.response is not None else None,
+                'elapsed_ms': round(e.response.elapsed.total_seconds() * 1000, 1) if e.response is not None else None,
+                'error': str(e)
+            })
+        except Exception as log_error:
+            logger.error(f'⚠️ Error al almacenar el log: {log_error}')
         return {
             'statusCode': 500,
             'body': json.dumps('Error al realizar la solicitud.')
@@ -1,6 +1,6 @@
 from flask import Flask
 from app.config import Config
-from app.models import db, bcrypt, login_manager
+from app.models import db, bcrypt, login_manager, upgrade_schema
 
 def create_app():
     app = Flask(__name__)
@@ -11,8 +11,23 @@ def create_app():
     login_manager.init_app(app)
     login_manager.login_view = 'routes.login'
 
+    # Registers the listeners that keep the expense rollups and user data versions up to date
+    from app import analytics, caching
+    caching.init_app(app)
+
     with app.app_context():
         db.create_all()
+        # Databases from before the analytics and caching columns: add them, then fill
+        # the rollups, which the listeners only maintain for changes made from now on
+        if upgrade_schema(db.engine):
+            analytics.rebuild_rollups()
+        from app.search import create_search_index
+        create_search_index(db.engine)
+
+    @app.cli.command('rebuild-rollups')
+    def rebuild_rollups():
+        """Recompute all expense rollups from the expense table."""
+        print(f"Rebuilt {analytics.rebuild_rollups()} rollup cells")
 
     from app.routes import bp as routes_bp
     app.register_blueprint(routes_bp)
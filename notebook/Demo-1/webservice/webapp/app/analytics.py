@@ -0,0 +1,197 @@
+from datetime import date
+import numpy as np
+import pandas as pd
+from sqlalchemy import and_, case, delete, event, select, update
+from sqlalchemy.orm.attributes import get_history
+from app.models import db, Expense, ExpenseRollup, ExpenseAmountBucket
+
+# Histogram buckets are quarter octaves: bucket b holds amounts in [2^(b/4), 2^((b+1)/4)),
+# so a percentile read from the histogram is within ~9% of the exact value
+BUCKETS_PER_OCTAVE = 4
+MIN_AMOUNT = 0.01
+REBUILD_CHUNK_SIZE = 200000
+
+rollups = ExpenseRollup.__table__
+buckets = ExpenseAmountBucket.__table__
+expenses = Expense.__table__
+
+
+def month_of(moment):
+    return date(moment.year, moment.month, 1)
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def amount_bucket(amounts):
+    amounts = np.maximum(np.asarray(amounts, dtype=float), MIN_AMOUNT)
+    return np.floor(np.log2(amounts) * BUCKETS_PER_OCTAVE).astype(int)
+
+
+def _insert(connection, table):
+    # ON CONFLICT upserts are supported by both databases the app runs on
+    if connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+
+def _cell(table, user_id, month, category):
+    return and_(table.c.user_id == user_id, table.c.month == month, table.c.category == category)
+
+
+def add_to_rollup(connection, user_id, created_at, category, amount):
+    month = month_of(created_at)
+    statement = _insert(connection, rollups).values(
+        user_id=user_id, month=month, category=category, expense_count=1,
+        total=amount, total_squares=amount * amount, min_amount=amount, max_amount=amount
+    )
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=['user_id', 'month', 'category'],
+        set_={
+            'expense_count': rollups.c.expense_count + 1,
+            'total': rollups.c.total + amount,
+            'total_squares': rollups.c.total_squares + amount * amount,
+            'min_amount': case((rollups.c.min_amount <= amount, rollups.c.min_amount), else_=amount),
+            'max_amount': case((rollups.c.max_amount >= amount, rollups.c.max_amount), else_=amount),
+        }
+    ))
+    statement = _insert(connection, buckets).values(
+        user_id=user_id, month=month, category=category, bucket=int(amount_bucket(amount)), expense_count=1
+    )
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=['user_id', 'month', 'category', 'bucket'],
+        set_={'expense_count': buckets.c.expense_count + 1}
+    ))
+
+
+def remove_from_rollup(connection, user_id, created_at, category, amount):
+    month = month_of(created_at)
+    cell = _cell(rollups, user_id, month, category)
+    row = connection.execute(update(rollups).where(cell).values(
+        expense_count=rollups.c.expense_count - 1,
+        total=rollups.c.total - amount,
+        total_squares=rollups.c.total_squares - amount * amount
+    ).returning(rollups.c.expense_count, rollups.c.min_amount, rollups.c.max_amount)).first()
+    bucket_cell = and_(_cell(buckets, user_id, month, category), buckets.c.bucket == int(amount_bucket(amount)))
+    connection.execute(update(buckets).where(bucket_cell).values(expense_count=buckets.c.expense_count - 1))
+    connection.execute(delete(buckets).where(bucket_cell, buckets.c.expense_count <= 0))
+    if row is None:
+        return
+    if row.expense_count <= 0:
+        connection.execute(delete(rollups).where(cell))
+    elif amount <= row.min_amount or amount >= row.max_amount:
+        # Min and max cannot be decremented: recompute them from the cell's expenses only
+        extremes = connection.execute(
+            select(db.func.min(expenses.c.amount), db.func.max(expenses.c.amount)).where(
+                expenses.c.user_id == user_id, expenses.c.category == category,
+                expenses.c.created_at >= month, expenses.c.created_at < next_month(month)
+            )
+        ).first()
+        connection.execute(update(rollups).where(cell).values(min_amount=extremes[0], max_amount=extremes[1]))
+
+
+@event.listens_for(Expense, 'after_insert')
+def expense_inserted(mapper, connection, target):
+    add_to_rollup(connection, target.user_id, target.created_at, target.category, target.amount)
+
+
+@event.listens_for(Expense, 'after_delete')
+def expense_deleted(mapper, connection, target):
+    remove_from_rollup(connection, target.user_id, target.created_at, target.category, target.amount)
+
+
+@event.listens_for(Expense, 'after_update')
+def expense_updated(mapper, connection, target):
+    def previous(name):
+        history = get_history(target, name)
+        return history.deleted[0] if history.deleted else getattr(target, name)
+
+    old = (previous('user_id'), previous('created_at'), previous('category'), previous('amount'))
+    new = (target.user_id, target.created_at, target.category, target.amount)
+    if old != new:
+        remove_from_rollup(connection, *old)
+        add_to_rollup(connection, *new)
+
+
+def rebuild_rollups(user_id=None, chunk_size=REBUILD_CHUNK_SIZE):
+    # Full recomputation in vectorized passes over the expense table, read in chunks so
+    # memory stays bounded. Partial aggregates of each chunk are merged at the end.
+    query = select(expenses.c.user_id, expenses.c.created_at, expenses.c.category, expenses.c.amount)
+    if user_id is not None:
+        query = query.where(expenses.c.user_id == user_id)
+    keys = ['user_id', 'month', 'category']
+    cell_parts, bucket_parts = [], []
+    with db.engine.connect() as connection:
+        for chunk in pd.read_sql(query, connection, chunksize=chunk_size):
+            chunk['month'] = pd.to_datetime(chunk['created_at']).dt.to_period('M').dt.to_timestamp().dt.date
+            chunk['squares'] = chunk['amount'] ** 2
+            chunk['bucket'] = amount_bucket(chunk['amount'])
+            cell_parts.append(chunk.groupby(keys).agg(
+                expense_count=('amount', 'size'), total=('amount', 'sum'), total_squares=('squares', 'sum'),
+                min_amount=('amount', 'min'), max_amount=('amount', 'max')
+            ))
+            bucket_parts.append(chunk.groupby(keys + ['bucket']).size().rename('expense_count'))
+
+    if cell_parts:
+        cells = pd.concat(cell_parts).groupby(level=keys).agg(
+            {'expense_count': 'sum', 'total': 'sum', 'total_squares': 'sum', 'min_amount': 'min', 'max_amount': 'max'}
+        ).reset_index()
+        histogram = pd.concat(bucket_parts).groupby(level=keys + ['bucket']).sum().reset_index()
+    else:
+        cells = histogram = pd.DataFrame()
+
+    with db.engine.begin() as connection:
+        for table in (rollups, buckets):
+            statement = delete(table)
+            if user_id is not None:
+                statement = statement.where(table.c.user_id == user_id)
+            connection.execute(statement)
+        if not cells.empty:
+            connection.execute(rollups.insert(), cells.to_dict('records'))
+            connection.execute(buckets.insert(), histogram.astype({'bucket': int}).to_dict('records'))
+    return len(cells)
+
+
+def _percentiles(histogram, quantiles):
+    if histogram.empty:
+        return [None] * len(quantiles)
+    counts = histogram.groupby('bucket')['expense_count'].sum().sort_index()
+    cumulative = counts.cumsum().to_numpy()
+    positions = np.searchsorted(cumulative, np.asarray(quantiles) * cumulative[-1])
+    # Geometric midpoint of the bucket the quantile falls into
+    return list(2 ** ((counts.index.to_numpy()[positions] + 0.5) / BUCKETS_PER_OCTAVE))
+
+
+def user_summary(user_id, months=12, quantiles=(0.5, 0.9)):
+    # Reads only rollup rows (months x categories), so the cost does not depend on how
+    # many expenses the user has
+    cells = pd.read_sql(select(rollups).where(rollups.c.user_id == user_id), db.engine)
+    histogram = pd.read_sql(select(buckets).where(buckets.c.user_id == user_id), db.engine)
+    if cells.empty:
+        return None
+
+    def stats(frame, hist):
+        count, total = frame['expense_count'].sum(), frame['total'].sum()
+        variance = max(frame['total_squares'].sum() / count - (total / count) ** 2, 0.0)
+        values = {'count': int(count), 'total': total, 'average': total / count, 'std': variance ** 0.5,
+                  'min': frame['min_amount'].min(), 'max': frame['max_amount'].max()}
+        for quantile, value in zip(quantiles, _percentiles(hist, quantiles)):
+            values[f"p{int(quantile * 100)}"] = min(max(value, values['min']), values['max'])
+        return values
+
+    overall = stats(cells, histogram)
+    by_category = pd.DataFrame(
+        {category: stats(frame, histogram[histogram['category'] == category]) for category, frame in cells.groupby('category')}
+    ).T.sort_values('total', ascending=False)
+    by_category['share'] = by_category['total'] / overall['total'] * 100
+
+    monthly = cells.groupby('month')[['expense_count', 'total']].sum().sort_index().tail(months)
+    monthly['average'] = monthly['total'] / monthly['expense_count']
+    monthly['change'] = monthly['total'].pct_change() * 100
+    monthly['moving_average'] = monthly['total'].rolling(3, min_periods=1).mean()
+    # Trend: least-squares slope of the monthly totals, per month
+    slope = float(np.polyfit(np.arange(len(monthly)), monthly['total'].to_numpy(), 1)[0]) if len(monthly) > 1 else 0.0
+    return {'overall': overall, 'by_category': by_category, 'monthly': monthly, 'trend': slope}
@@ -0,0 +1,166 @@
+import gzip
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import event, update
+from app.models import Expense, User
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'image/svg+xml', 'image/x-icon', 'image/vnd.microsoft.icon')
+
+
+class LRUCache:
+    # Thread-safe in-process cache; the least recently used entry is evicted first
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_set(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+
+fragments = LRUCache(256)
+compressed_static = LRUCache(64)
+
+# ---- per-user data version --------------------------------------------
+
+users = User.__table__
+
+
+def _bump_version(connection, user_id):
+    connection.execute(update(users).where(users.c.id == user_id).values(
+        data_version=users.c.data_version + 1, data_updated_at=datetime.utcnow().replace(microsecond=0)
+    ))
+
+
+@event.listens_for(Expense, 'after_insert')
+@event.listens_for(Expense, 'after_update')
+@event.listens_for(Expense, 'after_delete')
+def expense_changed(mapper, connection, target):
+    _bump_version(connection, target.user_id)
+
+
+def fragment_key(name, user=None):
+    # Cached fragments are keyed by the data version, so a change never serves stale HTML
+    user = user or current_user
+    return (name, user.id, user.data_version)
+
+
+# ---- conditional GET ---------------------------------------------------
+
+def _page_etag():
+    # The page embeds a CSRF token, so the ETag also changes with the session's CSRF
+    # secret and every half of its lifetime: a cached copy never carries an expired token
+    time_limit = current_app.config.get('WTF_CSRF_TIME_LIMIT') or 3600
+    parts = [request.full_path, current_user.id, current_user.data_version, session.get('csrf_token', ''), int(time.time() // (time_limit / 2))]
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def conditional(view):
+    # Answers 304 Not Modified from the user row alone, before the view runs any query.
+    # Only the ETag is trusted: If-Modified-Since knows nothing of the CSRF token in the
+    # page, so a client sending only that always gets a fresh page.
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != 'GET' or session.get('_flashes'):
+            # Pending flash messages must be rendered, so they always get a fresh page
+            return view(*args, **kwargs)
+        etag = _page_etag()
+        last_modified = current_user.data_updated_at
+        if request.if_none_match.contains_weak(etag):
+            response = make_response('', 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        # Weak because the bytes differ between compressed and identity responses
+        response.set_etag(etag, weak=True)
+        if last_modified:
+            response.last_modified = last_modified
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+    return wrapper
+
+
+# ---- compression -------------------------------------------------------
+
+def _encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=6)
+
+
+def compress_response(response):
+    response.vary.add('Accept-Encoding')
+    encoding = _encoding()
+    if (encoding is None or response.status_code != 200 or 'Content-Encoding' in response.headers
+            or not (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)):
+        return response
+    if response.direct_passthrough:
+        # Static files: compressed once per file version and encoding, then served from memory
+        key = (request.path, response.get_etag()[0] or response.last_modified, encoding)
+        response.direct_passthrough = False
+        original = response.response
+        body = compressed_static.get(key)
+        if body is None:
+            body = _compress(response.get_data(), encoding)
+            compressed_static.set(key, body)
+        if hasattr(original, 'close'):
+            original.close()
+    else:
+        data = response.get_data()
+        if len(data) < current_app.config['COMPRESS_MIN_SIZE']:
+            return response
+        body = _compress(data, encoding)
+    etag, weak = response.get_etag()
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    fragments.max_entries = app.config['FRAGMENT_CACHE_SIZE']
+    app.after_request(compress_response)
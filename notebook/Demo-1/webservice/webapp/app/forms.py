@@ -1,8 +1,10 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, SubmitField, BooleanField, FloatField
-from wtforms.validators import DataRequired, Length, Email, EqualTo, ValidationError
+from wtforms import StringField, PasswordField, SubmitField, BooleanField, FloatField, SelectField, DateField
+from wtforms.validators import DataRequired, Length, Email, EqualTo, ValidationError, Optional
 from app.models import User
 
+CATEGORIES = ['Food', 'Housing', 'Transport', 'Utilities', 'Health', 'Entertainment', 'Other']
+
 class RegistrationForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired(), Length(min=2, max=20)])
     email = StringField('Email', validators=[DataRequired(), Email()])
@@ -29,4 +31,18 @@ class LoginForm(FlaskForm):
 class ExpenseForm(FlaskForm):
     description = StringField('Description', validators=[DataRequired()])
     amount = FloatField('Amount', validators=[DataRequired()])
+    category = SelectField('Category', choices=CATEGORIES, default='Other')
     submit = SubmitField('Add Expense')
+
+class SearchForm(FlaskForm):
+    # Submitted with GET so result pages can be bookmarked and cached; no CSRF needed
+    class Meta:
+        csrf = False
+
+    q = StringField('Description', validators=[Optional(), Length(max=100)])
+    min_amount = FloatField('Min amount', validators=[Optional()])
+    max_amount = FloatField('Max amount', validators=[Optional()])
+    date_from = DateField('From', validators=[Optional()])
+    date_to = DateField('To', validators=[Optional()])
+    category = SelectField('Category', choices=[('', 'All')] + [(category, category) for category in CATEGORIES], validators=[Optional()])
+    submit = SubmitField('Search')
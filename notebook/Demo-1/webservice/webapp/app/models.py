@@ -1,8 +1,10 @@
+from datetime import datetime
 from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from flask_bcrypt import Bcrypt
 from flask_login import LoginManager
+from sqlalchemy import inspect, text
 
 db = SQLAlchemy()
 bcrypt = Bcrypt()
@@ -16,6 +18,9 @@ class User(db.Model, UserMixin):
     email = db.Column(db.String(120), unique=True, nullable=False)
     password = db.Column(db.String(60), nullable=False)
     expenses = db.relationship('Expense', backref='owner', lazy=True)
+    # Bumped on every expense change (app/caching.py); drives ETags and fragment caching
+    data_version = db.Column(db.Integer, nullable=False, default=0)
+    data_updated_at = db.Column(db.DateTime)
 
     def __repr__(self):
         return f"User('{self.username}', '{self.email}')"
@@ -23,12 +28,77 @@ class User(db.Model, UserMixin):
 class Expense(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     description = db.Column(db.String(100), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # The rollup listeners in app/analytics.py need the previous value of these columns;
+    # active_history loads it on assignment even if the instance was expired by a commit
+    amount = db.column_property(db.Column(db.Float, nullable=False), active_history=True)
+    category = db.column_property(db.Column(db.String(30), nullable=False, default='Other'), active_history=True)
+    created_at = db.column_property(db.Column(db.DateTime, nullable=False, default=datetime.utcnow), active_history=True)
+    user_id = db.column_property(db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False), active_history=True)
+
+    # Listing and search go newest first per user; amount ranges use their own index.
+    # The text index is dialect specific and is created in app/search.py.
+    __table_args__ = (
+        db.Index('ix_expense_user_created', 'user_id', 'created_at', 'id'),
+        db.Index('ix_expense_user_amount', 'user_id', 'amount'),
+    )
 
     def __repr__(self):
         return f"Expense('{self.description}', '{self.amount}')"
 
+# Aggregates per user, month and category, kept up to date by the listeners in
+# app/analytics.py so the analytics page never scans the expense table
+class ExpenseRollup(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)
+    category = db.Column(db.String(30), primary_key=True)
+    expense_count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0.0)
+    total_squares = db.Column(db.Float, nullable=False, default=0.0)
+    min_amount = db.Column(db.Float)
+    max_amount = db.Column(db.Float)
+
+# Log-scale histogram of amounts for each rollup cell, used for percentiles
+class ExpenseAmountBucket(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)
+    category = db.Column(db.String(30), primary_key=True)
+    bucket = db.Column(db.Integer, primary_key=True)
+    expense_count = db.Column(db.Integer, nullable=False, default=0)
+
+# Columns added after the first release, with the SQL default existing rows get.
+# db.create_all() creates missing tables but never alters the ones already there.
+ADDED_COLUMNS = [
+    (User.__table__, 'data_version', '0'),
+    (User.__table__, 'data_updated_at', None),
+    (Expense.__table__, 'category', "'Other'"),
+    (Expense.__table__, 'created_at', None),
+]
+
+def upgrade_schema(engine):
+    # Idempotent: adds the columns and indexes an older database lacks and backfills them.
+    # Returns the columns it added.
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    existing = {table.name: {column['name'] for column in inspector.get_columns(table.name)} for table, _, _ in ADDED_COLUMNS}
+    added = []
+    with engine.begin() as connection:
+        for table, name, default in ADDED_COLUMNS:
+            if name in existing[table.name]:
+                continue
+            ddl = f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.quote(name)} {table.c[name].type.compile(engine.dialect)}"
+            if default is not None:
+                ddl += f" NOT NULL DEFAULT {default}"
+            connection.execute(text(ddl))
+            added.append(f"{table.name}.{name}")
+        if 'expense.created_at' in added:
+            # SQLite cannot add a NOT NULL column without a constant default, so the column
+            # is added nullable and older expenses are dated at the upgrade
+            expenses = Expense.__table__
+            connection.execute(expenses.update().where(expenses.c.created_at.is_(None)).values(created_at=datetime.utcnow()))
+        for index in Expense.__table__.indexes:
+            index.create(connection, checkfirst=True)
+    return added
+
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
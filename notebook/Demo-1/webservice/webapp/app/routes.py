@@ -1,8 +1,11 @@
-from flask import render_template, url_for, flash, redirect, request, Blueprint
+from flask import render_template, url_for, flash, redirect, request, Blueprint, abort
 from flask_login import login_user, current_user, logout_user, login_required
 from app import db, bcrypt
-from app.forms import RegistrationForm, LoginForm, ExpenseForm
+from app.forms import RegistrationForm, LoginForm, ExpenseForm, SearchForm
 from app.models import User, Expense
+from app.analytics import user_summary
+from app.caching import conditional, fragments, fragment_key
+from app.search import decode_cursor, search_expenses
 import logging
 
 # Configure logging
@@ -14,6 +17,7 @@ bp = Blueprint('routes', __name__)
 @bp.route("/")
 @bp.route("/home")
 @login_required
+@conditional
 def home():
     logger.debug("Home route accessed by user: %s", current_user.username)
     return render_template('home.html')
@@ -63,19 +67,55 @@ def logout():
 
 @bp.route("/expenses", methods=['GET', 'POST'])
 @login_required
+@conditional
 def expenses():
     form = ExpenseForm()
     if form.validate_on_submit():
-        expense = Expense(description=form.description.data, amount=form.amount.data, owner=current_user)
+        expense = Expense(description=form.description.data, amount=form.amount.data, category=form.category.data, owner=current_user)
         db.session.add(expense)
         db.session.commit()
         flash('Your expense has been added!', 'success')
         logger.debug("Expense added: %s", expense.description)
         return redirect(url_for('routes.expenses'))
-    expenses = Expense.query.filter_by(owner=current_user)
-    total = sum(expense.amount for expense in expenses)
+
+    def render_table():
+        expenses = Expense.query.filter_by(owner=current_user).all()
+        total = sum(expense.amount for expense in expenses)
+        return render_template('_expense_table.html', expenses=expenses, total=total)
+
+    # The expense table only changes with the user's data version; the form is rendered
+    # every time because it carries the CSRF token
+    table = fragments.get_or_set(fragment_key('expense_table'), render_table)
     logger.debug("Expenses page accessed by user: %s", current_user.username)
-    return render_template('expenses.html', title='Expenses', form=form, expenses=expenses, total=total)
+    return render_template('expenses.html', title='Expenses', form=form, table=table)
+
+@bp.route("/expenses/search")
+@login_required
+@conditional
+def search():
+    form = SearchForm(request.args)
+    results, next_cursor = [], None
+    after = request.args.get('after')
+    if after and decode_cursor(after) is None:
+        abort(400)
+    if request.args and form.validate():
+        results, next_cursor = search_expenses(
+            current_user.id,
+            term=form.q.data,
+            min_amount=form.min_amount.data,
+            max_amount=form.max_amount.data,
+            date_from=form.date_from.data,
+            date_to=form.date_to.data,
+            category=form.category.data,
+            after=after
+        )
+    else:
+        for fieldName, errorMessages in form.errors.items():
+            for err in errorMessages:
+                flash(f'{fieldName} - {err}', 'danger')
+    next_args = dict(request.args, after=next_cursor) if next_cursor else None
+    logger.debug("Expense search by user: %s", current_user.username)
+    return render_template('search.html', title='Search', form=form, results=results, next_args=next_args)
 
 @bp.route("/delete_expense/<int:expense_id>")
 @login_required
@@ -89,3 +129,11 @@ def delete_expense(expense_id):
     flash('Your expense has been deleted!', 'success')
     logger.debug("Expense deleted: %s", expense.description)
     return redirect(url_for('routes.expenses'))
+
+@bp.route("/analytics")
+@login_required
+@conditional
+def analytics():
+    summary = user_summary(current_user.id)
+    logger.debug("Analytics page accessed by user: %s", current_user.username)
+    return render_template('analytics.html', title='Analytics', summary=summary)
@@ -0,0 +1,123 @@
+from datetime import datetime, time
+from sqlalchemy import text, tuple_
+from app.models import db, Expense
+
+PAGE_SIZE = 50
+# Trigram indexes cannot answer terms shorter than one trigram
+MIN_INDEXED_TERM = 3
+# Up to this many text matches (SQLite), results are looked up by primary key. Common
+# terms instead walk the user's newest expenses in index order with LIKE, which finds a
+# page of matches after a few hundred rows.
+SELECTIVE_MATCHES = 5000
+
+POSTGRESQL_INDEX = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE EXTENSION IF NOT EXISTS btree_gin',
+    # user_id in the same GIN index lets one index scan answer "this user's expenses matching text"
+    'CREATE INDEX IF NOT EXISTS ix_expense_description_trgm ON expense USING gin (user_id, description gin_trgm_ops)',
+]
+
+# External-content FTS5 table with the trigram tokenizer (substring matching, like pg_trgm),
+# kept in sync with the expense table by triggers
+SQLITE_INDEX = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS expense_fts USING fts5(description, content='expense', content_rowid='id', tokenize='trigram')",
+    '''CREATE TRIGGER IF NOT EXISTS expense_fts_insert AFTER INSERT ON expense BEGIN
+        INSERT INTO expense_fts(rowid, description) VALUES (new.id, new.description);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS expense_fts_delete AFTER DELETE ON expense BEGIN
+        INSERT INTO expense_fts(expense_fts, rowid, description) VALUES ('delete', old.id, old.description);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS expense_fts_update AFTER UPDATE OF description ON expense BEGIN
+        INSERT INTO expense_fts(expense_fts, rowid, description) VALUES ('delete', old.id, old.description);
+        INSERT INTO expense_fts(rowid, description) VALUES (new.id, new.description);
+    END''',
+]
+
+
+def create_search_index(engine):
+    # Idempotent, so it also adds the index to databases created before it existed
+    with engine.begin() as connection:
+        if engine.dialect.name == 'postgresql':
+            for statement in POSTGRESQL_INDEX:
+                connection.execute(text(statement))
+        elif engine.dialect.name == 'sqlite':
+            exists = connection.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'expense_fts'")).first()
+            for statement in SQLITE_INDEX:
+                connection.execute(text(statement))
+            if not exists:
+                connection.execute(text("INSERT INTO expense_fts(expense_fts) VALUES ('rebuild')"))
+
+
+def _text_filter(term):
+    # Returns the filter and whether it selects few enough rows to drive the query
+    if db.engine.dialect.name == 'sqlite' and len(term) >= MIN_INDEXED_TERM:
+        # Quoted as a single FTS5 string, so user input is never parsed as query syntax
+        match = '"' + term.replace('"', '""') + '"'
+        ids = db.session.execute(
+            text('SELECT rowid FROM expense_fts WHERE expense_fts MATCH :match LIMIT :limit'),
+            {'match': match, 'limit': SELECTIVE_MATCHES + 1}
+        ).scalars().all()
+        if len(ids) <= SELECTIVE_MATCHES:
+            return Expense.id.in_(ids), True
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return Expense.description.ilike(f'%{escaped}%', escape='\\'), False
+
+
+def _amount_filters(user_id, min_amount, max_amount):
+    amount = Expense.amount
+    if db.engine.dialect.name == 'sqlite':
+        # SQLite keeps no value histograms, so it would pick the amount index even for broad
+        # ranges and then sort every row in them. A capped count on that index tells narrow
+        # ranges (index drives the query) from broad ones ("+ 0" disables the index).
+        bounds = [amount >= min_amount if min_amount is not None else None, amount <= max_amount if max_amount is not None else None]
+        in_range = Expense.query.with_entities(Expense.id).filter(Expense.user_id == user_id, *[b for b in bounds if b is not None])
+        if in_range.limit(SELECTIVE_MATCHES + 1).count() > SELECTIVE_MATCHES:
+            amount = Expense.amount + 0
+    filters = []
+    if min_amount is not None:
+        filters.append(amount >= min_amount)
+    if max_amount is not None:
+        filters.append(amount <= max_amount)
+    return filters
+
+
+def encode_cursor(expense):
+    return f"{expense.created_at.isoformat()}_{expense.id}"
+
+
+def decode_cursor(cursor):
+    # None for anything encode_cursor did not produce (the cursor comes from the query string)
+    try:
+        created_at, expense_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(created_at), int(expense_id)
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+def search_expenses(user_id, term=None, min_amount=None, max_amount=None, date_from=None, date_to=None,
+                    category=None, after=None, page_size=PAGE_SIZE):
+    # Newest first with keyset pagination: each page continues after the (created_at, id)
+    # of the previous one, so deep pages cost the same as the first
+    user_filter = Expense.user_id == user_id
+    text_filter, selective = _text_filter(term) if term else (None, False)
+    if selective:
+        # "+ 0" keeps SQLite from walking the (user_id, created_at) index to avoid a sort;
+        # fetching the few matches by primary key and sorting them is far cheaper
+        user_filter = Expense.user_id + 0 == user_id
+    query = Expense.query.filter(user_filter)
+    if text_filter is not None:
+        query = query.filter(text_filter)
+    if min_amount is not None or max_amount is not None:
+        query = query.filter(*_amount_filters(user_id, min_amount, max_amount))
+    if date_from:
+        query = query.filter(Expense.created_at >= datetime.combine(date_from, time.min))
+    if date_to:
+        query = query.filter(Expense.created_at <= datetime.combine(date_to, time.max))
+    if category:
+        query = query.filter(Expense.category == category)
+    cursor = decode_cursor(after) if after else None
+    if cursor:
+        query = query.filter(tuple_(Expense.created_at, Expense.id) < cursor)
+    rows = query.order_by(Expense.created_at.desc(), Expense.id.desc()).limit(page_size + 1).all()
+    next_cursor = encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
@@ -0,0 +1,60 @@
+import logging
+import os
+import sys
+import tempfile
+import time
+
+# Repeat-visit benchmark for the expenses page: latency and bytes transferred with and
+# without conditional GET, fragment caching and compression, on a throwaway SQLite database
+#   python benchmark.py [expenses=2000] [requests=200]
+EXPENSES = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+REQUESTS = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+database = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+os.environ['DATABASE_URL'] = f"sqlite:///{database}"
+
+from app import create_app, db, bcrypt
+from app.caching import fragments
+from app.models import User, Expense
+
+app = create_app()
+logging.disable(logging.DEBUG)
+app.config['WTF_CSRF_ENABLED'] = False
+
+with app.app_context():
+    user = User(username='benchmark', email='benchmark@example.com', password=bcrypt.generate_password_hash('benchmark').decode('utf-8'))
+    db.session.add(user)
+    db.session.flush()
+    db.session.add_all(Expense(description=f'Expense {i}', amount=1 + i % 250, owner=user) for i in range(EXPENSES))
+    db.session.commit()
+
+client = app.test_client()
+client.post('/login', data={'email': 'benchmark@example.com', 'password': 'benchmark'})
+
+
+def measure(name, path='/expenses', encoding='identity', conditional=False, clear_fragments=False):
+    headers = {'Accept-Encoding': encoding}
+    etag = client.get(path, headers=headers).headers.get('ETag')
+    if conditional:
+        headers['If-None-Match'] = etag
+    timings, size, status = [], 0, None
+    for _ in range(REQUESTS):
+        if clear_fragments:
+            fragments._entries.clear()
+        start = time.perf_counter()
+        response = client.get(path, headers=headers)
+        timings.append((time.perf_counter() - start) * 1000)
+        size, status = len(response.data), response.status_code
+    timings.sort()
+    print(f"{name:<42} {status:>6} {size:>9} {timings[len(timings) // 2]:>9.2f} {timings[int(len(timings) * 0.95)]:>9.2f}")
+
+
+print(f"{EXPENSES} expenses, {REQUESTS} requests per scenario\n")
+print(f"{'Scenario':<42} {'Status':>6} {'Bytes':>9} {'p50 ms':>9} {'p95 ms':>9}")
+measure('Full render (no fragment cache)', clear_fragments=True)
+measure('Fragment cache hit')
+measure('Fragment cache hit + gzip', encoding='gzip')
+measure('Fragment cache hit + br', encoding='br')
+measure('Conditional GET (304)', conditional=True)
+measure('Static CSS', path='/static/styles.css')
+measure('Static CSS + gzip', path='/static/styles.css', encoding='gzip')
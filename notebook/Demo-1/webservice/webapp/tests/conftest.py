@@ -0,0 +1,54 @@
+import logging
+import os
+import sys
+import pytest
+
+# Tests run from the webapp directory or the repository root alike
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db, bcrypt
+from app.caching import fragments
+from app.config import Config
+from app.models import User
+
+PASSWORD = 'password'
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # A throwaway SQLite database per test, created like production's by create_app()
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'app.db'}")
+    monkeypatch.setattr(Config, 'BCRYPT_LOG_ROUNDS', 4, raising=False)
+    logging.disable(logging.DEBUG)
+    app = create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    # Fragments are keyed by user id and data version, which repeat in every fresh database
+    fragments._entries.clear()
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+def _add_user(name):
+    user = User(username=name, email=f"{name}@example.com", password=bcrypt.generate_password_hash(PASSWORD).decode('utf-8'))
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def add_user(app):
+    return _add_user
+
+
+@pytest.fixture
+def user(add_user):
+    return add_user('alice')
+
+
+@pytest.fixture
+def client(app, user):
+    client = app.test_client()
+    client.post('/login', data={'email': user.email, 'password': PASSWORD})
+    return client
@@ -0,0 +1,138 @@
+import random
+import sqlite3
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import select
+from app import create_app
+from app.analytics import buckets, rebuild_rollups, rollups, user_summary
+from app.config import Config
+from app.models import db, Expense, ExpenseRollup
+
+CATEGORIES = ['Food', 'Housing', 'Transport', 'Other']
+
+
+def rollup_tables():
+    # Both rollup tables as sorted frames, to compare incremental and rebuilt states
+    cells = pd.read_sql(select(rollups), db.engine).sort_values(['user_id', 'month', 'category'], ignore_index=True)
+    histogram = pd.read_sql(select(buckets), db.engine).sort_values(['user_id', 'month', 'category', 'bucket'], ignore_index=True)
+    return cells, histogram
+
+
+def assert_rollups_match_rebuild():
+    incremental = rollup_tables()
+    rebuild_rollups()
+    for kept, rebuilt in zip(incremental, rollup_tables()):
+        pd.testing.assert_frame_equal(kept, rebuilt, check_exact=False, rtol=1e-9)
+
+
+def random_expense(rng, user_id):
+    return Expense(description='expense', amount=round(rng.uniform(0.5, 900), 2), category=rng.choice(CATEGORIES),
+                   created_at=datetime(2024, 1, 1) + timedelta(days=rng.randrange(180)), user_id=user_id)
+
+
+def test_listeners_keep_rollups_equal_to_rebuild(user, add_user):
+    rng = random.Random(0)
+    other = add_user('bob')
+    expenses = [random_expense(rng, rng.choice([user.id, other.id])) for _ in range(300)]
+    db.session.add_all(expenses)
+    db.session.commit()
+    assert_rollups_match_rebuild()
+
+    # Updates that move expenses between cells, change amounts (and so min/max) or both
+    for expense in rng.sample(expenses, 80):
+        change = rng.randrange(4)
+        if change in (0, 3):
+            expense.amount = round(rng.uniform(0.5, 2000), 2)
+        if change in (1, 3):
+            expense.category = rng.choice(CATEGORIES)
+        if change == 2:
+            expense.created_at += timedelta(days=rng.randrange(-60, 60))
+    db.session.commit()
+    assert_rollups_match_rebuild()
+
+    # Deletes, including every expense of some cells and the current min and max of others
+    for expense in rng.sample(expenses, 120):
+        db.session.delete(expense)
+    db.session.commit()
+    assert_rollups_match_rebuild()
+
+
+def test_rebuild_for_one_user(user, add_user):
+    rng = random.Random(1)
+    other = add_user('bob')
+    db.session.add_all(random_expense(rng, user_id) for user_id in [user.id, other.id] * 50)
+    db.session.commit()
+    before = rollup_tables()
+    db.session.execute(rollups.delete().where(rollups.c.user_id == user.id))
+    db.session.commit()
+    assert rebuild_rollups(user_id=user.id) == len(before[0][before[0]['user_id'] == user.id])
+    pd.testing.assert_frame_equal(before[0], rollup_tables()[0])
+
+
+def test_summary_matches_exact_pandas(user):
+    rng = random.Random(2)
+    db.session.add_all(random_expense(rng, user.id) for _ in range(400))
+    db.session.commit()
+    frame = pd.read_sql(select(Expense.__table__).where(Expense.user_id == user.id), db.engine)
+    summary = user_summary(user.id)
+
+    overall = summary['overall']
+    assert overall['count'] == len(frame)
+    assert overall['total'] == pytest.approx(frame['amount'].sum())
+    assert overall['average'] == pytest.approx(frame['amount'].mean())
+    assert overall['std'] == pytest.approx(frame['amount'].std(ddof=0))
+    assert (overall['min'], overall['max']) == (frame['amount'].min(), frame['amount'].max())
+    # Quarter-octave histogram buckets: percentiles within ~9 %
+    for q in (0.5, 0.9):
+        exact = np.quantile(frame['amount'], q, method='inverted_cdf')
+        assert abs(overall[f"p{int(q * 100)}"] - exact) / exact < 0.1
+
+    by_category = frame.groupby('category')['amount'].agg(['count', 'sum'])
+    assert summary['by_category']['count'].astype(int).to_dict() == by_category['count'].to_dict()
+    assert np.allclose(summary['by_category'].loc[by_category.index, 'total'].astype(float), by_category['sum'])
+
+    month = pd.to_datetime(frame['created_at']).dt.to_period('M').dt.to_timestamp().dt.date
+    monthly = frame.groupby(month)['amount'].agg(['count', 'sum'])
+    assert summary['monthly']['expense_count'].tolist() == monthly['count'].tolist()
+    assert np.allclose(summary['monthly']['total'], monthly['sum'])
+
+
+def test_summary_without_expenses(user):
+    assert user_summary(user.id) is None
+
+
+def test_analytics_page(client, user):
+    db.session.add(Expense(description='rent', amount=900, category='Housing', user_id=user.id))
+    db.session.commit()
+    response = client.get('/analytics')
+    assert response.status_code == 200
+    assert b'Housing' in response.data
+
+
+def test_upgrade_adds_columns_and_rebuilds_rollups(tmp_path, monkeypatch):
+    # A database from before the analytics and caching columns
+    path = tmp_path / 'old.db'
+    connection = sqlite3.connect(path)
+    connection.executescript('''
+        CREATE TABLE user (id INTEGER PRIMARY KEY, username VARCHAR(20) UNIQUE NOT NULL,
+                           email VARCHAR(120) UNIQUE NOT NULL, password VARCHAR(60) NOT NULL);
+        CREATE TABLE expense (id INTEGER PRIMARY KEY, description VARCHAR(100) NOT NULL, amount FLOAT NOT NULL,
+                              user_id INTEGER NOT NULL REFERENCES user(id));
+        INSERT INTO user VALUES (1, 'alice', 'alice@example.com', 'x');
+        INSERT INTO expense VALUES (1, 'coffee', 3.5, 1), (2, 'rent', 900, 1);
+    ''')
+    connection.commit()
+    connection.close()
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{path}")
+
+    for _ in range(2):  # the second start finds nothing to upgrade
+        with create_app().app_context():
+            expenses = Expense.query.order_by(Expense.id).all()
+            assert [expense.category for expense in expenses] == ['Other', 'Other']
+            assert all(expense.created_at is not None for expense in expenses)
+            cells = ExpenseRollup.query.all()
+            assert [(cell.category, cell.expense_count, cell.total) for cell in cells] == [('Other', 2, 903.5)]
+            db.session.remove()
+            db.engine.dispose()
@@ -0,0 +1,33 @@
+from app.models import db, Expense
+
+
+def test_matching_etag_answers_304(client):
+    first = client.get('/expenses')
+    assert first.status_code == 200 and first.headers['ETag']
+    again = client.get('/expenses', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert again.headers['ETag'] == first.headers['ETag']
+
+
+def test_if_modified_since_alone_gets_a_fresh_page(client):
+    again = client.get('/expenses', headers={'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'})
+    assert again.status_code == 200
+
+
+def test_changed_data_gets_a_new_etag(client, user):
+    first = client.get('/expenses')
+    db.session.add(Expense(description='coffee', amount=3, category='Food', user_id=user.id))
+    db.session.commit()
+    again = client.get('/expenses', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 200
+    assert again.headers['ETag'] != first.headers['ETag']
+    assert b'coffee' in again.data
+
+
+def test_pending_flash_bypasses_the_cache(client):
+    first = client.get('/expenses')
+    response = client.post('/expenses', data={'description': 'rent', 'amount': 700, 'category': 'Housing'})
+    assert response.status_code == 302
+    again = client.get('/expenses', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 200
+    assert b'Your expense has been added!' in again.data
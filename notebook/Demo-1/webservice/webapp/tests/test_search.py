@@ -0,0 +1,96 @@
+import random
+from datetime import date, datetime, timedelta
+import pytest
+from app.models import db, Expense
+from app.search import PAGE_SIZE, decode_cursor, encode_cursor, search_expenses
+
+WORDS = ['coffee', 'rent', 'train', 'groceries', 'cinema', 'pharmacy', 'electricity', 'taxi']
+CATEGORIES = ['Food', 'Housing', 'Transport', 'Utilities', 'Health', 'Entertainment', 'Other']
+
+
+@pytest.fixture
+def expenses(user, add_user):
+    rng = random.Random(0)
+    start = datetime(2024, 1, 1)
+    rows = []
+    for i in range(600):
+        # Many expenses share a timestamp, so pages must break ties on the id
+        moment = start + timedelta(hours=rng.randrange(0, 24 * 90, 6))
+        rows.append(Expense(description=f"{rng.choice(WORDS)} {rng.choice(WORDS)} #{i}", amount=round(rng.uniform(1, 500), 2),
+                            category=rng.choice(CATEGORIES), created_at=moment, user_id=user.id))
+    other = add_user('bob')
+    rows += [Expense(description='coffee with bob', amount=3, category='Food', created_at=start, user_id=other.id) for _ in range(20)]
+    db.session.add_all(rows)
+    db.session.commit()
+    return Expense.query.filter_by(user_id=user.id).all()
+
+
+def all_pages(user_id, page_size=PAGE_SIZE, **filters):
+    pages, after = [], None
+    while True:
+        page, after = search_expenses(user_id, after=after, page_size=page_size, **filters)
+        pages.append(page)
+        if after is None:
+            return pages
+
+
+def newest_first(expenses):
+    return [expense.id for expense in sorted(expenses, key=lambda e: (e.created_at, e.id), reverse=True)]
+
+
+@pytest.mark.parametrize('page_size', [1, 7, PAGE_SIZE])
+def test_keyset_pages_cover_everything_once(user, expenses, page_size):
+    pages = all_pages(user.id, page_size=page_size)
+    ids = [expense.id for page in pages for expense in page]
+    assert len(ids) == len(set(ids))
+    assert ids == newest_first(expenses)
+    assert all(len(page) == page_size for page in pages[:-1])
+
+
+@pytest.mark.parametrize('filters, keep', [
+    ({'term': 'coffee'}, lambda e: 'coffee' in e.description),
+    ({'term': 'Co'}, lambda e: 'co' in e.description.lower()),
+    ({'term': '#12'}, lambda e: '#12' in e.description),
+    ({'term': '100%_'}, lambda e: False),
+    ({'min_amount': 100, 'max_amount': 120}, lambda e: 100 <= e.amount <= 120),
+    ({'min_amount': 10}, lambda e: e.amount >= 10),
+    ({'category': 'Food'}, lambda e: e.category == 'Food'),
+    ({'date_from': date(2024, 2, 1), 'date_to': date(2024, 2, 29)}, lambda e: date(2024, 2, 1) <= e.created_at.date() <= date(2024, 2, 29)),
+    ({'term': 'rent', 'category': 'Housing', 'max_amount': 250}, lambda e: 'rent' in e.description and e.category == 'Housing' and e.amount <= 250),
+])
+def test_filters_match_a_plain_scan(user, expenses, filters, keep):
+    pages = all_pages(user.id, page_size=20, **filters)
+    ids = [expense.id for page in pages for expense in page]
+    assert len(ids) == len(set(ids))
+    assert ids == newest_first(expense for expense in expenses if keep(expense))
+
+
+def test_other_users_expenses_never_match(user, expenses):
+    pages = all_pages(user.id, term='bob')
+    assert pages == [[]]
+
+
+def test_new_expense_does_not_shift_later_pages(user, expenses):
+    first, after = search_expenses(user.id, page_size=10)
+    db.session.add(Expense(description='late coffee', amount=1, category='Food', created_at=datetime(2030, 1, 1), user_id=user.id))
+    db.session.commit()
+    second, _ = search_expenses(user.id, page_size=10, after=after)
+    assert newest_first(expenses)[10:20] == [expense.id for expense in second]
+
+
+def test_cursor_round_trip(expenses):
+    expense = expenses[0]
+    assert decode_cursor(encode_cursor(expense)) == (expense.created_at, expense.id)
+    for cursor in ['', 'garbage', '2024-01-01T00:00:00_x', 'x_1', None]:
+        assert decode_cursor(cursor) is None
+
+
+def test_search_route_pages(client, expenses):
+    response = client.get('/expenses/search', query_string={'q': 'coffee'})
+    assert response.status_code == 200
+    assert b'after=' in response.data
+
+
+@pytest.mark.parametrize('cursor', ['garbage', '2024-13-45T00:00:00_1', '2024-01-01T00:00:00_abc'])
+def test_search_route_rejects_malformed_cursor(client, expenses, cursor):
+    assert client.get('/expenses/search', query_string={'q': 'coffee', 'after': cursor}).status_code == 400